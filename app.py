@@ -8,18 +8,32 @@ import cv2
 import streamlit as st
 
 
-from exam_camera import cleanup_removed_feeds, read_feed_frame, release_all_captures, scan_cameras
-from exam_config import ensure_dirs
-from exam_detection import close_detectors, detect_on_frame, ensure_detectors, init_feed_state
-from exam_reporting import generate_report, record_incident, save_snapshot
+from exam_camera import CameraScan, cleanup_removed_feeds, has_new_frame, mark_analyzed, read_feed_frame, release_all_captures
+from exam_clips import close_clip_recorder
+from exam_columnar import close_columnar_exporter
+from exam_config import ANALYSIS_TICK, ensure_dirs
+from exam_detection import init_feed_state
+from exam_engine import close_engine, detect_feeds, engine_ready, ensure_engine, preload_engine
+from exam_incidents import close_incident_log
+from exam_reporting import generate_report, incident_count, plan_snapshot, record_incident, reset_incidents, save_snapshot
+from exam_scheduler import schedule_feeds
+from exam_snapshots import close_snapshot_store, close_snapshot_writer
 from exam_state import add_event, get_candidate_meta, init_state, parse_candidate_map
+from exam_store import close_incident_store
 
 
 
 
 def close_resources() -> None:
     release_all_captures()
-    close_detectors()
+    close_engine()
+    close_snapshot_writer()
+    close_snapshot_store()
+    close_clip_recorder()
+    # The store hands its last queued rows to the log and exporter as it closes.
+    close_incident_store()
+    close_incident_log()
+    close_columnar_exporter()
 
 
 
@@ -221,8 +235,15 @@ def render_controls() -> None:
                 cleanup_removed_feeds()
                 add_event(f"Feed list updated: {st.session_state.feed_list}")
             if st.button("Scan Local Cameras", use_container_width=True):
-                found = scan_cameras()
-                st.session_state.feed_list = found or ["0"]
+                in_use = [src for src, status in st.session_state.feed_status.items() if status == "Connected"]
+                st.session_state.camera_scan.start(in_use)
+            scan = st.session_state.camera_scan.status()
+            if scan["state"] == "running":
+                st.caption("Scanning local cameras...")
+            elif scan["state"] == "done" and scan["finished_at"] != st.session_state.get("camera_scan_applied"):
+                # The scan thread cannot touch session state, so its result is applied on the next rerun.
+                st.session_state.camera_scan_applied = scan["finished_at"]
+                st.session_state.feed_list = scan["found"] or ["0"]
                 st.session_state.feeds_raw = "\n".join(st.session_state.feed_list)
                 cleanup_removed_feeds()
                 add_event(f"Local camera scan: {st.session_state.feed_list}")
@@ -246,8 +267,12 @@ def render_controls() -> None:
 
 def render_top(feed_sources: list[str]) -> None:
     connected = connected_cameras(feed_sources)
-    monitor_state = "ACTIVE" if st.session_state.running else "STOPPED"
-    monitor_color = "#58e676" if st.session_state.running else "#ffbe55"
+    if not st.session_state.running:
+        monitor_state, monitor_color = "STOPPED", "#ffbe55"
+    elif engine_ready():
+        monitor_state, monitor_color = "ACTIVE", "#58e676"
+    else:
+        monitor_state, monitor_color = "WARMING UP", "#5fb3ff"
     st.markdown("<div class='top-title'>AI Exam Monitoring Dashboard</div>", unsafe_allow_html=True)
     st.markdown(
         (
@@ -322,28 +347,24 @@ def process_detection(feed_sources: list[str]) -> None:
     if not st.session_state.running:
         return
     now = time.time()
-    detection_interval = 0.22
-    if now - st.session_state.last_detect_ts < detection_interval:
+    if now - st.session_state.last_detect_ts < ANALYSIS_TICK:
         return
     st.session_state.last_detect_ts = now
 
-
-    ensure_detectors()
+    if not engine_ready():
+        # Script reruns cannot share session state with a background thread,
+        # so the warm-up runs here, once, before the first analysis.
+        with st.spinner("Warming up detection models..."):
+            preload_engine()
+    ensure_engine()
     st.session_state.tick += 1
-    n = len(feed_sources)
-    if n == 0:
+    if not feed_sources:
         return
-
-
-    start = st.session_state.rr_index % n
-    batch = min(st.session_state.analysis_batch_size, n)
-    indexes = [(start + i) % n for i in range(batch)]
-    st.session_state.rr_index = (start + batch) % n
     active_alerts = 0
 
 
-    for idx in indexes:
-        src = feed_sources[idx]
+    candidates = []
+    for src in feed_sources:
         frame = st.session_state.feed_frames[src]
         if st.session_state.feed_status.get(src) != "Connected":
             st.session_state.feed_signals[src] = {
@@ -354,9 +375,17 @@ def process_detection(feed_sources: list[str]) -> None:
                 "severity": "OFFLINE",
             }
             continue
+        # Only feeds with a frame they have not analyzed yet compete for a slot.
+        if has_new_frame(src):
+            candidates.append(src)
 
 
-        signal_text = detect_on_frame(src, frame)
+    chosen = schedule_feeds(candidates, st.session_state.analysis_batch_size)
+    batch = [(src, st.session_state.feed_frames[src]) for src in chosen]
+    results = detect_feeds(batch)
+    for src, frame in batch:
+        mark_analyzed(src)
+        signal_text = results[src]
         if signal_text["severity"] != "ALERT":
             st.session_state.feed_risk_scores[src] = max(0.0, st.session_state.feed_risk_scores.get(src, 0.0) - 0.35)
             continue
@@ -366,12 +395,17 @@ def process_detection(feed_sources: list[str]) -> None:
         st.session_state.feed_risk_scores[src] = min(100.0, st.session_state.feed_risk_scores.get(src, 0.0) + 1.8)
         last_incident = st.session_state.last_incident_ts.get(src, 0.0)
         if time.time() - last_incident > 3:
-            snap = save_snapshot(frame, src)
+            # The incident is logged now with its planned snapshot path; the writer
+            # thread clears that path if the frame is dropped. A near-duplicate of a
+            # recent snapshot points at that file instead of writing a new one.
+            snapshot, fresh = plan_snapshot(frame, src)
+            incident = record_incident(src, signal_text, snapshot)
+            if fresh:
+                save_snapshot(frame, src, incident)
             st.session_state.last_snapshot_ts[src] = time.time()
-            record_incident(src, signal_text, snap)
             st.session_state.last_incident_ts[src] = time.time()
-            add_event(f"Snapshot captured for feed {src}")
-            add_event(f"Incident logged on feed {src}")
+            add_event(f"Snapshot captured for feed {src}" if fresh else f"Snapshot reused for feed {src}", at=incident["ts"])
+            add_event(f"Incident logged on feed {src}", at=incident["ts"])
 
 
     if active_alerts > 0:
@@ -412,11 +446,11 @@ def render_actions(feed_sources: list[str]) -> None:
     with a3:
         if st.button("Reset Risk", use_container_width=True):
             st.session_state.risk_score = 0.0
-            st.session_state.incidents = []
+            reset_incidents()
             st.session_state.feed_risk_scores = {}
             add_event("Risk and incidents reset")
     with a4:
-        st.markdown(f"<div class='compact-note'><b>Risk:</b> {int(st.session_state.risk_score)}<br><b>Incidents:</b> {len(st.session_state.incidents)}</div>", unsafe_allow_html=True)
+        st.markdown(f"<div class='compact-note'><b>Risk:</b> {int(st.session_state.risk_score)}<br><b>Incidents:</b> {incident_count()}</div>", unsafe_allow_html=True)
 
 
     if st.session_state.report_ready:
@@ -451,6 +485,8 @@ def main() -> None:
     st.set_page_config(page_title="AI Exam Proctor - Multi Feed", layout="wide")
     init_state()
     ensure_dirs()
+    if "camera_scan" not in st.session_state:
+        st.session_state.camera_scan = CameraScan()
     render_style()
     render_controls()
 
@@ -477,6 +513,9 @@ def main() -> None:
     if st.session_state.running or st.session_state.live_preview:
         time.sleep(0.09 if st.session_state.running else 0.18)
         st.rerun()
+    elif st.session_state.camera_scan.status()["state"] == "running":
+        time.sleep(0.3)
+        st.rerun()
 
 
 
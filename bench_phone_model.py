@@ -0,0 +1,100 @@
+import argparse
+import os
+import statistics
+import time
+
+from exam_config import PHONE_INT8_PATH, PHONE_MODEL_PATH, PHONE_ONNX_PATH, SNAPSHOT_DIR
+from exam_onnx import OnnxMobileDetector
+from exam_quantize import list_frames, load_frame, quantize_phone_model
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def run_model(detector, frames: list, batch_size: int, warmup: int) -> tuple[list[float], list[float], float]:
+    for _ in range(warmup):
+        detector.phone_confidences(frames[:batch_size])
+
+    latencies = []
+    confs = []
+    started = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        chunk = frames[i:i + batch_size]
+        t0 = time.perf_counter()
+        confs.extend(detector.phone_confidences(chunk))
+        per_frame = (time.perf_counter() - t0) / len(chunk)
+        latencies.extend([per_frame] * len(chunk))
+    elapsed = time.perf_counter() - started
+    return latencies, confs, elapsed
+
+
+def print_timing(label: str, latencies: list[float], elapsed: float) -> None:
+    print(
+        f"{label:<6} mean {statistics.mean(latencies) * 1000:7.2f} ms | "
+        f"p50 {percentile(latencies, 50) * 1000:7.2f} ms | "
+        f"p95 {percentile(latencies, 95) * 1000:7.2f} ms | "
+        f"throughput {len(latencies) / elapsed:7.1f} frames/s"
+    )
+
+
+def print_agreement(label: str, reference: list[float], confs: list[float], threshold: float) -> None:
+    deltas = [b - a for a, b in zip(reference, confs)]
+    abs_deltas = [abs(d) for d in deltas]
+    agree = sum(1 for a, b in zip(reference, confs) if (a >= threshold) == (b >= threshold))
+    print(
+        f"{label:<14} confidence change: mean {statistics.mean(deltas):+.4f} | "
+        f"mean abs {statistics.mean(abs_deltas):.4f} | max abs {max(abs_deltas):.4f} | "
+        f"agree at {threshold:.2f}: {agree}/{len(reference)}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare torch, fp32 ONNX and INT8 phone detector latency and confidence.")
+    parser.add_argument("--frames", default=SNAPSHOT_DIR, help="Folder of .jpg/.png frames to run over")
+    parser.add_argument("--torch", default=PHONE_MODEL_PATH, help="Original weights used as the accuracy baseline ('' to skip)")
+    parser.add_argument("--fp32", default=PHONE_ONNX_PATH)
+    parser.add_argument("--int8", default=PHONE_INT8_PATH)
+    parser.add_argument("--quantize", action="store_true", help="(Re)build the INT8 model before benchmarking")
+    parser.add_argument("--calibrate", action="store_true", help="Use --frames for static calibration when quantizing")
+    parser.add_argument("--batch", type=int, default=1, help="Frames per inference call")
+    parser.add_argument("--limit", type=int, default=0, help="Use at most this many frames (0 = all)")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.42, help="Phone score treated as a positive frame")
+    args = parser.parse_args()
+
+    if args.quantize or not os.path.exists(args.int8):
+        quantize_phone_model(args.fp32, args.int8, args.frames if args.calibrate else "")
+        print(f"Wrote {args.int8}")
+
+    frames = [f for f in (load_frame(p) for p in list_frames(args.frames, args.limit)) if f is not None]
+    if not frames:
+        raise SystemExit(f"No readable frames in {args.frames}")
+    batch_size = max(1, args.batch)
+
+    torch_conf = None
+    if args.torch:
+        from exam_yolo import YoloMobileDetector
+
+        torch_lat, torch_conf, torch_elapsed = run_model(YoloMobileDetector(args.torch), frames, batch_size, args.warmup)
+    fp32_lat, fp32_conf, fp32_elapsed = run_model(OnnxMobileDetector(args.fp32), frames, batch_size, args.warmup)
+    int8_lat, int8_conf, int8_elapsed = run_model(OnnxMobileDetector(args.int8), frames, batch_size, args.warmup)
+
+    print(f"Frames: {len(frames)} from {args.frames} (batch {batch_size})")
+    if torch_conf is not None:
+        print_timing("torch", torch_lat, torch_elapsed)
+    print_timing("fp32", fp32_lat, fp32_elapsed)
+    print_timing("int8", int8_lat, int8_elapsed)
+    print(f"Speed-up: {statistics.mean(fp32_lat) / max(1e-9, statistics.mean(int8_lat)):.2f}x")
+
+    # The .pt model is the reference the ONNX exports are meant to reproduce.
+    if torch_conf is not None:
+        print_agreement("fp32 vs torch", torch_conf, fp32_conf, args.threshold)
+        print_agreement("int8 vs torch", torch_conf, int8_conf, args.threshold)
+    print_agreement("int8 vs fp32", fp32_conf, int8_conf, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
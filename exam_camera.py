@@ -1,11 +1,24 @@
 import time
 import threading
+from concurrent.futures import Future, wait
 
 import cv2
 import numpy as np
 import streamlit as st
 
-from exam_config import MAX_SCAN_INDEX
+from exam_clips import PreRollBuffer
+from exam_config import CLIP_ENABLED, MAX_SCAN_INDEX, SCAN_PROBE_TIMEOUT, SHARED_FRAME_BUFFERS
+from exam_shm import FrameRef, FrameRing, ring_shape
+
+# DSHOW is often more stable with USB webcams; fall back as needed.
+LOCAL_BACKENDS = (cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY)
+
+# Source -> backend that last opened it; _open_capture tries it first.
+_working_backends = {}
+
+# Index -> Future of a probe that has not returned yet (possibly from an earlier scan).
+_probing = {}
+_probing_lock = threading.Lock()
 
 
 def source_to_capture_arg(source: str):
@@ -37,21 +50,113 @@ def _warmup_read(cap, attempts: int = 6, delay: float = 0.05) -> bool:
     return False
 
 
-def scan_cameras() -> list[str]:
-    found = []
-    for idx in range(MAX_SCAN_INDEX):
-        cap = _try_open(idx, cv2.CAP_DSHOW)
+def _probe_index(idx: int):
+    """Return the first backend that opens camera ``idx`` and delivers a frame, or None."""
+    for backend in LOCAL_BACKENDS:
+        cap = _try_open(idx, backend)
         if cap is None:
-            cap = _try_open(idx, cv2.CAP_MSMF)
-        if cap is None:
-            cap = _try_open(idx, cv2.CAP_ANY)
-        if cap is not None:
+            continue
+        try:
             if _warmup_read(cap):
-                found.append(str(idx))
+                return backend
+        finally:
             cap.release()
+    return None
+
+
+def _start_probe(idx: int) -> Future:
+    """Probe ``idx`` on a daemon thread, or join the probe already running for it."""
+    with _probing_lock:
+        future = _probing.get(idx)
+        if future is not None:
+            return future
+        future = _probing[idx] = Future()
+
+    def run():
+        try:
+            future.set_result(_probe_index(idx))
+        except Exception as exc:
+            future.set_exception(exc)
+        finally:
+            with _probing_lock:
+                _probing.pop(idx, None)
+
+    # Daemon threads, so a driver call that never returns cannot hold up interpreter exit.
+    threading.Thread(target=run, name=f"camscan-{idx}", daemon=True).start()
+    return future
+
+
+def scan_cameras(in_use=(), timeout: float = SCAN_PROBE_TIMEOUT) -> list[str]:
+    """Probe all local indices in parallel and cache the backend that worked for each.
+
+    Sources in ``in_use`` are already streaming, so they count as found without
+    being reopened. Probes that outlive ``timeout`` are abandoned; their thread
+    releases the device when the driver finally returns, and later scans wait
+    on that probe instead of opening the device again.
+    """
+    in_use = {str(source) for source in in_use}
+    futures = {
+        idx: _start_probe(idx)
+        for idx in range(MAX_SCAN_INDEX)
+        if str(idx) not in in_use
+    }
+    done, _ = wait(futures.values(), timeout=timeout)
+
+    found = []
+    for idx in range(MAX_SCAN_INDEX):
+        source = str(idx)
+        future = futures.get(idx)
+        if future is None:
+            found.append(source)
+            continue
+        if future not in done:
+            continue
+        backend = future.result() if future.exception() is None else None
+        if backend is None:
+            _working_backends.pop(source, None)
+            continue
+        _working_backends[source] = backend
+        found.append(source)
     return found
 
 
+def working_backend_names() -> dict:
+    return {source: cv2.videoio_registry.getBackendName(backend) for source, backend in _working_backends.items()}
+
+
+class CameraScan:
+    """Runs scan_cameras() on a background thread; status() is cheap to poll."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status = {"state": "idle", "found": [], "error": "", "started_at": None, "finished_at": None}
+
+    def start(self, in_use=(), on_done=None) -> dict:
+        """Start a scan unless one is running; ``on_done(found)`` runs on the scan thread."""
+        with self._lock:
+            if self._status["state"] == "running":
+                return dict(self._status)
+            self._status = {"state": "running", "found": [], "error": "", "started_at": time.time(), "finished_at": None}
+        threading.Thread(target=self._run, args=(list(in_use), on_done), name="camscan", daemon=True).start()
+        return self.status()
+
+    def _run(self, in_use: list, on_done) -> None:
+        try:
+            found, error = scan_cameras(in_use), ""
+        except Exception as exc:
+            found, error = [], f"{type(exc).__name__}: {exc}"
+        with self._lock:
+            self._status.update(state="done", found=found, error=error, finished_at=time.time())
+        if on_done is not None and not error:
+            on_done(found)
+
+    def status(self) -> dict:
+        with self._lock:
+            status = dict(self._status, found=list(self._status["found"]))
+        status["backends"] = working_backend_names()
+        return status
+
+
 def offline_frame(text: str) -> np.ndarray:
     frame = np.zeros((360, 640, 3), dtype=np.uint8)
     cv2.putText(frame, text, (120, 185), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (220, 220, 220), 2)
@@ -76,20 +181,26 @@ def release_all_captures() -> None:
 def _open_capture(source: str):
     arg = source_to_capture_arg(source)
     if isinstance(arg, int):
-        # DSHOW is often more stable with USB webcams; fall back as needed.
-        backends = [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]
+        backends = list(LOCAL_BACKENDS)
     elif is_network_source(source):
         # Network streams are more reliable through FFmpeg / generic backend.
         backends = [cv2.CAP_FFMPEG, cv2.CAP_ANY]
     else:
         backends = [cv2.CAP_ANY]
+    key = source.strip()
+    cached = _working_backends.get(key)
+    if cached is not None:
+        # A scan or an earlier open already found the backend that works here.
+        backends = [cached] + [backend for backend in backends if backend != cached]
 
     cap = None
     for backend in backends:
         cap = _try_open(arg, backend)
         if cap is not None:
+            _working_backends[key] = backend
             break
     if cap is None:
+        _working_backends.pop(key, None)
         cap = cv2.VideoCapture(arg)
     return cap
 
@@ -97,6 +208,7 @@ def _open_capture(source: str):
 def _worker_loop(source: str, state: dict) -> None:
     cap = None
     read_fail_streak = 0
+    retired = []
     while not state["stop_event"].is_set():
         if cap is None:
             cap = _open_capture(source)
@@ -127,10 +239,33 @@ def _worker_loop(source: str, state: dict) -> None:
         ok, frame = cap.read()
         if ok and frame is not None:
             read_fail_streak = 0
+            captured_at = time.time()
+            seq = None
+            if state["preroll"] is not None:
+                state["preroll"].push(frame, captured_at, flip=True)
+            if SHARED_FRAME_BUFFERS:
+                ring = state["ring"]
+                shape = ring_shape(frame.shape)
+                if ring is None or not ring.fits(shape):
+                    # Sized from the negotiated capture shape; readers may still hold
+                    # a replaced ring, so it is only closed when this thread ends.
+                    ring = FrameRing(max_shape=shape)
+                    if state["ring"] is not None:
+                        # Continue the sequence so readers never see a number repeat.
+                        ring.meta[4] = state["ring"].latest_seq
+                        retired.append(state["ring"])
+                    with state["lock"]:
+                        state["ring"] = ring
+                # Mirror straight into the shared slot; readers copy it out and re-check its seq.
+                seq = ring.write(frame, flip=True)
+                frame = None
             with state["lock"]:
-                state["frame"] = frame
+                if frame is not None:
+                    state["frame"] = frame
+                state["seq"] = seq if seq is not None else state["seq"] + 1
+                state["captured_at"] = captured_at
                 state["status"] = "Connected"
-                state["last_ok"] = time.time()
+                state["last_ok"] = captured_at
             # Avoid CPU spin when camera delivers frames very quickly.
             time.sleep(0.01)
             continue
@@ -155,6 +290,9 @@ def _worker_loop(source: str, state: dict) -> None:
             cap.release()
         except Exception:
             pass
+    for ring in retired + [state["ring"]]:
+        if ring is not None:
+            ring.close()
 
 
 def _ensure_worker(source: str) -> dict:
@@ -164,6 +302,11 @@ def _ensure_worker(source: str) -> dict:
 
     state = {
         "frame": None,
+        # Created by the capture thread once the first frame shows the capture size.
+        "ring": None,
+        "preroll": PreRollBuffer() if CLIP_ENABLED else None,
+        "seq": 0,
+        "captured_at": 0.0,
         "status": "Reconnecting",
         "last_ok": 0.0,
         "lock": threading.Lock(),
@@ -187,20 +330,41 @@ def _stop_worker(source: str) -> None:
         thread.join(timeout=0.4)
 
 
+def preroll_buffer(source: str):
+    state = st.session_state.cam_workers.get(source)
+    return state["preroll"] if state is not None else None
+
+
 def read_feed_frame(source: str) -> np.ndarray:
     state = _ensure_worker(source)
 
     with state["lock"]:
-        frame = None if state["frame"] is None else state["frame"].copy()
+        # The worker swaps in a new array per read, so holding the reference is safe.
+        frame = state["frame"]
+        seq = state["seq"]
+        captured_at = state["captured_at"]
         status = state["status"]
         last_ok = state["last_ok"]
 
     st.session_state.feed_status[source] = status
     st.session_state.cam_last_ok[source] = last_ok
 
+    ring = state["ring"]
+    if ring is not None:
+        latest = ring.latest()
+        if latest is None:
+            st.session_state.feed_frame_refs.pop(source, None)
+            return np.zeros((360, 640, 3), dtype=np.uint8)
+        # Already mirrored by the capture thread; the copy was validated against the slot's seq.
+        seq, captured_at, frame = latest
+        st.session_state.feed_frame_refs[source] = FrameRef(ring.name, seq)
+        st.session_state.feed_frame_seq[source] = seq
+        st.session_state.feed_frame_ts[source] = captured_at
+        return frame
+
     # If no new frame, keep showing last good frame
-    if frame is None:
-        last_frame = st.session_state.get("last_good_frame_" + source)
+    last_frame = st.session_state.get("last_good_frame_" + source)
+    if frame is None or (last_frame is not None and seq == st.session_state.feed_frame_seq.get(source)):
         if last_frame is not None:
             return last_frame
         return np.zeros((360, 640, 3), dtype=np.uint8)
@@ -208,4 +372,15 @@ def read_feed_frame(source: str) -> np.ndarray:
     # If frame exists, flip and store it
     flipped = cv2.flip(frame, 1)
     st.session_state["last_good_frame_" + source] = flipped
+    st.session_state.feed_frame_seq[source] = seq
+    st.session_state.feed_frame_ts[source] = captured_at
     return flipped
+
+
+def has_new_frame(source: str) -> bool:
+    seq = st.session_state.feed_frame_seq.get(source, 0)
+    return seq > 0 and seq != st.session_state.feed_analyzed_seq.get(source, 0)
+
+
+def mark_analyzed(source: str) -> None:
+    st.session_state.feed_analyzed_seq[source] = st.session_state.feed_frame_seq.get(source, 0)
@@ -0,0 +1,184 @@
+import collections
+import os
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+import streamlit as st
+
+from exam_config import (
+    CLIP_BUFFER_BYTES,
+    CLIP_CODEC,
+    CLIP_DIR,
+    CLIP_FLUSH_TIMEOUT,
+    CLIP_FPS,
+    CLIP_JPEG_QUALITY,
+    CLIP_POST_ROLL,
+    CLIP_PRE_ROLL,
+    CLIP_QUEUE_SIZE,
+    CLIP_WIDTH,
+)
+from exam_store import ensure_incident_store
+
+
+class PreRollBuffer:
+    """The last CLIP_PRE_ROLL + CLIP_POST_ROLL seconds of one feed as JPEG bytes.
+
+    push() runs on the capture thread and samples at CLIP_FPS. Memory is capped
+    by the frame count and by ``max_bytes``, whichever is hit first.
+    """
+
+    def __init__(self, fps: int = CLIP_FPS, seconds: float = CLIP_PRE_ROLL + CLIP_POST_ROLL,
+                 max_bytes: int = CLIP_BUFFER_BYTES):
+        self.interval = 1.0 / max(1, fps)
+        self.max_bytes = max_bytes
+        self._frames = collections.deque(maxlen=max(1, int(round(seconds * fps))))
+        self._bytes = 0
+        self._last_ts = 0.0
+        self._lock = threading.Lock()
+
+    def push(self, frame_bgr: np.ndarray, ts: float, flip: bool = False) -> None:
+        if ts - self._last_ts < self.interval:
+            return
+        self._last_ts = ts
+        h, w = frame_bgr.shape[:2]
+        if w > CLIP_WIDTH:
+            frame_bgr = cv2.resize(frame_bgr, (CLIP_WIDTH, int(h * CLIP_WIDTH / w)), interpolation=cv2.INTER_AREA)
+        if flip:
+            frame_bgr = cv2.flip(frame_bgr, 1)
+        ok, buf = cv2.imencode(".jpg", frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, CLIP_JPEG_QUALITY])
+        if not ok:
+            return
+        data = buf.tobytes()
+        with self._lock:
+            if len(self._frames) == self._frames.maxlen:
+                self._bytes -= len(self._frames[0][1])
+            self._frames.append((ts, data))
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes and len(self._frames) > 1:
+                self._bytes -= len(self._frames.popleft()[1])
+
+    def window(self, start: float, end: float) -> list[tuple[float, bytes]]:
+        with self._lock:
+            return [(ts, data) for ts, data in self._frames if start <= ts <= end]
+
+
+def clip_path(source: str, ts: float) -> str:
+    stamp = datetime.fromtimestamp(ts).strftime("%Y%m%d_%H%M%S_%f")[:-3]
+    return os.path.join(CLIP_DIR, f"feed_{source.replace(':', '_').replace('/', '_')}_{stamp}.mp4")
+
+
+def write_clip(frames: list[tuple[float, bytes]], path: str, fps: int = CLIP_FPS) -> bool:
+    """Encode buffered JPEG frames to an MP4 at ``path`` with PyAV."""
+    import av
+
+    images = [cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR) for _, data in frames]
+    images = [img for img in images if img is not None]
+    if not images:
+        return False
+    h, w = images[0].shape[:2]
+    # yuv420p needs even dimensions.
+    w, h = w - w % 2, h - h % 2
+
+    container = av.open(path, mode="w")
+    try:
+        try:
+            stream = container.add_stream(CLIP_CODEC, rate=fps)
+        except Exception:
+            stream = container.add_stream("mpeg4", rate=fps)
+        stream.width = w
+        stream.height = h
+        stream.pix_fmt = "yuv420p"
+        for img in images:
+            if img.shape[:2] != (h, w):
+                img = cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA)
+            for packet in stream.encode(av.VideoFrame.from_ndarray(img, format="bgr24")):
+                container.mux(packet)
+        for packet in stream.encode():
+            container.mux(packet)
+    finally:
+        container.close()
+    return True
+
+
+class ClipRecorder:
+    """Encodes incident clips on a background thread, never on the caller's.
+
+    submit() only queues. Each clip is written once its post-roll has been
+    captured; the incident's "clip" field keeps the planned path, or is cleared
+    when the clip was dropped or could not be written, and then
+    ``on_cleared(incident)`` is called.
+    """
+
+    def __init__(self, max_pending: int = CLIP_QUEUE_SIZE, on_cleared=None):
+        self.max_pending = max_pending
+        self.on_cleared = on_cleared
+        self.dropped = 0
+        self._pending = collections.deque()
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, buffer: PreRollBuffer, incident: dict, at: float) -> bool:
+        """Queue a clip around ``at``; returns False when an older pending clip had to be dropped."""
+        dropped = None
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                dropped = self._pending.popleft()
+                self.dropped += 1
+            self._pending.append((buffer, incident, at))
+            self._cond.notify_all()
+        if dropped is not None:
+            self._clear(dropped[1])
+        return dropped is None
+
+    def _clear(self, incident: dict) -> None:
+        incident["clip"] = ""
+        if self.on_cleared is not None:
+            self.on_cleared(incident)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                # Requests arrive in time order, so the head is always due first.
+                buffer, incident, at = self._pending[0]
+                wait = at + CLIP_POST_ROLL - time.time()
+                if wait > 0 and not self._closed:
+                    self._cond.wait(wait)
+                    continue
+                self._pending.popleft()
+            path = incident.get("clip", "")
+            try:
+                ok = bool(path) and write_clip(buffer.window(at - CLIP_PRE_ROLL, at + CLIP_POST_ROLL), path)
+            except Exception:
+                ok = False
+            if not ok and path:
+                self._clear(incident)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def close(self, timeout: float = CLIP_FLUSH_TIMEOUT) -> None:
+        # Pending clips are written right away, with whatever post-roll was captured.
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
+
+
+def ensure_clip_recorder() -> ClipRecorder:
+    if st.session_state.clip_recorder is None:
+        os.makedirs(CLIP_DIR, exist_ok=True)
+        st.session_state.clip_recorder = ClipRecorder(on_cleared=ensure_incident_store().update_paths)
+    return st.session_state.clip_recorder
+
+
+def close_clip_recorder() -> None:
+    if st.session_state.clip_recorder is not None:
+        st.session_state.clip_recorder.close()
+        st.session_state.clip_recorder = None
@@ -0,0 +1,192 @@
+import os
+import threading
+
+import streamlit as st
+
+from exam_config import COLUMNAR_EXPORT, COLUMNAR_ROW_GROUP, COLUMNAR_SIGNAL_SAMPLES
+from exam_incidents import session_log_dir
+from exam_state import add_event
+
+SEVERITY_CODES = {"OFFLINE": -1, "NORMAL": 0, "WARNING": 1, "ALERT": 2, "HIGH ALERT": 3}
+INCIDENTS_FILE = "incidents.parquet"
+SIGNALS_FILE = "signals.parquet"
+
+
+def _schemas(pa) -> dict:
+    return {
+        INCIDENTS_FILE: pa.schema(
+            [
+                ("incident_id", pa.int64()),
+                ("session", pa.string()),
+                ("ts", pa.timestamp("ms")),
+                ("feed", pa.string()),
+                ("candidate", pa.string()),
+                ("severity", pa.string()),
+                ("severity_code", pa.int8()),
+                ("mobile_alert", pa.bool_()),
+                ("talking_alert", pa.bool_()),
+                ("paper_alert", pa.bool_()),
+                ("head_turn_alert", pa.bool_()),
+                ("turn_score", pa.float32()),
+                ("talk_ratio", pa.float32()),
+                ("yolo_conf", pa.float32()),
+                ("final_score", pa.float32()),
+                ("feed_risk", pa.float32()),
+                ("risk_score", pa.int32()),
+                ("snapshot", pa.string()),
+                ("clip", pa.string()),
+            ]
+        ),
+        SIGNALS_FILE: pa.schema(
+            [
+                ("session", pa.string()),
+                ("ts", pa.timestamp("ms")),
+                ("feed", pa.string()),
+                ("face_found", pa.bool_()),
+                ("turn_score", pa.float32()),
+                ("talk_ratio", pa.float32()),
+                ("yolo_conf", pa.float32()),
+                ("rule_score", pa.float32()),
+                ("final_score", pa.float32()),
+                ("risk_score", pa.float32()),
+                ("severity_code", pa.int8()),
+            ]
+        ),
+    }
+
+
+class ColumnarExporter:
+    """Buffers typed incident and signal rows and appends them to Parquet files
+    one row group at a time. A file only gets its footer on close(), so readers
+    should use the exports of finished sessions.
+
+    Each exporter writes new part files (incidents-000.parquet, -001, ...), so a
+    session stopped and started again adds parts instead of truncating earlier
+    ones; read a session's export as the dataset of its parts. As in the CSV
+    log, the last incident row with a given incident_id is the current one.
+    """
+
+    def __init__(self, directory: str, session: str, samples: bool = COLUMNAR_SIGNAL_SAMPLES, row_group: int = COLUMNAR_ROW_GROUP):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(directory, exist_ok=True)
+        self._pa = pa
+        self._pq = pq
+        self.directory = directory
+        self.session = session
+        self.samples = samples
+        self.row_group = row_group
+        self._schemas = _schemas(pa)
+        self._rows = {name: [] for name in self._schemas}
+        self._writers = {}
+        self._last_sample = {}
+        self._lock = threading.Lock()
+
+    def add_incident(self, incident: dict, metrics: dict = None) -> None:
+        metrics = metrics or {}
+        self._append(
+            INCIDENTS_FILE,
+            {
+                "incident_id": incident.get("incident_id"),
+                "session": self.session,
+                "ts": int(incident["ts"] * 1000),
+                "feed": incident["feed"],
+                "candidate": incident.get("candidate"),
+                "severity": incident["severity"],
+                "severity_code": SEVERITY_CODES.get(incident["severity"], 0),
+                "mobile_alert": metrics.get("mobile_alert"),
+                "talking_alert": metrics.get("talking_alert"),
+                "paper_alert": metrics.get("paper_alert"),
+                "head_turn_alert": metrics.get("head_turn_alert"),
+                "turn_score": metrics.get("turn_score"),
+                "talk_ratio": metrics.get("talk_ratio"),
+                "yolo_conf": metrics.get("yolo_conf"),
+                "final_score": metrics.get("final_score"),
+                "feed_risk": metrics.get("risk_score"),
+                "risk_score": incident.get("risk_score"),
+                "snapshot": incident.get("snapshot"),
+                "clip": incident.get("clip"),
+            },
+        )
+
+    def add_samples(self, metrics_by_source: dict) -> None:
+        """Record one signal row per feed that was analysed since its last sample."""
+        if not self.samples:
+            return
+        for source, metrics in metrics_by_source.items():
+            # Motion-gated feeds keep their previous metrics; skip those repeats.
+            if not metrics or metrics["analyzed_at"] <= self._last_sample.get(source, 0.0):
+                continue
+            self._last_sample[source] = metrics["analyzed_at"]
+            self._append(
+                SIGNALS_FILE,
+                {
+                    "session": self.session,
+                    "ts": int(metrics["analyzed_at"] * 1000),
+                    "feed": source,
+                    "face_found": metrics["face_found"],
+                    "turn_score": metrics["turn_score"],
+                    "talk_ratio": metrics["talk_ratio"],
+                    "yolo_conf": metrics["yolo_conf"],
+                    "rule_score": metrics["rule_score"],
+                    "final_score": metrics["final_score"],
+                    "risk_score": metrics["risk_score"],
+                    "severity_code": SEVERITY_CODES.get(metrics["severity"], 0),
+                },
+            )
+
+    def _append(self, name: str, row: dict) -> None:
+        with self._lock:
+            rows = self._rows[name]
+            rows.append(row)
+            if len(rows) >= self.row_group:
+                self._write_locked(name)
+
+    def _part_path(self, name: str) -> str:
+        base, ext = os.path.splitext(name)
+        part = 0
+        while os.path.exists(os.path.join(self.directory, f"{base}-{part:03d}{ext}")):
+            part += 1
+        return os.path.join(self.directory, f"{base}-{part:03d}{ext}")
+
+    def _write_locked(self, name: str) -> None:
+        rows = self._rows[name]
+        if not rows:
+            return
+        writer = self._writers.get(name)
+        if writer is None:
+            writer = self._pq.ParquetWriter(self._part_path(name), self._schemas[name], compression="zstd")
+            self._writers[name] = writer
+        writer.write_table(self._pa.Table.from_pylist(rows, schema=self._schemas[name]))
+        self._rows[name] = []
+
+    def close(self) -> None:
+        with self._lock:
+            for name in self._rows:
+                self._write_locked(name)
+            for writer in self._writers.values():
+                writer.close()
+            self._writers = {}
+
+
+def ensure_columnar_exporter():
+    """Return the session's exporter, or None when export is off or pyarrow is missing."""
+    if not COLUMNAR_EXPORT or st.session_state.columnar_exporter is False:
+        return None
+    if st.session_state.columnar_exporter is None:
+        started_at = st.session_state.session_started_at
+        try:
+            st.session_state.columnar_exporter = ColumnarExporter(session_log_dir(started_at), started_at)
+        except ImportError:
+            # Remember the failure so the import is not retried on every frame.
+            st.session_state.columnar_exporter = False
+            add_event("Columnar export disabled: pyarrow is not installed")
+            return None
+    return st.session_state.columnar_exporter
+
+
+def close_columnar_exporter() -> None:
+    if st.session_state.columnar_exporter:
+        st.session_state.columnar_exporter.close()
+    st.session_state.columnar_exporter = None
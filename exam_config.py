@@ -3,6 +3,168 @@ import os
 REPORT_DIR = "reports"
 SNAPSHOT_DIR = "snapshots"
 MAX_SCAN_INDEX = 8
+# Camera scans probe every index at once; a probe still opening after
+# SCAN_PROBE_TIMEOUT seconds counts as no camera.
+SCAN_PROBE_TIMEOUT = 4.0
+
+# Phone detector: "torch" runs best.pt through ultralytics, "onnx" runs the
+# exported graph on an onnxruntime CPU session without importing torch and
+# "onnx-int8" runs the quantized variant built by exam_quantize.
+PHONE_MODEL_BACKEND = os.environ.get("EXAM_PHONE_BACKEND", "torch").strip().lower()
+PHONE_MODEL_PATH = "best.pt"
+PHONE_ONNX_PATH = "best.onnx"
+PHONE_INT8_PATH = "best.int8.onnx"
+PHONE_INPUT_SIZE = 416
+
+# Detection worker processes; 0 keeps detection in the server process.
+DETECTION_WORKERS = int(os.environ.get("EXAM_DETECTION_WORKERS", "0"))
+DETECTION_TIMEOUT = 5.0
+
+# Per-feed FaceMesh/Hands instances run on this many threads and are closed
+# after DETECTOR_IDLE_TIMEOUT seconds without a frame from their feed.
+DETECTION_THREADS = int(os.environ.get("EXAM_DETECTION_THREADS", str(min(4, os.cpu_count() or 1))))
+DETECTOR_IDLE_TIMEOUT = 60.0
+
+# Before monitoring counts as ACTIVE, every model runs WARMUP_RUNS times on
+# synthetic frames of WARMUP_FRAME_SHAPE (the capture size the camera threads
+# request); the first run is reported as cold latency, the median of the rest
+# as warm. Warm-up gives up after WARMUP_TIMEOUT seconds and a failed warm-up
+# is retried every WARMUP_RETRY_DELAY seconds while monitoring is active.
+WARMUP_RUNS = 5
+WARMUP_FRAME_SHAPE = (240, 320, 3)
+WARMUP_TIMEOUT = 120.0
+WARMUP_RETRY_DELAY = 10.0
+
+# Adaptive detection scheduler. Each feed gets a target analysis period between
+# ANALYSIS_MIN_INTERVAL (highest risk) and ANALYSIS_CALM_INTERVAL (calm), and is
+# always analyzed at least every ANALYSIS_MAX_INTERVAL seconds. Per tick, the
+# estimated model time of the chosen feeds stays within ANALYSIS_CPU_BUDGET
+# seconds per detection process.
+ANALYSIS_TICK = 0.22
+ANALYSIS_CPU_BUDGET = 0.25
+ANALYSIS_MIN_INTERVAL = 0.25
+ANALYSIS_CALM_INTERVAL = 1.2
+ANALYSIS_MAX_INTERVAL = 2.0
+DEFAULT_ANALYSIS_COST = 0.05
+
+# Motion gate: heavy models only run when the scene thumbnail changed by more
+# than MOTION_GATE_THRESHOLD grey levels (mean abs diff), or when the last full
+# analysis of the feed is older than MOTION_GATE_MAX_INTERVAL seconds.
+MOTION_GATE_ENABLED = True
+MOTION_GATE_THRESHOLD = 2.5
+MOTION_GATE_MAX_INTERVAL = 2.0
+MOTION_THUMB_SIZE = (32, 24)
+
+# Capture writes each frame once into a shared-memory ring per feed; detection
+# workers and stream encoders read slots in place instead of copying frames.
+# A ring is sized from the feed's first captured frame (capped at
+# FRAME_RING_MAX_SHAPE) and replaced if a reconnect delivers larger frames.
+# Detection workers unmap rings they have not read for FRAME_RING_IDLE_TIMEOUT.
+SHARED_FRAME_BUFFERS = os.environ.get("EXAM_SHARED_FRAMES", "0") == "1"
+FRAME_RING_SLOTS = 6
+FRAME_RING_MAX_SHAPE = (1080, 1920, 3)
+FRAME_RING_IDLE_TIMEOUT = 30.0
+
+# MJPEG streaming: each new frame is JPEG-encoded once and shared by every
+# /frame and /stream client; streams send at most one part per STREAM_MIN_INTERVAL.
+STREAM_JPEG_QUALITY = 80
+STREAM_MIN_INTERVAL = 0.08
+STREAM_IDLE_WAIT = 1.0
+
+# Per-client stream tiers as (max width, JPEG quality), best first. A client
+# starts at the tier for its requested width and steps down while each part
+# takes more than STREAM_SLOW_RATIO of its frame interval to drain, and back
+# up after STREAM_UPGRADE_AFTER parts drained within STREAM_FAST_RATIO.
+STREAM_TIERS = ((1280, 80), (960, 75), (640, 70), (480, 60), (320, 50))
+STREAM_DEFAULT_WIDTH = 640
+STREAM_SLOW_RATIO = 0.5
+STREAM_FAST_RATIO = 0.1
+STREAM_UPGRADE_AFTER = 25
+
+# /mosaic tiles every feed into one frame of MOSAIC_TILE_SIZE (w, h) cells
+# with the status colour drawn as a MOSAIC_BORDER px border.
+MOSAIC_TILE_SIZE = (480, 270)
+MOSAIC_BORDER = 4
+
+# Optional WebRTC preview (needs aiortc/av): each feed is published as one
+# relayed track at WEBRTC_FPS, preferring WEBRTC_CODEC ("h264" or "vp8").
+# Peers get host ICE candidates only, which is enough on localhost and a LAN.
+WEBRTC_ENABLED = os.environ.get("EXAM_WEBRTC", "0") == "1"
+WEBRTC_FPS = 15
+WEBRTC_CODEC = os.environ.get("EXAM_WEBRTC_CODEC", "h264").strip().lower()
+WEBRTC_OFFER_TIMEOUT = 10.0
+
+# Dashboard state is pushed over /api/events; idle connections get a comment
+# line every SSE_KEEPALIVE seconds so proxies keep them open.
+SSE_KEEPALIVE = 15.0
+
+
+# Incident snapshots are JPEG-encoded and written by a background thread. At
+# most SNAPSHOT_QUEUE_SIZE frames wait; when full, "drop-oldest" discards the
+# oldest pending frame at once, "block" first waits SNAPSHOT_BLOCK_TIMEOUT
+# seconds for room. Shutdown waits up to SNAPSHOT_FLUSH_TIMEOUT for the rest.
+SNAPSHOT_QUEUE_SIZE = 32
+SNAPSHOT_QUEUE_POLICY = "drop-oldest"
+SNAPSHOT_BLOCK_TIMEOUT = 0.5
+SNAPSHOT_FLUSH_TIMEOUT = 5.0
+SNAPSHOT_JPEG_QUALITY = 90
+
+# Each session's snapshots go to SNAPSHOT_DIR/<session start>/ with an index
+# file. A frame whose 64-bit dHash is within SNAPSHOT_HASH_DISTANCE bits of one
+# of the feed's last SNAPSHOT_DEDUPE_HISTORY snapshots reuses that file. Past
+# SNAPSHOT_SESSION_BUDGET bytes per session, the oldest snapshots are deleted.
+SNAPSHOT_HASH_DISTANCE = 6
+SNAPSHOT_DEDUPE_HISTORY = 4
+SNAPSHOT_SESSION_BUDGET = int(float(os.environ.get("EXAM_SNAPSHOT_BUDGET_MB", "500")) * 1024 * 1024)
+SNAPSHOT_INDEX_NAME = "index.json"
+
+
+# Incidents are appended to CSV logs under INCIDENT_LOG_DIR/<session start>/
+# as they happen (one session log plus one per feed). Writes are buffered and
+# fsynced every INCIDENT_LOG_FSYNC_INTERVAL seconds.
+INCIDENT_LOG_DIR = os.path.join(REPORT_DIR, "sessions")
+INCIDENT_LOG_FSYNC_INTERVAL = 2.0
+INCIDENT_LOG_BUFFER = 64 * 1024
+
+
+# SQLite incident store (WAL). Incidents are queued and a background thread
+# inserts them in one transaction once INCIDENT_STORE_BATCH accumulate, every
+# INCIDENT_STORE_FLUSH_INTERVAL seconds, and before any query. The CSV log and
+# Parquet export get each row after it is stored. Only the newest
+# INCIDENT_MEMORY_LIMIT incidents are also kept in session state.
+INCIDENT_DB_PATH = os.path.join(REPORT_DIR, "incidents.sqlite3")
+INCIDENT_STORE_BATCH = 50
+INCIDENT_STORE_FLUSH_INTERVAL = 1.0
+INCIDENT_MEMORY_LIMIT = 1000
+
+
+# Columnar (Parquet) export next to the session's CSV logs: typed incident rows
+# always, and one row per analysed frame when COLUMNAR_SIGNAL_SAMPLES is set.
+# Rows are written in row groups of COLUMNAR_ROW_GROUP during the session.
+COLUMNAR_EXPORT = os.environ.get("EXAM_COLUMNAR_EXPORT", "1") == "1"
+COLUMNAR_SIGNAL_SAMPLES = os.environ.get("EXAM_SIGNAL_SAMPLES", "0") == "1"
+COLUMNAR_ROW_GROUP = 1024
+
+
+# Incident clips: each feed keeps its last CLIP_PRE_ROLL + CLIP_POST_ROLL
+# seconds in memory as JPEGs (CLIP_FPS, at most CLIP_WIDTH px wide), capped at
+# CLIP_BUFFER_BYTES per feed. A background thread writes the clip around each
+# incident to CLIP_DIR once its post-roll is in; at most CLIP_QUEUE_SIZE wait.
+CLIP_ENABLED = os.environ.get("EXAM_CLIPS", "1") == "1"
+CLIP_DIR = os.path.join(REPORT_DIR, "clips")
+CLIP_PRE_ROLL = 5.0
+CLIP_POST_ROLL = 3.0
+CLIP_FPS = 8
+CLIP_WIDTH = 480
+CLIP_JPEG_QUALITY = 70
+CLIP_BUFFER_BYTES = 6 * 1024 * 1024
+CLIP_QUEUE_SIZE = 8
+CLIP_FLUSH_TIMEOUT = 10.0
+CLIP_CODEC = "libx264"
+
+
+# Per-camera PDF reports are rendered in this many spawned worker processes.
+REPORT_WORKERS = int(os.environ.get("EXAM_REPORT_WORKERS", str(min(4, os.cpu_count() or 1))))
 
 
 def ensure_dirs() -> None:
@@ -1,44 +1,136 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
-import mediapipe as mp
+import numpy as np
 import streamlit as st
-from ultralytics import YOLO
-import torch
+
+from exam_config import (
+    DETECTION_THREADS,
+    DETECTOR_IDLE_TIMEOUT,
+    MOTION_GATE_ENABLED,
+    MOTION_GATE_MAX_INTERVAL,
+    MOTION_GATE_THRESHOLD,
+    MOTION_THUMB_SIZE,
+    PHONE_INPUT_SIZE,
+    WARMUP_FRAME_SHAPE,
+    WARMUP_RUNS,
+)
+from exam_yolo import load_mobile_detector
 
 
 # ---------------- INITIALIZATION ---------------- #
 
-def ensure_detectors() -> None:
-    if st.session_state.face_mesh is None:
-        st.session_state.face_mesh = mp.solutions.face_mesh.FaceMesh(
+mp = None
+
+
+def load_mediapipe():
+    # mediapipe takes seconds to import, so it is loaded on first use or by the warm-up.
+    global mp
+    if mp is None:
+        import mediapipe
+
+        mp = mediapipe
+    return mp
+
+
+def _new_feed_detectors() -> dict:
+    load_mediapipe()
+    # One tracker pair per feed, so MediaPipe's frame-to-frame tracking only
+    # ever sees consecutive frames from the same camera.
+    return {
+        "face_mesh": mp.solutions.face_mesh.FaceMesh(
             max_num_faces=1,
             refine_landmarks=False,
             min_detection_confidence=0.6,
             min_tracking_confidence=0.6,
-        )
-
-    if st.session_state.hands is None:
-        st.session_state.hands = mp.solutions.hands.Hands(
+        ),
+        "hands": mp.solutions.hands.Hands(
             static_image_mode=False,
             max_num_hands=2,
             min_detection_confidence=0.6,
             min_tracking_confidence=0.6,
+        ),
+        "last_used": time.time(),
+    }
+
+
+def _close_feed_detectors(entry: dict) -> None:
+    entry["face_mesh"].close()
+    entry["hands"].close()
+
+
+def feed_detectors(source: str) -> dict:
+    entry = st.session_state.detector_pool.get(source)
+    if entry is None:
+        entry = _new_feed_detectors()
+        st.session_state.detector_pool[source] = entry
+    entry["last_used"] = time.time()
+    return entry
+
+
+def evict_idle_detectors(max_idle: float = DETECTOR_IDLE_TIMEOUT) -> None:
+    now = time.time()
+    for source, entry in list(st.session_state.detector_pool.items()):
+        if now - entry["last_used"] > max_idle:
+            _close_feed_detectors(st.session_state.detector_pool.pop(source))
+
+
+def ensure_detectors() -> None:
+    if st.session_state.landmark_executor is None:
+        st.session_state.landmark_executor = ThreadPoolExecutor(
+            max_workers=DETECTION_THREADS, thread_name_prefix="landmarks"
         )
 
     if "yolo_model" not in st.session_state:
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        model = YOLO("best.pt")
-        model.to(device)
-        st.session_state.yolo_model = model
+        st.session_state.yolo_model = load_mobile_detector()
+
+
+def _time_runs(fn, runs: int) -> dict:
+    samples = []
+    for _ in range(max(2, runs)):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    warm = sorted(samples[1:])
+    return {"cold_ms": round(samples[0], 1), "warm_ms": round(warm[len(warm) // 2], 1)}
+
+
+def warm_up_detectors(sources: list = (), runs: int = WARMUP_RUNS) -> dict:
+    """Run every model on synthetic frames and return stage -> {"cold_ms", "warm_ms"}.
+
+    FaceMesh/Hands are warmed on the pairs of ``sources`` (created here, so the
+    first real frames do not pay for them) or on a throwaway pair. Noise frames
+    hold no face or hands, so no tracking or smoothing state is left behind.
+    """
+    ensure_detectors()
+    rng = np.random.default_rng(0)
+    frames = [
+        rng.integers(0, 256, WARMUP_FRAME_SHAPE, dtype=np.uint8)
+        for _ in range(max(1, st.session_state.analysis_batch_size))
+    ]
+    rgb = cv2.cvtColor(cv2.resize(frames[0], (0, 0), fx=0.7, fy=0.7), cv2.COLOR_BGR2RGB)
+    pairs = [feed_detectors(source) for source in sources] or [_new_feed_detectors()]
+
+    latency = {"phone": _time_runs(lambda: yolo_phone_confidences(frames), runs)}
+    try:
+        for stage in ("face_mesh", "hands"):
+            per_pair = [_time_runs(lambda: pair[stage].process(rgb), runs) for pair in pairs]
+            latency[stage] = {key: max(p[key] for p in per_pair) for key in ("cold_ms", "warm_ms")}
+    finally:
+        if not sources:
+            _close_feed_detectors(pairs[0])
+    return latency
 
 
 def close_detectors() -> None:
-    if st.session_state.face_mesh is not None:
-        st.session_state.face_mesh.close()
-        st.session_state.face_mesh = None
+    for entry in st.session_state.detector_pool.values():
+        _close_feed_detectors(entry)
+    st.session_state.detector_pool = {}
 
-    if st.session_state.hands is not None:
-        st.session_state.hands.close()
-        st.session_state.hands = None
+    if st.session_state.landmark_executor is not None:
+        st.session_state.landmark_executor.shutdown(wait=True)
+        st.session_state.landmark_executor = None
 
 
 # ---------------- FEED STATE ---------------- #
@@ -77,160 +169,172 @@ def smooth_counter(source: str, key: str, active: bool, up: int = 1, down: int =
 
 # ---------------- MAIN DETECTION ---------------- #
 
-def detect_on_frame(source: str, frame_bgr):
-    init_feed_state(source)
-
-    # ---------------- FRAME SKIP (ANTI FREEZE FIX) ---------------- #
-    frame_key = f"{source}_frame_count"
-    if frame_key not in st.session_state:
-        st.session_state[frame_key] = 0
-
-    st.session_state[frame_key] += 1
-
-    # Run heavy detection every 3 frames for better responsiveness.
-    if st.session_state[frame_key] % 3 != 0:
-        return st.session_state.feed_signals[source]
-
-    # --------------------------------------------------------------- #
-
+def _record_stage_cost(source: str, stage: str, seconds: float) -> None:
+    # Smoothed per-stage wall time; the scheduler budgets analyses with it.
+    costs = st.session_state.feed_stage_costs.setdefault(source, {})
+    previous = costs.get(stage)
+    costs[stage] = seconds if previous is None else 0.8 * previous + 0.2 * seconds
+
+
+def _scene_changed(source: str, frame_bgr) -> bool:
+    # Tiny greyscale thumbnail: cheap to build and insensitive to sensor noise.
+    small = cv2.resize(frame_bgr, MOTION_THUMB_SIZE, interpolation=cv2.INTER_AREA)
+    thumb = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    now = time.time()
+    previous = st.session_state.motion_thumbs.get(source)
+    last_full = st.session_state.last_full_analysis_ts.get(source, 0.0)
+    if (
+        MOTION_GATE_ENABLED
+        and previous is not None
+        and now - last_full < MOTION_GATE_MAX_INTERVAL
+        and float(cv2.absdiff(thumb, previous).mean()) <= MOTION_GATE_THRESHOLD
+    ):
+        return False
+
+    # Compare against the last analyzed scene so slow drift still adds up.
+    st.session_state.motion_thumbs[source] = thumb
+    st.session_state.last_full_analysis_ts[source] = now
+    return True
+
+
+def _run_landmarks(detectors: dict, frame_bgr) -> tuple:
+    # Pure inference on the feed's own instances; safe to run beside other feeds.
+    started = time.perf_counter()
     resized = cv2.resize(frame_bgr, (0, 0), fx=0.7, fy=0.7)
     rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
 
-    face_res = st.session_state.face_mesh.process(rgb)
-    hands_res = st.session_state.hands.process(rgb)
-
-    signals = {
-        "mobile": False,
-        "talking": False,
-        "paper": False,
-        "head_turn": False,
+    face_res = detectors["face_mesh"].process(rgb)
+    hands_res = detectors["hands"].process(rgb)
+    return face_res, hands_res, time.perf_counter() - started
+
+
+def _landmark_stage(source: str, face_res, hands_res) -> dict:
+    stage = {
+        "signals": {
+            "mobile": False,
+            "talking": False,
+            "paper": False,
+            "head_turn": False,
+        },
+        "face_found": False,
+        "rule_score": 0.0,
+        "downward_alert": False,
+        "turn_score": 0.0,
+        "talk_ratio": 0.0,
     }
+    signals = stage["signals"]
 
-    final_score = 0.0
-    downward_alert = False
+    if not face_res.multi_face_landmarks:
+        return stage
 
-    face_lm = None
-    if face_res.multi_face_landmarks:
-        face_lm = face_res.multi_face_landmarks[0].landmark
+    face_lm = face_res.multi_face_landmarks[0].landmark
+    stage["face_found"] = True
 
     # ---------------- FACE LOGIC ---------------- #
 
-    if face_lm is not None:
-        nose = face_lm[1]
-        left_face = face_lm[234]
-        right_face = face_lm[454]
-
-        face_width = max(1e-6, right_face.x - left_face.x)
-
-        # Head Turn
-        left_gap = nose.x - left_face.x
-        right_gap = right_face.x - nose.x
-        turn_score = abs(left_gap - right_gap) / face_width
-        signals["head_turn"] = turn_score > 0.24
+    nose = face_lm[1]
+    left_face = face_lm[234]
+    right_face = face_lm[454]
 
-        # Talking
-        upper_lip = face_lm[13]
-        lower_lip = face_lm[14]
-        left_eye = face_lm[33]
-        right_eye = face_lm[263]
+    face_width = max(1e-6, right_face.x - left_face.x)
 
-        mouth_open = abs(lower_lip.y - upper_lip.y)
-        eye_width = max(1e-6, abs(right_eye.x - left_eye.x))
-        talk_ratio = mouth_open / eye_width
-        signals["talking"] = talk_ratio > 0.27
+    # Head Turn
+    left_gap = nose.x - left_face.x
+    right_gap = right_face.x - nose.x
+    turn_score = abs(left_gap - right_gap) / face_width
+    stage["turn_score"] = turn_score
+    signals["head_turn"] = turn_score > 0.24
 
-        # ---------------- DOWNWARD GAZE ---------------- #
+    # Talking
+    upper_lip = face_lm[13]
+    lower_lip = face_lm[14]
+    left_eye = face_lm[33]
+    right_eye = face_lm[263]
 
-        down_key = f"{source}_down_count"
-        if down_key not in st.session_state:
-            st.session_state[down_key] = 0
+    mouth_open = abs(lower_lip.y - upper_lip.y)
+    eye_width = max(1e-6, abs(right_eye.x - left_eye.x))
+    talk_ratio = mouth_open / eye_width
+    stage["talk_ratio"] = talk_ratio
+    signals["talking"] = talk_ratio > 0.27
 
-        eye_center_y = (left_eye.y + right_eye.y) / 2
-        looking_down = eye_center_y > nose.y + (0.18 * face_width)
+    # ---------------- DOWNWARD GAZE ---------------- #
 
-        if looking_down:
-            st.session_state[down_key] += 1
-        else:
-            st.session_state[down_key] = max(0, st.session_state[down_key] - 1)
+    down_key = f"{source}_down_count"
+    if down_key not in st.session_state:
+        st.session_state[down_key] = 0
 
-        downward_alert = st.session_state[down_key] > 6
+    eye_center_y = (left_eye.y + right_eye.y) / 2
+    looking_down = eye_center_y > nose.y + (0.18 * face_width)
 
-        # ---------------- HAND LOGIC ---------------- #
+    if looking_down:
+        st.session_state[down_key] += 1
+    else:
+        st.session_state[down_key] = max(0, st.session_state[down_key] - 1)
 
-        hand_near_head = False
-        hand_low_hold = False
+    downward_alert = st.session_state[down_key] > 6
+    stage["downward_alert"] = downward_alert
 
-        if hands_res.multi_hand_landmarks:
-            for hand in hands_res.multi_hand_landmarks:
+    # ---------------- HAND LOGIC ---------------- #
 
-                xs = [p.x for p in hand.landmark]
-                ys = [p.y for p in hand.landmark]
+    hand_near_head = False
+    hand_low_hold = False
 
-                cx = sum(xs) / len(xs)
-                cy = sum(ys) / len(ys)
+    if hands_res.multi_hand_landmarks:
+        for hand in hands_res.multi_hand_landmarks:
 
-                near_face = (
-                    abs(cx - nose.x) < (face_width * 1.7)
-                    and abs(cy - nose.y) < (face_width * 1.9)
-                )
+            xs = [p.x for p in hand.landmark]
+            ys = [p.y for p in hand.landmark]
 
-                hand_w = max(xs) - min(xs)
-                hand_h = max(ys) - min(ys)
-                vertical_hand = hand_h > (hand_w * 1.1)
+            cx = sum(xs) / len(xs)
+            cy = sum(ys) / len(ys)
 
-                if near_face and vertical_hand:
-                    hand_near_head = True
+            near_face = (
+                abs(cx - nose.x) < (face_width * 1.7)
+                and abs(cy - nose.y) < (face_width * 1.9)
+            )
 
-                avg_y = sum(ys) / len(ys)
-                if avg_y > nose.y + (0.25 * face_width):
-                    hand_low_hold = True
+            hand_w = max(xs) - min(xs)
+            hand_h = max(ys) - min(ys)
+            vertical_hand = hand_h > (hand_w * 1.1)
 
-                index_tip = hand.landmark[8]
-                prev_key = f"{source}_prev_index_y"
+            if near_face and vertical_hand:
+                hand_near_head = True
 
-                if prev_key not in st.session_state:
-                    st.session_state[prev_key] = index_tip.y
+            avg_y = sum(ys) / len(ys)
+            if avg_y > nose.y + (0.25 * face_width):
+                hand_low_hold = True
 
-                movement = abs(index_tip.y - st.session_state[prev_key])
-                if movement > 0.02:
-                    signals["mobile"] = True
+            index_tip = hand.landmark[8]
+            prev_key = f"{source}_prev_index_y"
 
+            if prev_key not in st.session_state:
                 st.session_state[prev_key] = index_tip.y
 
-        # ---------------- RULE SCORE ---------------- #
-
-        rule_mobile = hand_near_head or (downward_alert and hand_low_hold)
-        rule_score = 0.9 if rule_mobile else 0.0
+            movement = abs(index_tip.y - st.session_state[prev_key])
+            if movement > 0.02:
+                signals["mobile"] = True
 
-        # ---------------- YOLO DETECTION ---------------- #
+            st.session_state[prev_key] = index_tip.y
 
-        yolo_conf = 0.0
-        model = st.session_state.yolo_model
+    # ---------------- RULE SCORE ---------------- #
 
-        # 🔥 Reduced from 640 → 416 (Performance Boost)
-        small_frame = cv2.resize(frame_bgr, (416, 416))
-        results = model(small_frame, verbose=False)[0]
+    rule_mobile = hand_near_head or (downward_alert and hand_low_hold)
+    stage["rule_score"] = 0.9 if rule_mobile else 0.0
+    return stage
 
-        for box in results.boxes:
-            cls_id = int(box.cls[0])
-            conf = float(box.conf[0])
-            class_name = model.names[cls_id]
 
-            if "mobile" in class_name.lower() or "phone" in class_name.lower():
-                yolo_conf = max(yolo_conf, conf)
+def yolo_phone_confidences(frames: list) -> list[float]:
+    # One forward pass for the whole batch instead of one per feed.
+    if not frames:
+        return []
 
-        # ---------------- FUSION ---------------- #
+    # 🔥 Reduced from 640 → 416 (Performance Boost)
+    small_frames = [cv2.resize(frame_bgr, (PHONE_INPUT_SIZE, PHONE_INPUT_SIZE)) for frame_bgr in frames]
+    return st.session_state.yolo_model.phone_confidences(small_frames)
 
-        rule_weight = 0.6
-        model_weight = 0.4
-
-        final_score = (rule_weight * rule_score) + (model_weight * yolo_conf)
-        st.session_state.feed_risk_scores[source] = final_score
-
-        signals["mobile"] = signals["mobile"] or (final_score > 0.42)
-
-    # ---------------- PAPER DETECTION ---------------- #
 
+def _detect_paper(frame_bgr) -> bool:
     h, _ = frame_bgr.shape[:2]
     roi = frame_bgr[int(h * 0.45):, :]
     gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
@@ -238,7 +342,6 @@ def detect_on_frame(source: str, frame_bgr):
     edges = cv2.Canny(blur, 60, 140)
     contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    paper_like = False
     for cnt in contours:
         area = cv2.contourArea(cnt)
         if area < 12000:
@@ -251,10 +354,29 @@ def detect_on_frame(source: str, frame_bgr):
             _, _, cw, ch = cv2.boundingRect(approx)
             ratio = cw / max(1, ch)
             if 0.6 < ratio < 1.8:
-                paper_like = True
-                break
+                return True
+    return False
+
+
+def _finish_detection(source: str, frame_bgr, stage: dict, yolo_conf: float) -> dict:
+    signals = stage["signals"]
+    downward_alert = stage["downward_alert"]
+    final_score = 0.0
 
-    signals["paper"] = paper_like
+    # ---------------- FUSION ---------------- #
+
+    if stage["face_found"]:
+        rule_weight = 0.6
+        model_weight = 0.4
+
+        final_score = (rule_weight * stage["rule_score"]) + (model_weight * yolo_conf)
+        st.session_state.feed_risk_scores[source] = final_score
+
+        signals["mobile"] = signals["mobile"] or (final_score > 0.42)
+
+    # ---------------- PAPER DETECTION ---------------- #
+
+    signals["paper"] = _detect_paper(frame_bgr)
 
     # ---------------- SMOOTHING ---------------- #
 
@@ -271,7 +393,7 @@ def detect_on_frame(source: str, frame_bgr):
     # ---------------- RISK SCORE ---------------- #
 
     risk_score = (
-        0.5 * st.session_state.feed_risk_scores[source]
+        0.5 * st.session_state.feed_risk_scores.get(source, 0.0)
         + 0.2 * int(downward_alert)
         + 0.15 * int(talking_alert)
         + 0.1 * int(paper_alert)
@@ -296,4 +418,69 @@ def detect_on_frame(source: str, frame_bgr):
     }
 
     st.session_state.feed_signals[source] = feed_text
+    # Raw numbers behind the text, for columnar export.
+    st.session_state.feed_metrics[source] = {
+        "analyzed_at": time.time(),
+        "face_found": stage["face_found"],
+        "turn_score": stage["turn_score"],
+        "talk_ratio": stage["talk_ratio"],
+        "yolo_conf": yolo_conf,
+        "rule_score": stage["rule_score"],
+        "final_score": final_score,
+        "risk_score": risk_score,
+        "severity": severity,
+        "mobile_alert": mobile_alert,
+        "talking_alert": talking_alert,
+        "paper_alert": paper_alert,
+        "head_turn_alert": turn_alert,
+    }
     return feed_text
+
+
+def detect_on_frames(batch: list[tuple]) -> dict:
+    """Analyze several (source, frame) pairs, sharing one YOLO pass across feeds."""
+    results = {}
+    due = []
+    for source, frame_bgr in batch:
+        init_feed_state(source)
+        # Static scene: reuse the previous signals instead of running the models.
+        if not _scene_changed(source, frame_bgr):
+            results[source] = st.session_state.feed_signals[source]
+            continue
+        due.append((source, frame_bgr))
+
+    # Every feed has its own MediaPipe instances, so their inference can overlap.
+    executor = st.session_state.landmark_executor
+    if executor is not None and len(due) > 1:
+        futures = [executor.submit(_run_landmarks, feed_detectors(source), frame_bgr) for source, frame_bgr in due]
+        landmarks = [future.result() for future in futures]
+    else:
+        landmarks = [_run_landmarks(feed_detectors(source), frame_bgr) for source, frame_bgr in due]
+
+    pending = []
+    for (source, frame_bgr), (face_res, hands_res, elapsed) in zip(due, landmarks):
+        _record_stage_cost(source, "landmarks", elapsed)
+        pending.append((source, frame_bgr, _landmark_stage(source, face_res, hands_res)))
+
+    # YOLO only runs on feeds where a face was found, same as the per-feed path.
+    yolo_sources = [source for source, _, stage in pending if stage["face_found"]]
+    yolo_frames = [frame_bgr for _, frame_bgr, stage in pending if stage["face_found"]]
+    started = time.perf_counter()
+    yolo_confs = iter(yolo_phone_confidences(yolo_frames))
+    if yolo_sources:
+        share = (time.perf_counter() - started) / len(yolo_sources)
+        for source in yolo_sources:
+            _record_stage_cost(source, "yolo", share)
+
+    for source, frame_bgr, stage in pending:
+        yolo_conf = next(yolo_confs) if stage["face_found"] else 0.0
+        started = time.perf_counter()
+        results[source] = _finish_detection(source, frame_bgr, stage, yolo_conf)
+        _record_stage_cost(source, "finish", time.perf_counter() - started)
+
+    evict_idle_detectors()
+    return results
+
+
+def detect_on_frame(source: str, frame_bgr):
+    return detect_on_frames([(source, frame_bgr)])[source]
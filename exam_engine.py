@@ -0,0 +1,294 @@
+import contextlib
+import multiprocessing
+import queue
+import time
+
+import streamlit as st
+
+from exam_columnar import ensure_columnar_exporter
+from exam_config import COLUMNAR_SIGNAL_SAMPLES, DETECTION_TIMEOUT, DETECTION_WORKERS, WARMUP_TIMEOUT
+from exam_detection import close_detectors, detect_on_frames, ensure_detectors, init_feed_state, warm_up_detectors
+from exam_shm import FrameRef, resolve_frame
+from exam_state import add_event
+from exam_yolo import load_mobile_detector
+
+
+class _WorkerSessionState(dict):
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError as exc:
+            raise AttributeError(key) from exc
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+class _WorkerShim:
+    def __init__(self):
+        self.session_state = _WorkerSessionState()
+
+
+def _worker_main(index: int, inbox, outbox) -> None:
+    # Each worker keeps its own FaceMesh, Hands, YOLO and per-feed counters.
+    import exam_detection
+    import exam_state
+
+    shim = _WorkerShim()
+    exam_detection.st = shim
+    exam_state.st = shim
+    exam_state.init_state()
+    exam_detection.load_mediapipe()
+    try:
+        latency = exam_detection.warm_up_detectors()
+    except Exception as exc:
+        latency = {"error": f"{type(exc).__name__}: {exc}"}
+    outbox.put(("ready", index, latency))
+
+    while True:
+        message = inbox.get()
+        if message is None:
+            break
+        job_id, items = message
+        try:
+            batch = []
+            for source, frame, feed_risk in items:
+                if isinstance(frame, FrameRef):
+                    # Copy the capture slot (no pickling); skip feeds whose slot was reused before or during the copy.
+                    frame = resolve_frame(frame, source)
+                    if frame is None:
+                        continue
+                exam_detection.init_feed_state(source)
+                shim.session_state.feed_risk_scores[source] = feed_risk
+                batch.append((source, frame))
+            results = exam_detection.detect_on_frames(batch)
+            payload = {
+                source: (
+                    results[source],
+                    shim.session_state.feed_risk_scores[source],
+                    shim.session_state.feed_stage_costs.get(source, {}),
+                    shim.session_state.feed_metrics.get(source),
+                )
+                for source, _ in batch
+            }
+        except Exception as exc:
+            payload = f"{type(exc).__name__}: {exc}"
+        outbox.put((job_id, index, payload))
+
+    exam_detection.close_detectors()
+
+
+class DetectionEngine:
+    """Shards feeds across worker processes that each run the detection pipeline."""
+
+    def __init__(self, workers: int):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._outbox = self._ctx.Queue()
+        self._workers = [self._spawn(i) for i in range(max(1, workers))]
+        self._assignments = {}
+        self._job_id = 0
+
+    def _spawn(self, index: int) -> dict:
+        inbox = self._ctx.Queue()
+        proc = self._ctx.Process(target=_worker_main, args=(index, inbox, self._outbox), daemon=True)
+        proc.start()
+        return {"process": proc, "inbox": inbox, "ready": False, "warmup": {}, "busy": None}
+
+    def _shard(self, source: str) -> int:
+        # Sticky assignment keeps each feed's tracking state inside one worker.
+        if source not in self._assignments:
+            self._assignments[source] = len(self._assignments) % len(self._workers)
+        return self._assignments[source]
+
+    def _handle(self, message, job_id: int, results: dict) -> bool:
+        tag, index, payload = message
+        if tag == "ready":
+            self._workers[index]["ready"] = True
+            self._workers[index]["warmup"] = payload or {}
+            return False
+        # Any result, even a late one, means the worker is free for the next job.
+        self._workers[index]["busy"] = None
+        if tag != job_id:
+            return False
+        if isinstance(payload, str):
+            add_event(f"Detection worker {index} failed: {payload}")
+        else:
+            results.update(payload)
+        return True
+
+    def _respawn_dead(self) -> None:
+        for index, worker in enumerate(self._workers):
+            if not worker["process"].is_alive():
+                add_event(f"Detection worker {index} restarted")
+                self._workers[index] = self._spawn(index)
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                self._handle(self._outbox.get_nowait(), -1, {})
+            except queue.Empty:
+                break
+
+    def poll_ready(self) -> bool:
+        """True once every worker has loaded and warmed its models."""
+        self._respawn_dead()
+        self._drain()
+        return all(worker["ready"] for worker in self._workers)
+
+    def warmup_latency(self) -> dict:
+        # The slowest worker decides how long a batch takes.
+        latency = {}
+        for worker in self._workers:
+            for stage, timing in worker["warmup"].items():
+                if not isinstance(timing, dict):
+                    continue
+                merged = latency.setdefault(stage, dict(timing))
+                for key, value in timing.items():
+                    merged[key] = max(merged[key], value)
+        return latency
+
+    def run(self, items: list[tuple], timeout: float = DETECTION_TIMEOUT) -> dict:
+        """Analyze (source, frame, feed_risk) items; returns source -> (signals, feed_risk, stage_costs, metrics)."""
+        self._respawn_dead()
+        self._drain()
+
+        shards = {}
+        for item in items:
+            shards.setdefault(self._shard(item[0]), []).append(item)
+
+        self._job_id += 1
+        job_id = self._job_id
+        pending = 0
+        for index, shard in shards.items():
+            worker = self._workers[index]
+            # Workers still loading models, or still on a job that timed out, are
+            # skipped so no backlog of stale frames builds up; their feeds keep the last signals.
+            if not worker["ready"] or worker["busy"] is not None:
+                continue
+            worker["busy"] = job_id
+            worker["inbox"].put((job_id, shard))
+            pending += 1
+
+        results = {}
+        deadline = time.time() + timeout
+        while pending > 0:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                message = self._outbox.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if self._handle(message, job_id, results):
+                pending -= 1
+        return results
+
+    def close(self) -> None:
+        for worker in self._workers:
+            try:
+                worker["inbox"].put(None)
+            except Exception:
+                pass
+        for worker in self._workers:
+            worker["process"].join(timeout=1.0)
+            if worker["process"].is_alive():
+                worker["process"].terminate()
+        self._workers = []
+
+
+def ensure_engine() -> None:
+    if DETECTION_WORKERS <= 0:
+        ensure_detectors()
+        return
+    if st.session_state.detection_engine is None:
+        st.session_state.detection_engine = DetectionEngine(DETECTION_WORKERS)
+
+
+def engine_ready() -> bool:
+    return bool(st.session_state.get("engine_ready"))
+
+
+def preload_engine(lock=None, timeout: float = WARMUP_TIMEOUT) -> None:
+    """Build and warm what ensure_engine() needs, then mark the engine ready.
+
+    ``lock`` is not held while models load, but is held while they run and
+    when the engine is marked ready, so close_engine() (called under the same
+    lock) cannot pull detectors out from under the warm-up runs. Callers must
+    not run detection before engine_ready().
+    """
+    lock = lock or contextlib.nullcontext()
+    if DETECTION_WORKERS > 0:
+        # Spawning is quick; each worker loads and warms its own models.
+        with lock:
+            ensure_engine()
+        deadline = time.time() + timeout
+        while True:
+            with lock:
+                engine = st.session_state.detection_engine
+                if engine is None:
+                    return
+                if engine.poll_ready():
+                    _mark_ready(engine.warmup_latency())
+                    return
+            if time.time() > deadline:
+                raise TimeoutError(f"Detection workers not ready after {timeout:.0f}s")
+            time.sleep(0.2)
+    detector = None if "yolo_model" in st.session_state else load_mobile_detector()
+    with lock:
+        if detector is not None and "yolo_model" not in st.session_state:
+            st.session_state.yolo_model = detector
+        ensure_engine()
+        _mark_ready(warm_up_detectors(list(st.session_state.feed_list)))
+
+
+def _mark_ready(latency: dict) -> None:
+    st.session_state.engine_warmup = latency
+    st.session_state.engine_ready = True
+
+
+def close_engine() -> None:
+    st.session_state.engine_ready = False
+    if st.session_state.detection_engine is not None:
+        st.session_state.detection_engine.close()
+        st.session_state.detection_engine = None
+    close_detectors()
+
+
+def _export_samples(batch: list[tuple]) -> None:
+    if not COLUMNAR_SIGNAL_SAMPLES:
+        return
+    exporter = ensure_columnar_exporter()
+    if exporter is not None:
+        exporter.add_samples({source: st.session_state.feed_metrics.get(source) for source, _ in batch})
+
+
+def detect_feeds(batch: list[tuple]) -> dict:
+    engine = st.session_state.detection_engine
+    if engine is None:
+        results = detect_on_frames(batch)
+        _export_samples(batch)
+        return results
+
+    items = [
+        (
+            source,
+            # Shared-memory feeds send a slot reference instead of pickling pixels.
+            st.session_state.feed_frame_refs.get(source, frame),
+            st.session_state.feed_risk_scores.get(source, 0.0),
+        )
+        for source, frame in batch
+    ]
+    results = {}
+    for source, (signals, feed_risk, stage_costs, metrics) in engine.run(items).items():
+        st.session_state.feed_signals[source] = signals
+        st.session_state.feed_risk_scores[source] = feed_risk
+        st.session_state.feed_stage_costs[source] = stage_costs
+        if metrics is not None:
+            st.session_state.feed_metrics[source] = metrics
+        results[source] = signals
+    for source, _ in batch:
+        if source not in results:
+            init_feed_state(source)
+            results[source] = st.session_state.feed_signals[source]
+    _export_samples(batch)
+    return results
@@ -0,0 +1,114 @@
+import csv
+import os
+import threading
+from datetime import datetime
+
+import streamlit as st
+
+from exam_config import INCIDENT_LOG_BUFFER, INCIDENT_LOG_DIR, INCIDENT_LOG_FSYNC_INTERVAL
+
+INCIDENT_FIELDS = [
+    "incident_id",
+    "timestamp",
+    "feed",
+    "candidate",
+    "resume",
+    "severity",
+    "mobile",
+    "talking",
+    "paper",
+    "head_turn",
+    "risk_score",
+    "snapshot",
+    "clip",
+]
+SESSION_LOG_NAME = "exam_incidents.csv"
+
+
+def feed_log_name(source: str) -> str:
+    safe_source = source.replace(":", "_").replace("/", "_").replace("\\", "_")
+    return f"camera_{safe_source}_incidents.csv"
+
+
+def session_stamp(started_at: str) -> str:
+    return datetime.strptime(started_at, "%Y-%m-%d %H:%M:%S").strftime("%Y%m%d_%H%M%S")
+
+
+def session_log_dir(started_at: str) -> str:
+    return os.path.join(INCIDENT_LOG_DIR, session_stamp(started_at))
+
+
+class IncidentLog:
+    """Append-only CSV logs for one session: every incident goes to the session
+    log and to its feed's log. Rows are buffered and a daemon thread fsyncs
+    them every INCIDENT_LOG_FSYNC_INTERVAL seconds, so a crash loses at most
+    that much history. A later row with the same incident_id supersedes an
+    earlier one, e.g. once a snapshot or clip turned out not to be written.
+    """
+
+    def __init__(self, directory: str, fsync_interval: float = INCIDENT_LOG_FSYNC_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._files = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sync_loop, args=(fsync_interval,), daemon=True)
+        self._thread.start()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _writer(self, name: str) -> csv.DictWriter:
+        entry = self._files.get(name)
+        if entry is None:
+            path = self.path(name)
+            is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+            f = open(path, "a", newline="", encoding="utf-8", buffering=INCIDENT_LOG_BUFFER)
+            writer = csv.DictWriter(f, fieldnames=INCIDENT_FIELDS, extrasaction="ignore")
+            if is_new:
+                writer.writeheader()
+            entry = self._files[name] = (f, writer)
+        return entry[1]
+
+    def append(self, incident: dict) -> None:
+        with self._lock:
+            self._writer(SESSION_LOG_NAME).writerow(incident)
+            self._writer(feed_log_name(incident["feed"])).writerow(incident)
+            self._dirty = True
+
+    def _sync_locked(self) -> None:
+        for f, _ in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+        self._dirty = False
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._dirty:
+                self._sync_locked()
+
+    def _sync_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.sync()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        with self._lock:
+            self._sync_locked()
+            for f, _ in self._files.values():
+                f.close()
+            self._files = {}
+
+
+def ensure_incident_log() -> IncidentLog:
+    if st.session_state.incident_log is None:
+        st.session_state.incident_log = IncidentLog(session_log_dir(st.session_state.session_started_at))
+    return st.session_state.incident_log
+
+
+def close_incident_log() -> None:
+    if st.session_state.incident_log is not None:
+        st.session_state.incident_log.close()
+        st.session_state.incident_log = None
@@ -0,0 +1,108 @@
+import ast
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+from exam_config import PHONE_INPUT_SIZE, PHONE_ONNX_PATH
+from exam_yolo import is_phone_class
+
+
+class OnnxMobileDetector:
+    """Runs an ultralytics ONNX export of best.pt on a CPU onnxruntime session."""
+
+    def __init__(self, model_path=PHONE_ONNX_PATH, conf_threshold: float = 0.25, iou_threshold: float = 0.45):
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch_dim, _, height, width = model_input.shape
+        self.input_hw = (
+            height if isinstance(height, int) else PHONE_INPUT_SIZE,
+            width if isinstance(width, int) else PHONE_INPUT_SIZE,
+        )
+        # Static exports only accept batch 1, so those run frame by frame.
+        self.dynamic_batch = not isinstance(batch_dim, int)
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        if "names" not in metadata:
+            raise ValueError(f"{model_path} has no class names; export it with exam_yolo.export_onnx()")
+        self.names = ast.literal_eval(metadata["names"])
+        self.phone_ids = np.array([cid for cid, name in self.names.items() if is_phone_class(name)], dtype=np.int64)
+
+    def _letterbox(self, frame_bgr) -> np.ndarray:
+        in_h, in_w = self.input_hw
+        h, w = frame_bgr.shape[:2]
+        scale = min(in_h / h, in_w / w)
+        new_h, new_w = int(round(h * scale)), int(round(w * scale))
+        canvas = np.full((in_h, in_w, 3), 114, dtype=np.uint8)
+        top = (in_h - new_h) // 2
+        left = (in_w - new_w) // 2
+        canvas[top:top + new_h, left:left + new_w] = cv2.resize(frame_bgr, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        return canvas
+
+    def preprocess(self, frames: list) -> np.ndarray:
+        batch = np.stack([self._letterbox(frame) for frame in frames])
+        # BGR HWC uint8 -> RGB CHW float32 in [0, 1], as ultralytics does.
+        batch = batch[..., ::-1].transpose(0, 3, 1, 2)
+        return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+    def _nms(self, boxes_xyxy: np.ndarray, scores: np.ndarray, class_ids: np.ndarray) -> np.ndarray:
+        # Offset boxes per class so one NMS call never suppresses across classes.
+        offsets = class_ids[:, None].astype(np.float32) * 4096.0
+        shifted = boxes_xyxy + offsets
+        xywh = np.column_stack([shifted[:, 0], shifted[:, 1], shifted[:, 2] - shifted[:, 0], shifted[:, 3] - shifted[:, 1]])
+        keep = cv2.dnn.NMSBoxes(xywh.tolist(), scores.tolist(), self.conf_threshold, self.iou_threshold)
+        return np.asarray(keep, dtype=np.int64).reshape(-1)
+
+    def _phone_detections(self, prediction: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        empty = np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        if not len(self.phone_ids):
+            return empty
+
+        rows, cols = prediction.shape
+        if rows == 4 + len(self.names) and cols > rows:
+            # YOLOv8-style head: (4 + nc, anchors) with cx, cy, w, h and class scores.
+            prediction = prediction.T
+            class_scores = prediction[:, 4 + self.phone_ids]
+            best = class_scores.argmax(axis=1)
+            scores = class_scores[np.arange(len(best)), best]
+            mask = scores >= self.conf_threshold
+            if not mask.any():
+                return empty
+            cx, cy, bw, bh = prediction[mask, :4].T
+            boxes = np.column_stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2])
+            scores = scores[mask]
+            class_ids = self.phone_ids[best[mask]]
+            keep = self._nms(boxes, scores, class_ids)
+            return scores[keep], class_ids[keep]
+
+        # End-to-end (NMS-free) exports emit (max_det, 6): x1, y1, x2, y2, score, class.
+        scores = prediction[:, 4]
+        class_ids = prediction[:, 5].astype(np.int64)
+        mask = (scores >= self.conf_threshold) & np.isin(class_ids, self.phone_ids)
+        return scores[mask], class_ids[mask]
+
+    def _run(self, frames: list) -> np.ndarray:
+        return self.session.run(None, {self.input_name: self.preprocess(frames)})[0]
+
+    def phone_confidences(self, frames: list) -> list[float]:
+        if not frames:
+            return []
+        if self.dynamic_batch:
+            outputs = self._run(frames)
+        else:
+            outputs = np.concatenate([self._run([frame]) for frame in frames])
+
+        confs = []
+        for prediction in outputs:
+            scores, _ = self._phone_detections(prediction)
+            confs.append(float(scores.max()) if len(scores) else 0.0)
+        return confs
+
+    def detect_mobile(self, frame):
+        return self.phone_confidences([frame])[0]
@@ -0,0 +1,301 @@
+import datetime
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from exam_config import REPORT_WORKERS
+
+BUILD_ARGS = ("source", "candidate", "incidents", "snapshot_paths", "events", "risk_score")
+MAX_TRACKED_JOBS = 10
+
+
+def build_exam_pdf(source, candidate, incidents, snapshot_paths, events, risk_score):
+    """
+    Generate a PDF report for one camera / candidate.
+    Returns raw PDF bytes.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.units import cm
+    from reportlab.platypus import (
+        SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
+        HRFlowable, Image as RLImage,
+    )
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
+
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buf, pagesize=A4,
+        leftMargin=2*cm, rightMargin=2*cm,
+        topMargin=2*cm,  bottomMargin=2*cm,
+        title=f"Exam Report – {candidate}",
+    )
+    W, _ = A4
+    styles = getSampleStyleSheet()
+    now_str = datetime.datetime.now().strftime("%d %b %Y  %H:%M:%S")
+
+    title_s = ParagraphStyle("T", parent=styles["Title"], fontSize=22,
+                              textColor=colors.HexColor("#0b1e35"),
+                              spaceAfter=6, alignment=TA_CENTER)
+    sub_s   = ParagraphStyle("S", parent=styles["Normal"], fontSize=11,
+                              textColor=colors.HexColor("#2d5f9a"),
+                              spaceAfter=4, alignment=TA_CENTER)
+    sec_s   = ParagraphStyle("H", parent=styles["Heading2"], fontSize=13,
+                              textColor=colors.HexColor("#0b1e35"),
+                              spaceBefore=14, spaceAfter=4)
+    small   = ParagraphStyle("Sm", parent=styles["Normal"], fontSize=9,
+                              textColor=colors.HexColor("#444"))
+    foot_s  = ParagraphStyle("F", parent=small, alignment=TA_CENTER,
+                              textColor=colors.HexColor("#888"))
+    normal  = styles["Normal"]
+
+    story = []
+
+    # ── Header ───────────────────────────────────────────────────────────────
+    story.append(Paragraph("AI Exam Monitoring System", title_s))
+    story.append(Paragraph("Proctoring Incident Report", sub_s))
+    story.append(HRFlowable(width="100%", thickness=2,
+                             color=colors.HexColor("#2d5f9a")))
+    story.append(Spacer(1, 0.3*cm))
+
+    info_data = [
+        ["Candidate",        candidate or "—"],
+        ["Camera / Source",  str(source)],
+        ["Report Generated", now_str],
+        ["Total Incidents",  str(len(incidents))],
+        ["Final Risk Score", f"{int(risk_score)} / 100"],
+    ]
+    it = Table(info_data, colWidths=[5*cm, 12*cm])
+    it.setStyle(TableStyle([
+        ("BACKGROUND",    (0,0), (0,-1), colors.HexColor("#e8f0fa")),
+        ("FONTNAME",      (0,0), (0,-1), "Helvetica-Bold"),
+        ("FONTSIZE",      (0,0),(-1,-1), 10),
+        ("GRID",          (0,0),(-1,-1), 0.5, colors.HexColor("#adc1df")),
+        ("ROWBACKGROUNDS",(0,0),(-1,-1), [colors.white, colors.HexColor("#f4f8ff")]),
+        ("VALIGN",        (0,0),(-1,-1), "MIDDLE"),
+        ("LEFTPADDING",   (0,0),(-1,-1), 8),
+        ("TOPPADDING",    (0,0),(-1,-1), 5),
+        ("BOTTOMPADDING", (0,0),(-1,-1), 5),
+    ]))
+    story.append(it)
+    story.append(Spacer(1, 0.4*cm))
+
+    # ── Risk bar ─────────────────────────────────────────────────────────────
+    story.append(Paragraph("Risk Score", sec_s))
+    bar_pct  = min(100, max(0, int(risk_score)))
+    bar_col  = (colors.HexColor("#e53935") if bar_pct >= 60 else
+                colors.HexColor("#f5a623") if bar_pct >= 30 else
+                colors.HexColor("#2e7d32"))
+    usable_w = W - 4*cm
+    fill_w   = max(0.01, usable_w * bar_pct / 100)
+    empty_w  = max(0.01, usable_w - fill_w)
+    bar = Table([[""]], colWidths=[fill_w])
+    bar.setStyle(TableStyle([
+        ("BACKGROUND",    (0,0),(-1,-1), bar_col),
+        ("ROWHEIGHT",     (0,0),(-1,-1), 18),
+        ("GRID",          (0,0),(-1,-1), 0, colors.white),
+    ]))
+    outer = Table([[bar, ""]], colWidths=[fill_w, empty_w])
+    outer.setStyle(TableStyle([
+        ("BACKGROUND",    (1,0),(1,0), colors.HexColor("#dde4ee")),
+        ("ROWHEIGHT",     (0,0),(-1,-1), 18),
+        ("GRID",          (0,0),(-1,-1), 0.5, colors.HexColor("#adc1df")),
+        ("LEFTPADDING",   (0,0),(-1,-1), 0),
+        ("RIGHTPADDING",  (0,0),(-1,-1), 0),
+        ("TOPPADDING",    (0,0),(-1,-1), 0),
+        ("BOTTOMPADDING", (0,0),(-1,-1), 0),
+    ]))
+    story.append(outer)
+    story.append(Paragraph(f"Risk level: {bar_pct}/100", small))
+    story.append(Spacer(1, 0.3*cm))
+
+    # ── Snapshots ─────────────────────────────────────────────────────────────
+    valid_imgs = []
+    for sp in (snapshot_paths or [])[:8]:
+        try:
+            if isinstance(sp, str) and sp and os.path.isfile(sp):
+                valid_imgs.append(RLImage(sp, width=8*cm, height=6*cm, kind="proportional"))
+            elif sp is not None and not isinstance(sp, str):
+                # numpy frame
+                import tempfile
+                tmp = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
+                cv2.imwrite(tmp.name, sp)
+                tmp.close()
+                valid_imgs.append(RLImage(tmp.name, width=8*cm, height=6*cm, kind="proportional"))
+        except Exception:
+            pass
+
+    if valid_imgs:
+        story.append(Paragraph("Captured Snapshots", sec_s))
+        for i in range(0, len(valid_imgs), 2):
+            pair = valid_imgs[i:i+2]
+            while len(pair) < 2:
+                pair.append("")
+            pt = Table([pair], colWidths=[9*cm, 9*cm])
+            pt.setStyle(TableStyle([
+                ("ALIGN",         (0,0),(-1,-1), "CENTER"),
+                ("VALIGN",        (0,0),(-1,-1), "TOP"),
+                ("GRID",          (0,0),(-1,-1), 0.5, colors.HexColor("#adc1df")),
+                ("TOPPADDING",    (0,0),(-1,-1), 4),
+                ("BOTTOMPADDING", (0,0),(-1,-1), 4),
+            ]))
+            story.append(pt)
+            story.append(Spacer(1, 0.2*cm))
+
+    # ── Incident table ────────────────────────────────────────────────────────
+    story.append(Paragraph("Incident Log", sec_s))
+    if incidents:
+        header = ["#", "Time", "Severity", "Detections"]
+        rows   = [header]
+        sev_hi = []
+        for idx, inc in enumerate(incidents, 1):
+            ts = inc.get("ts", inc.get("timestamp", ""))
+            if isinstance(ts, (int, float)):
+                ts = datetime.datetime.fromtimestamp(ts).strftime("%H:%M:%S")
+            # Stored incidents are flat rows; older callers passed a signals dict.
+            sigs     = inc.get("signals", inc.get("signal_text", inc))
+            severity = sigs.get("severity", "—") if isinstance(sigs, dict) else "—"
+            dets = []
+            if isinstance(sigs, dict):
+                for k in ("mobile", "talking", "paper", "head_turn"):
+                    v = sigs.get(k, "")
+                    if v and "No " not in v and "NORMAL" not in v.upper():
+                        dets.append(v)
+            sev_hi.append(severity)
+            rows.append([str(idx), str(ts), severity,
+                         Paragraph("; ".join(dets) if dets else "—", small)])
+
+        col_w = [1*cm, 3*cm, 3.5*cm, usable_w - 7.5*cm]
+        inc_t = Table(rows, colWidths=col_w, repeatRows=1)
+        sev_colors = {
+            "HIGH ALERT": colors.HexColor("#ffd6d6"),
+            "ALERT":      colors.HexColor("#ffe8cc"),
+            "WARNING":    colors.HexColor("#fffbe0"),
+        }
+        cmds = [
+            ("BACKGROUND",    (0,0),(-1,0),  colors.HexColor("#2d5f9a")),
+            ("TEXTCOLOR",     (0,0),(-1,0),  colors.white),
+            ("FONTNAME",      (0,0),(-1,0),  "Helvetica-Bold"),
+            ("FONTSIZE",      (0,0),(-1,-1), 9),
+            ("GRID",          (0,0),(-1,-1), 0.5, colors.HexColor("#adc1df")),
+            ("ROWBACKGROUNDS",(0,1),(-1,-1), [colors.white, colors.HexColor("#f4f8ff")]),
+            ("VALIGN",        (0,0),(-1,-1), "MIDDLE"),
+            ("TOPPADDING",    (0,0),(-1,-1), 4),
+            ("BOTTOMPADDING", (0,0),(-1,-1), 4),
+            ("LEFTPADDING",   (0,0),(-1,-1), 6),
+        ]
+        for i, sev in enumerate(sev_hi, 1):
+            if sev in sev_colors:
+                cmds.append(("BACKGROUND", (0,i), (-1,i), sev_colors[sev]))
+        inc_t.setStyle(TableStyle(cmds))
+        story.append(inc_t)
+    else:
+        story.append(Paragraph("No incidents recorded for this camera.", normal))
+
+    story.append(Spacer(1, 0.4*cm))
+
+    # ── Event log ─────────────────────────────────────────────────────────────
+    story.append(Paragraph("System Event Log", sec_s))
+    for ev in (events or [])[:40]:
+        story.append(Paragraph(f"• {ev}", small))
+    if not events:
+        story.append(Paragraph("No events recorded.", normal))
+
+    # ── Footer ────────────────────────────────────────────────────────────────
+    story.append(Spacer(1, 0.5*cm))
+    story.append(HRFlowable(width="100%", thickness=1,
+                             color=colors.HexColor("#adc1df")))
+    story.append(Spacer(1, 0.2*cm))
+    story.append(Paragraph(
+        f"Generated by AI Exam Monitoring System  •  {now_str}", foot_s))
+
+    doc.build(story)
+    return buf.getvalue()
+
+
+def _render(task: dict) -> bytes:
+    return build_exam_pdf(**{key: task[key] for key in BUILD_ARGS})
+
+
+class ReportJobs:
+    """Renders per-camera PDFs in a spawn-based process pool and tracks job progress.
+
+    Each task is a plain dict (picklable snapshot of the state a PDF needs plus
+    its "pdf_name"). ``on_result(job_id, task, pdf_bytes, error)`` runs as each
+    PDF finishes, on the pool's result thread.
+    """
+
+    def __init__(self, workers: int = REPORT_WORKERS):
+        self.workers = max(1, workers)
+        self._pool = None
+        self._jobs = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def submit(self, tasks: list[dict], on_result) -> int:
+        with self._lock:
+            self._next_id += 1
+            job_id = self._next_id
+            self._jobs[job_id] = {
+                "id": job_id,
+                "total": len(tasks),
+                "done": 0,
+                "failed": 0,
+                "files": [],
+                "started_at": time.time(),
+                "finished_at": time.time() if not tasks else None,
+            }
+            for old_id in sorted(self._jobs)[:-MAX_TRACKED_JOBS]:
+                del self._jobs[old_id]
+        executor = self._executor() if tasks else None
+        for task in tasks:
+            future = executor.submit(_render, task)
+            future.add_done_callback(lambda f, task=task: self._finished(job_id, task, on_result, f))
+        return job_id
+
+    def _finished(self, job_id: int, task: dict, on_result, future) -> None:
+        try:
+            pdf_bytes, error = future.result(), None
+        except Exception as exc:
+            pdf_bytes, error = b"", f"{type(exc).__name__}: {exc}"
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["done"] += 1
+                if error:
+                    job["failed"] += 1
+                else:
+                    job["files"].append(task["pdf_name"])
+                if job["done"] == job["total"]:
+                    job["finished_at"] = time.time()
+        on_result(job_id, task, pdf_bytes, error)
+
+    @property
+    def latest_id(self) -> int:
+        return self._next_id
+
+    def status(self, job_id: int = None):
+        """Progress of ``job_id`` (default: the latest job), or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id or self._next_id)
+            if job is None:
+                return None
+            status = dict(job, files=list(job["files"]))
+        status["state"] = "done" if status["finished_at"] is not None else "running"
+        return status
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,89 @@
+import glob
+import os
+
+import cv2
+import onnx
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from exam_config import PHONE_INPUT_SIZE, PHONE_INT8_PATH, PHONE_ONNX_PATH
+from exam_onnx import OnnxMobileDetector
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def list_frames(folder: str, limit: int = 0) -> list[str]:
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(folder, pattern)))
+    paths.sort()
+    return paths[:limit] if limit else paths
+
+
+def load_frame(path: str):
+    frame = cv2.imread(path)
+    if frame is None:
+        return None
+    # Same input the live pipeline hands to the phone detector.
+    return cv2.resize(frame, (PHONE_INPUT_SIZE, PHONE_INPUT_SIZE))
+
+
+class FrameCalibrationReader(CalibrationDataReader):
+    def __init__(self, detector: OnnxMobileDetector, paths: list[str]):
+        self.detector = detector
+        self.paths = iter(paths)
+
+    def get_next(self):
+        for path in self.paths:
+            frame = load_frame(path)
+            if frame is not None:
+                return {self.detector.input_name: self.detector.preprocess([frame])}
+        return None
+
+
+def _copy_metadata(src_path: str, dst_path: str) -> None:
+    # The detector reads class names from the export metadata; keep them.
+    src = onnx.load(src_path)
+    dst = onnx.load(dst_path)
+    onnx.helper.set_model_props(dst, {prop.key: prop.value for prop in src.metadata_props})
+    onnx.save(dst, dst_path)
+
+
+def quantize_phone_model(
+    fp32_path: str = PHONE_ONNX_PATH,
+    int8_path: str = PHONE_INT8_PATH,
+    calibration_dir: str = "",
+    max_calibration_frames: int = 64,
+) -> str:
+    """Write an INT8 copy of the ONNX phone model.
+
+    With a calibration folder, activations are calibrated on real frames and the
+    result is a static QDQ model; without one, only weights are quantized.
+    """
+    if not calibration_dir:
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QUInt8)
+        _copy_metadata(fp32_path, int8_path)
+        return int8_path
+
+    paths = list_frames(calibration_dir, max_calibration_frames)
+    if not paths:
+        raise ValueError(f"No calibration frames found in {calibration_dir}")
+
+    prepared_path = int8_path + ".prep.onnx"
+    quant_pre_process(fp32_path, prepared_path)
+    try:
+        reader = FrameCalibrationReader(OnnxMobileDetector(fp32_path), paths)
+        quantize_static(
+            prepared_path,
+            int8_path,
+            reader,
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+    finally:
+        if os.path.exists(prepared_path):
+            os.remove(prepared_path)
+    _copy_metadata(fp32_path, int8_path)
+    return int8_path
@@ -1,41 +1,96 @@
-import csv
-import io
 import os
+import time
 from datetime import datetime
 
 import cv2
 import streamlit as st
 
-from exam_config import REPORT_DIR, SNAPSHOT_DIR, ensure_dirs
-from exam_state import get_candidate_meta
+from exam_camera import preroll_buffer
+from exam_clips import clip_path, ensure_clip_recorder
+from exam_columnar import ensure_columnar_exporter
+from exam_config import CLIP_ENABLED, INCIDENT_MEMORY_LIMIT, REPORT_DIR, SNAPSHOT_DIR, ensure_dirs
+from exam_incidents import SESSION_LOG_NAME, ensure_incident_log, feed_log_name
+from exam_snapshots import ensure_snapshot_store, ensure_snapshot_writer
+from exam_state import add_event, get_candidate_meta
+from exam_store import ensure_incident_store
 
 
-def save_snapshot(frame_bgr, source: str) -> str:
+def plan_snapshot(frame_bgr, source: str) -> tuple[str, bool]:
+    """Return (path, fresh) for a candidate snapshot; near-duplicates reuse an earlier file."""
+    return ensure_snapshot_store().plan(frame_bgr, source)
+
+
+def save_snapshot(frame_bgr, source: str, incident: dict = None) -> str:
+    """Queue the frame for the background writer and return the path it will be written to.
+
+    With ``incident``, the frame goes to the incident's planned "snapshot" path,
+    which the writer clears if the frame is dropped or cannot be written.
+    Without one, a near-duplicate frame is not written again.
+    """
     ensure_dirs()
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    path = os.path.join(SNAPSHOT_DIR, f"feed_{source.replace(':', '_')}_{ts}.jpg")
-    cv2.imwrite(path, frame_bgr)
+    path = (incident or {}).get("snapshot")
+    if not path:
+        path, fresh = plan_snapshot(frame_bgr, source)
+        if not fresh:
+            return path
+    if not ensure_snapshot_writer().submit(frame_bgr, path, incident):
+        add_event("Snapshot queue full; dropped the oldest pending snapshot")
     return path
 
 
-def record_incident(source: str, signal_text: dict, snapshot: str) -> None:
+def record_incident(source: str, signal_text: dict, snapshot: str) -> dict:
     meta = get_candidate_meta(source)
-    st.session_state.incidents.append(
-        {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "feed": source,
-            "candidate": meta["candidate"],
-            "resume": meta["resume"],
-            "severity": signal_text["severity"],
-            "mobile": signal_text["mobile"],
-            "talking": signal_text["talking"],
-            "paper": signal_text["paper"],
-            "head_turn": signal_text["head_turn"],
-            "risk_score": int(st.session_state.risk_score),
-            "snapshot": snapshot,
-        }
-    )
-    st.session_state.incidents = st.session_state.incidents[-1000:]
+    # Stamp the incident with when the analysed frame was captured, not when analysis finished.
+    captured_at = st.session_state.feed_frame_ts.get(source) or time.time()
+    incident = {
+        "ts": captured_at,
+        "timestamp": datetime.fromtimestamp(captured_at).strftime("%Y-%m-%d %H:%M:%S"),
+        "feed": source,
+        "candidate": meta["candidate"],
+        "resume": meta["resume"],
+        "severity": signal_text["severity"],
+        "mobile": signal_text["mobile"],
+        "talking": signal_text["talking"],
+        "paper": signal_text["paper"],
+        "head_turn": signal_text["head_turn"],
+        "risk_score": int(st.session_state.risk_score),
+        "snapshot": snapshot,
+        "clip": "",
+    }
+    if snapshot:
+        # Lets the snapshot store clear this reference if the budget evicts the file.
+        ensure_snapshot_store().attach(snapshot, incident)
+    buffer = preroll_buffer(source) if CLIP_ENABLED else None
+    if buffer is not None:
+        # Like the snapshot, the clip path is planned now and cleared if the clip is never written.
+        incident["clip"] = clip_path(source, incident["ts"])
+        if not ensure_clip_recorder().submit(buffer, incident, incident["ts"]):
+            add_event("Clip queue full; dropped the oldest pending clip")
+    log = ensure_incident_log()
+    exporter = ensure_columnar_exporter()
+    metrics = st.session_state.feed_metrics.get(source)
+
+    def stored(incident: dict) -> None:
+        # Runs on the store's flush thread, once the row has its incident_id.
+        log.append(incident)
+        if exporter is not None:
+            exporter.add_incident(incident, metrics)
+
+    ensure_incident_store().record(incident, stored)
+    # Session state only keeps a recent window; the store has the full history.
+    st.session_state.incidents.append(incident)
+    if len(st.session_state.incidents) > INCIDENT_MEMORY_LIMIT:
+        del st.session_state.incidents[:-INCIDENT_MEMORY_LIMIT]
+    return incident
+
+
+def incident_count() -> int:
+    return ensure_incident_store().session_total
+
+
+def reset_incidents() -> None:
+    st.session_state.incidents = []
+    ensure_incident_store().clear_session()
 
 
 def save_face_profile(source: str):
@@ -50,112 +105,38 @@ def save_face_profile(source: str):
     return path
 
 
-def _count_behaviors(rows: list[dict]) -> dict:
-    return {
-        "mobile": sum(1 for r in rows if r.get("mobile", "").startswith("Possible")),
-        "talking": sum(1 for r in rows if r.get("talking", "").startswith("Talking")),
-        "paper": sum(1 for r in rows if r.get("paper", "").startswith("Paper")),
-        "head_turn": sum(1 for r in rows if r.get("head_turn", "").startswith("Repeated")),
-    }
-
-
 def generate_report() -> None:
+    # Incident rows are already on disk in the session's append-only logs;
+    # only the summaries are written here.
     ensure_dirs()
-    buf = io.StringIO()
-    writer = csv.writer(buf)
-    writer.writerow(
-        [
-            "timestamp",
-            "feed",
-            "candidate",
-            "resume",
-            "severity",
-            "mobile",
-            "talking",
-            "paper",
-            "head_turn",
-            "risk_score",
-            "snapshot",
-        ]
-    )
-    for row in st.session_state.incidents:
-        writer.writerow(
-            [
-                row["timestamp"],
-                row["feed"],
-                row.get("candidate", ""),
-                row.get("resume", ""),
-                row["severity"],
-                row["mobile"],
-                row["talking"],
-                row["paper"],
-                row["head_turn"],
-                row["risk_score"],
-                row["snapshot"],
-            ]
-        )
-    st.session_state.report_csv = buf.getvalue()
+    log = ensure_incident_log()
+    store = ensure_incident_store()
+    # Queued incidents reach the CSV logs when the store inserts them.
+    store.flush()
+    log.sync()
+    session_csv = os.path.relpath(log.path(SESSION_LOG_NAME), REPORT_DIR)
 
     summary = [
         "AI Exam Monitoring - Final Report",
         f"Session started: {st.session_state.session_started_at}",
         f"Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
         f"Total feeds: {len(st.session_state.feed_list)}",
-        f"Total incidents: {len(st.session_state.incidents)}",
+        f"Total incidents: {store.count()}",
         f"Final risk score: {int(st.session_state.risk_score)}",
+        f"Incident log: {session_csv}",
         "Final decision should be made by the invigilator.",
     ]
     st.session_state.report_txt = "\n".join(summary)
-    with open(os.path.join(REPORT_DIR, "exam_incidents.csv"), "w", newline="", encoding="utf-8") as f:
-        f.write(st.session_state.report_csv)
     with open(os.path.join(REPORT_DIR, "exam_final_report.txt"), "w", encoding="utf-8") as f:
         f.write(st.session_state.report_txt)
 
-    by_feed = {}
-    for row in st.session_state.incidents:
-        by_feed.setdefault(row["feed"], []).append(row)
-
+    counts_by_feed = store.counts_by("feed")
     per_camera_reports = {}
     for source in st.session_state.feed_list:
-        rows = by_feed.get(source, [])
         meta = get_candidate_meta(source)
-        behavior_counts = _count_behaviors(rows)
+        behavior_counts = store.behavior_counts(feed=source)
         profile_image = save_face_profile(source)
-        feed_buf = io.StringIO()
-        feed_writer = csv.writer(feed_buf)
-        feed_writer.writerow(
-            [
-                "timestamp",
-                "feed",
-                "candidate",
-                "resume",
-                "severity",
-                "mobile",
-                "talking",
-                "paper",
-                "head_turn",
-                "risk_score",
-                "snapshot",
-                "profile_face",
-            ]
-        )
-        for row in rows:
-            feed_writer.writerow(
-                [
-                    row["timestamp"],
-                    row["feed"],
-                    row.get("candidate", ""),
-                    row.get("resume", ""),
-                    row["severity"],
-                    row["mobile"],
-                    row["talking"],
-                    row["paper"],
-                    row["head_turn"],
-                    row["risk_score"],
-                    row["snapshot"],
-                    profile_image,
-                ]
-            )
+        csv_name = os.path.relpath(log.path(feed_log_name(source)), REPORT_DIR)
 
         feed_summary = [
             "AI Exam Monitoring - Camera Report",
@@ -165,27 +146,23 @@ def generate_report() -> None:
             f"Candidate: {meta['candidate']}",
             f"Resume: {meta['resume'] or 'N/A'}",
             f"Captured face image: {profile_image or 'Not available'}",
-            f"Incidents on this camera: {len(rows)}",
+            f"Incidents on this camera: {counts_by_feed.get(source, 0)}",
             f"Mobile usage alerts: {behavior_counts['mobile']}",
             f"Talking alerts: {behavior_counts['talking']}",
             f"Paper alerts: {behavior_counts['paper']}",
             f"Head-turn alerts: {behavior_counts['head_turn']}",
+            f"Incident log: {csv_name}",
             "Final decision should be made by the invigilator.",
         ]
         safe_source = source.replace(":", "_").replace("/", "_").replace("\\", "_")
-        csv_name = f"camera_{safe_source}_incidents.csv"
         txt_name = f"camera_{safe_source}_report.txt"
-        csv_content = feed_buf.getvalue()
         txt_content = "\n".join(feed_summary)
-        with open(os.path.join(REPORT_DIR, csv_name), "w", newline="", encoding="utf-8") as f:
-            f.write(csv_content)
         with open(os.path.join(REPORT_DIR, txt_name), "w", encoding="utf-8") as f:
             f.write(txt_content)
         per_camera_reports[source] = {
             "candidate": meta["candidate"],
             "csv_name": csv_name,
             "txt_name": txt_name,
-            "csv": csv_content,
             "txt": txt_content,
             "face_image": profile_image,
             "behavior_counts": behavior_counts,
@@ -0,0 +1,74 @@
+import time
+
+import streamlit as st
+
+from exam_config import (
+    ANALYSIS_CALM_INTERVAL,
+    ANALYSIS_CPU_BUDGET,
+    ANALYSIS_MAX_INTERVAL,
+    ANALYSIS_MIN_INTERVAL,
+    DEFAULT_ANALYSIS_COST,
+    DETECTION_WORKERS,
+)
+
+SEVERITY_LEVEL = {"HIGH ALERT": 1.0, "ALERT": 0.7, "WARNING": 0.4}
+
+
+def risk_level(source: str) -> float:
+    severity = st.session_state.feed_signals.get(source, {}).get("severity", "NORMAL")
+    feed_risk = min(1.0, st.session_state.feed_risk_scores.get(source, 0.0))
+    return max(SEVERITY_LEVEL.get(severity, 0.0), feed_risk)
+
+
+def target_interval(source: str) -> float:
+    # Suspicious feeds are sampled up to ANALYSIS_MIN_INTERVAL, calm ones drift
+    # towards ANALYSIS_CALM_INTERVAL.
+    level = risk_level(source)
+    return ANALYSIS_CALM_INTERVAL - (ANALYSIS_CALM_INTERVAL - ANALYSIS_MIN_INTERVAL) * level
+
+
+def estimated_cost(source: str) -> float:
+    costs = st.session_state.feed_stage_costs.get(source)
+    if not costs:
+        return DEFAULT_ANALYSIS_COST
+    return sum(costs.values())
+
+
+def schedule_feeds(candidates: list[str], max_optional: int) -> list[str]:
+    """Pick which feeds with fresh frames to analyze this tick.
+
+    Feeds past ANALYSIS_MAX_INTERVAL are always taken. The rest are ordered by
+    how far past their target interval they are, and taken while the estimated
+    cost fits the CPU budget, up to ``max_optional`` of them.
+    """
+    now = time.time()
+    budget = ANALYSIS_CPU_BUDGET * max(1, DETECTION_WORKERS)
+    forced = []
+    optional = []
+    for source in candidates:
+        last = st.session_state.feed_last_analysis_ts.get(source)
+        if last is None or now - last >= ANALYSIS_MAX_INTERVAL:
+            forced.append((now - last if last is not None else float("inf"), source))
+            continue
+        urgency = (now - last) / target_interval(source)
+        if urgency >= 1.0:
+            optional.append((urgency, source))
+
+    forced.sort(reverse=True)
+    optional.sort(reverse=True)
+    chosen = [source for _, source in forced]
+    spent = sum(estimated_cost(source) for source in chosen)
+    taken = 0
+    for _, source in optional:
+        if taken >= max_optional:
+            break
+        cost = estimated_cost(source)
+        if chosen and spent + cost > budget:
+            continue
+        chosen.append(source)
+        spent += cost
+        taken += 1
+
+    for source in chosen:
+        st.session_state.feed_last_analysis_ts[source] = now
+    return chosen
@@ -0,0 +1,188 @@
+import time
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+from exam_config import FRAME_RING_IDLE_TIMEOUT, FRAME_RING_MAX_SHAPE, FRAME_RING_SLOTS
+
+# Block layout: meta (slots, max_h, max_w, channels, latest_seq) | slot headers | slot pixels.
+META_FIELDS = 5
+SLOT_HEADER = np.dtype([("seq", np.int64), ("ts", np.float64), ("h", np.int32), ("w", np.int32)])
+
+
+class FrameRef(NamedTuple):
+    name: str
+    seq: int
+
+
+class FrameRing:
+    """Fixed-size ring of frames in shared memory, written once by the capture thread.
+
+    A slot stays valid until the writer wraps around to it, which is checked
+    through its sequence number. Readers use read(), which copies the slot and
+    re-checks the sequence afterwards (a seqlock), so a frame overwritten while
+    it was being copied is discarded instead of handed out torn.
+    """
+
+    def __init__(self, name: str = None, slots: int = FRAME_RING_SLOTS, max_shape: tuple = FRAME_RING_MAX_SHAPE):
+        create = name is None
+        if create:
+            max_h, max_w, channels = max_shape
+            size = self._header_bytes(slots) + slots * max_h * max_w * channels
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.meta = np.ndarray((META_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+            self.meta[:] = (slots, max_h, max_w, channels, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.meta = np.ndarray((META_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        self.owner = create
+        self.name = self.shm.name
+        self.slots, max_h, max_w, channels = (int(v) for v in self.meta[:4])
+        self.slot_bytes = max_h * max_w * channels
+        self.max_shape = (max_h, max_w, channels)
+        self.headers = np.ndarray(
+            (self.slots,), dtype=SLOT_HEADER, buffer=self.shm.buf, offset=META_FIELDS * 8
+        )
+        self.data = np.ndarray(
+            (self.slots, self.slot_bytes), dtype=np.uint8, buffer=self.shm.buf, offset=self._header_bytes(self.slots)
+        )
+        if create:
+            self.headers["seq"] = 0
+
+    @staticmethod
+    def _header_bytes(slots: int) -> int:
+        return META_FIELDS * 8 + slots * SLOT_HEADER.itemsize
+
+    @property
+    def latest_seq(self) -> int:
+        return int(self.meta[4])
+
+    def _fit(self, frame: np.ndarray) -> np.ndarray:
+        max_h, max_w, _ = self.max_shape
+        h, w = frame.shape[:2]
+        if h <= max_h and w <= max_w:
+            return frame
+        scale = min(max_h / h, max_w / w)
+        return cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+    def write(self, frame: np.ndarray, flip: bool = False) -> int:
+        frame = self._fit(frame)
+        h, w = frame.shape[:2]
+        seq = self.latest_seq + 1
+        slot = seq % self.slots
+
+        # Mark the slot as being written so readers never trust a half-copied frame.
+        self.headers["seq"][slot] = -1
+        dst = self.data[slot, : h * w * 3].reshape(h, w, 3)
+        if flip:
+            cv2.flip(frame, 1, dst=dst)
+        else:
+            np.copyto(dst, frame)
+        self.headers["h"][slot] = h
+        self.headers["w"][slot] = w
+        self.headers["ts"][slot] = time.time()
+        self.headers["seq"][slot] = seq
+        self.meta[4] = seq
+        return seq
+
+    def is_current(self, seq: int) -> bool:
+        return seq > 0 and int(self.headers["seq"][seq % self.slots]) == seq
+
+    def view(self, seq: int):
+        """Return a zero-copy view of frame ``seq``, or None once it was overwritten.
+
+        The writer may reuse the slot at any time; callers must re-check
+        is_current(seq) after using the view, as read() does.
+        """
+        if not self.is_current(seq):
+            return None
+        slot = seq % self.slots
+        h = int(self.headers["h"][slot])
+        w = int(self.headers["w"][slot])
+        return self.data[slot, : h * w * 3].reshape(h, w, 3)
+
+    def read(self, seq: int):
+        """Return (ts, private copy) of frame ``seq``, or None if it was overwritten meanwhile."""
+        view = self.view(seq)
+        if view is None:
+            return None
+        ts = float(self.headers["ts"][seq % self.slots])
+        frame = view.copy()
+        if not self.is_current(seq):
+            return None
+        return ts, frame
+
+    def latest(self, attempts: int = 3):
+        # A miss means the writer lapped us mid-copy; the next latest frame is fine.
+        for _ in range(attempts):
+            seq = self.latest_seq
+            result = self.read(seq)
+            if result is not None:
+                return seq, result[0], result[1]
+        return None
+
+    def fits(self, shape: tuple) -> bool:
+        return shape[0] <= self.max_shape[0] and shape[1] <= self.max_shape[1]
+
+    def close(self) -> None:
+        # Our own arrays export the buffer too; drop them so the mapping can be released.
+        self.meta = self.headers = self.data = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # Views are still held elsewhere; the mapping goes away with them.
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def ring_shape(frame_shape: tuple, max_shape: tuple = FRAME_RING_MAX_SHAPE) -> tuple:
+    """Slot shape for a feed delivering ``frame_shape`` frames."""
+    h, w = frame_shape[:2]
+    max_h, max_w, channels = max_shape
+    if h <= max_h and w <= max_w:
+        return h, w, channels
+    scale = min(max_h / h, max_w / w)
+    return int(h * scale), int(w * scale), channels
+
+
+# source -> (ring, last used); each feed maps at most one ring per process.
+_attached = {}
+
+
+def _detach(source: str) -> None:
+    ring, _ = _attached.pop(source)
+    ring.close()
+
+
+def resolve_frame(ref: FrameRef, source: str):
+    """Attach to the ring named in ``ref`` (cached per feed) and return a validated copy of its frame.
+
+    A feed whose capture thread restarted or resized its ring sends a new name;
+    the old mapping is closed then, and so are rings of feeds not read for
+    FRAME_RING_IDLE_TIMEOUT seconds (removed feeds).
+    """
+    now = time.time()
+    for other, (_, last_used) in list(_attached.items()):
+        if other != source and now - last_used > FRAME_RING_IDLE_TIMEOUT:
+            _detach(other)
+    entry = _attached.get(source)
+    if entry is not None and entry[0].name != ref.name:
+        _detach(source)
+        entry = None
+    if entry is None:
+        try:
+            ring = FrameRing(name=ref.name)
+        except FileNotFoundError:
+            # Unlinked already: the feed stopped or moved on to a newer ring.
+            return None
+    else:
+        ring = entry[0]
+    _attached[source] = (ring, now)
+    result = ring.read(ref.seq)
+    return result[1] if result is not None else None
@@ -0,0 +1,284 @@
+import collections
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+import streamlit as st
+
+from exam_config import (
+    SNAPSHOT_BLOCK_TIMEOUT,
+    SNAPSHOT_DEDUPE_HISTORY,
+    SNAPSHOT_DIR,
+    SNAPSHOT_FLUSH_TIMEOUT,
+    SNAPSHOT_HASH_DISTANCE,
+    SNAPSHOT_INDEX_NAME,
+    SNAPSHOT_JPEG_QUALITY,
+    SNAPSHOT_QUEUE_POLICY,
+    SNAPSHOT_QUEUE_SIZE,
+    SNAPSHOT_SESSION_BUDGET,
+)
+from exam_incidents import session_stamp
+from exam_store import ensure_incident_store
+
+
+def dhash(frame_bgr: np.ndarray) -> int:
+    """64-bit difference hash: left-to-right brightness steps of a 9x8 thumbnail."""
+    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(small[:, 1:] > small[:, :-1]).tobytes(), "big")
+
+
+class SnapshotStore:
+    """Snapshot files of one session, deduplicated and kept under a disk budget.
+
+    plan() runs on the detection loop and only hashes the frame; when it is a
+    near-duplicate of one of the feed's recent written snapshots, that file's
+    path is returned instead of a new one. Incidents attach() to the file they
+    show; when the budget evicts it, their "snapshot" is cleared and
+    ``on_evict(path)`` runs. The writer thread reports each finished
+    file through done(), which evicts the oldest files past ``budget`` bytes
+    and rewrites the index. A store reopened on the same session (after Stop
+    and Start) picks up the index and byte total left by the previous one.
+    """
+
+    def __init__(self, directory: str, budget: int = SNAPSHOT_SESSION_BUDGET, on_evict=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.budget = budget
+        self.on_evict = on_evict
+        self.index_path = os.path.join(directory, SNAPSHOT_INDEX_NAME)
+        self.total_bytes = 0
+        self.duplicates = 0
+        self.evicted = 0
+        self._entries = collections.OrderedDict()
+        self._recent = {}
+        self._refs = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self) -> None:
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.duplicates = index.get("duplicates_skipped", 0)
+        self.evicted = index.get("evicted", 0)
+        for item in sorted(index.get("snapshots", []), key=lambda item: item["ts"]):
+            path = os.path.join(self.directory, item["file"])
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            self._entries[path] = {"feed": item["feed"], "ts": item["ts"], "dhash": item["dhash"], "bytes": size}
+            self.total_bytes += size
+            recent = self._recent.setdefault(item["feed"], collections.deque(maxlen=SNAPSHOT_DEDUPE_HISTORY))
+            recent.append((int(item["dhash"], 16), path))
+        self._counter = len(self._entries)
+
+    def _new_path(self, source: str, ts: float) -> str:
+        # The per-store counter keeps names unique even within one microsecond.
+        self._counter += 1
+        stamp = datetime.fromtimestamp(ts).strftime("%Y%m%d_%H%M%S_%f")
+        safe_source = source.replace(":", "_").replace("/", "_").replace("\\", "_")
+        return os.path.join(self.directory, f"feed_{safe_source}_{stamp}_{self._counter:05d}.jpg")
+
+    def plan(self, frame_bgr: np.ndarray, source: str) -> tuple[str, bool]:
+        """Return (path, fresh); fresh is False when the frame repeats a recent snapshot."""
+        ts = time.time()
+        frame_hash = dhash(frame_bgr)
+        with self._lock:
+            recent = self._recent.setdefault(source, collections.deque(maxlen=SNAPSHOT_DEDUPE_HISTORY))
+            for seen_hash, path in recent:
+                if bin(seen_hash ^ frame_hash).count("1") <= SNAPSHOT_HASH_DISTANCE:
+                    self.duplicates += 1
+                    return path, False
+            # Only written files are matched; the hash joins ``recent`` in done().
+            path = self._new_path(source, ts)
+            self._entries[path] = {"feed": source, "ts": ts, "dhash": f"{frame_hash:016x}", "bytes": 0}
+        return path, True
+
+    def attach(self, path: str, incident: dict) -> None:
+        with self._lock:
+            if path in self._entries:
+                self._refs.setdefault(path, []).append(incident)
+
+    def _forget_locked(self, path: str) -> list:
+        refs = self._refs.pop(path, [])
+        entry = self._entries.pop(path, None)
+        if entry is None:
+            return refs
+        self.total_bytes -= entry["bytes"]
+        recent = self._recent.get(entry["feed"])
+        if recent is not None:
+            for item in [item for item in recent if item[1] == path]:
+                recent.remove(item)
+        return refs
+
+    def done(self, path: str, ok: bool) -> None:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return
+            if not ok:
+                self._forget_locked(path)
+                return
+            try:
+                entry["bytes"] = os.path.getsize(path)
+            except OSError:
+                for incident in self._forget_locked(path):
+                    incident["snapshot"] = ""
+                return
+            self.total_bytes += entry["bytes"]
+            recent = self._recent.setdefault(entry["feed"], collections.deque(maxlen=SNAPSHOT_DEDUPE_HISTORY))
+            recent.append((int(entry["dhash"], 16), path))
+            evicted = []
+            while self.total_bytes > self.budget:
+                oldest = next((p for p, e in self._entries.items() if e["bytes"]), None)
+                if oldest is None:
+                    break
+                evicted.append((oldest, self._forget_locked(oldest)))
+                self.evicted += 1
+                try:
+                    os.remove(oldest)
+                except OSError:
+                    pass
+        for evicted_path, refs in evicted:
+            for incident in refs:
+                incident["snapshot"] = ""
+            if self.on_evict is not None:
+                self.on_evict(evicted_path)
+        self.write_index()
+
+    def write_index(self) -> None:
+        with self._lock:
+            index = {
+                "budget_bytes": self.budget,
+                "total_bytes": self.total_bytes,
+                "duplicates_skipped": self.duplicates,
+                "evicted": self.evicted,
+                "snapshots": [
+                    dict(entry, file=os.path.basename(path))
+                    for path, entry in self._entries.items()
+                    if entry["bytes"]
+                ],
+            }
+        # Written through a temp file so readers never see a partial index.
+        with self._index_lock:
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=1)
+            os.replace(tmp_path, self.index_path)
+
+
+class SnapshotWriter:
+    """Bounded queue of frames that a background thread encodes and writes to disk.
+
+    Each job may carry an incident dict; its "snapshot" field is set to the
+    written path, or cleared when the frame was dropped or could not be saved.
+    ``on_done(path, ok)`` is called for every job as well, and
+    ``on_cleared(incident)`` after an incident's path was cleared.
+    """
+
+    def __init__(self, max_pending: int = SNAPSHOT_QUEUE_SIZE, policy: str = SNAPSHOT_QUEUE_POLICY, on_done=None,
+                 on_cleared=None):
+        self.max_pending = max_pending
+        self.policy = policy
+        self.on_done = on_done
+        self.on_cleared = on_cleared
+        self.dropped = 0
+        self._pending = collections.deque()
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame_bgr: np.ndarray, path: str, incident: dict = None) -> bool:
+        """Queue a frame; returns False when an older pending frame had to be dropped."""
+        # Ring-buffer views get reused by the capture thread, so keep a private copy.
+        job = (np.array(frame_bgr, copy=True), path, incident)
+        dropped = None
+        with self._cond:
+            if self.policy == "block":
+                self._cond.wait_for(lambda: len(self._pending) < self.max_pending, SNAPSHOT_BLOCK_TIMEOUT)
+            if len(self._pending) >= self.max_pending:
+                dropped = self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(job)
+            self._cond.notify_all()
+        if dropped is not None:
+            self._finish(dropped, False)
+        return dropped is None
+
+    def _finish(self, job: tuple, ok: bool) -> None:
+        _, path, incident = job
+        if incident is not None:
+            incident["snapshot"] = path if ok else ""
+            if not ok and self.on_cleared is not None:
+                self.on_cleared(incident)
+        if self.on_done is not None:
+            self.on_done(path, ok)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                job = self._pending.popleft()
+                self._busy = True
+                self._cond.notify_all()
+            frame, path, _ = job
+            try:
+                ok = cv2.imwrite(path, frame, [cv2.IMWRITE_JPEG_QUALITY, SNAPSHOT_JPEG_QUALITY])
+            except cv2.error:
+                ok = False
+            self._finish(job, ok)
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def flush(self, timeout: float = SNAPSHOT_FLUSH_TIMEOUT) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def close(self, timeout: float = SNAPSHOT_FLUSH_TIMEOUT) -> None:
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=1.0)
+
+
+def ensure_snapshot_store() -> SnapshotStore:
+    if st.session_state.snapshot_store is None:
+        directory = os.path.join(SNAPSHOT_DIR, session_stamp(st.session_state.session_started_at))
+        st.session_state.snapshot_store = SnapshotStore(directory, on_evict=ensure_incident_store().forget_snapshot)
+    return st.session_state.snapshot_store
+
+
+def close_snapshot_store() -> None:
+    if st.session_state.snapshot_store is not None:
+        st.session_state.snapshot_store.write_index()
+        st.session_state.snapshot_store = None
+
+
+def ensure_snapshot_writer() -> SnapshotWriter:
+    if st.session_state.snapshot_writer is None:
+        st.session_state.snapshot_writer = SnapshotWriter(
+            on_done=ensure_snapshot_store().done, on_cleared=ensure_incident_store().update_paths
+        )
+    return st.session_state.snapshot_writer
+
+
+def close_snapshot_writer() -> None:
+    if st.session_state.snapshot_writer is not None:
+        st.session_state.snapshot_writer.close()
+        st.session_state.snapshot_writer = None
@@ -1,3 +1,4 @@
+import threading
 import time
 from datetime import datetime
 
@@ -15,27 +16,43 @@ def init_state() -> None:
         "captures": {},
         "cam_workers": {},
         "feed_frames": {},
+        "feed_frame_refs": {},
+        "feed_frame_seq": {},
+        "feed_frame_ts": {},
+        "feed_analyzed_seq": {},
         "feed_status": {},
         "feed_signals": {},
+        "feed_metrics": {},
         "feed_risk_scores": {},
         "feed_counters": {},
+        "motion_thumbs": {},
+        "last_full_analysis_ts": {},
         "cam_retry_after": {},
         "cam_last_ok": {},
         "events": [],
         "incidents": [],
-        "report_csv": "",
         "report_txt": "",
         "per_camera_reports": {},
         "report_ready": False,
         "risk_score": 0.0,
         "tick": 0,
-        "rr_index": 0,
         "analysis_batch_size": 2,
-        "face_mesh": None,
-        "hands": None,
+        "detector_pool": {},
+        "landmark_executor": None,
+        "detection_engine": None,
+        "engine_ready": False,
+        "engine_warmup": {},
+        "snapshot_writer": None,
+        "snapshot_store": None,
+        "clip_recorder": None,
+        "incident_log": None,
+        "incident_store": None,
+        "columnar_exporter": None,
         "last_snapshot_ts": {},
         "last_incident_ts": {},
         "last_detect_ts": 0.0,
+        "feed_stage_costs": {},
+        "feed_last_analysis_ts": {},
         "grid_cols": 3,
         "live_preview": True,
     }
@@ -44,10 +61,14 @@ def init_state() -> None:
             st.session_state[key] = value
 
 
-def add_event(message: str) -> None:
-    ts = time.strftime("%H:%M:%S")
-    st.session_state.events.insert(0, f"[{ts}] {message}")
-    st.session_state.events = st.session_state.events[:30]
+# add_event is called from HTTP handlers, the detection loop and writer threads.
+_events_lock = threading.Lock()
+
+
+def add_event(message: str, at: float | None = None) -> None:
+    ts = time.strftime("%H:%M:%S", time.localtime(at))
+    with _events_lock:
+        st.session_state.events = [f"[{ts}] {message}"] + st.session_state.events[:29]
 
 
 def parse_candidate_map(raw_text: str) -> dict:
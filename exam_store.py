@@ -0,0 +1,269 @@
+import collections
+import os
+import sqlite3
+import threading
+import time
+
+import streamlit as st
+
+from exam_config import INCIDENT_DB_PATH, INCIDENT_MEMORY_LIMIT, INCIDENT_STORE_BATCH, INCIDENT_STORE_FLUSH_INTERVAL
+
+COLUMNS = [
+    "incident_id",
+    "session",
+    "ts",
+    "timestamp",
+    "feed",
+    "candidate",
+    "resume",
+    "severity",
+    "mobile",
+    "talking",
+    "paper",
+    "head_turn",
+    "risk_score",
+    "snapshot",
+    "clip",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    incident_id INTEGER PRIMARY KEY,
+    session     TEXT NOT NULL,
+    ts          REAL NOT NULL,
+    timestamp   TEXT NOT NULL,
+    feed        TEXT NOT NULL,
+    candidate   TEXT,
+    resume      TEXT,
+    severity    TEXT NOT NULL,
+    mobile      TEXT,
+    talking     TEXT,
+    paper       TEXT,
+    head_turn   TEXT,
+    risk_score  INTEGER,
+    snapshot    TEXT,
+    clip        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_incidents_feed ON incidents (session, feed, ts);
+CREATE INDEX IF NOT EXISTS idx_incidents_ts ON incidents (session, ts);
+CREATE INDEX IF NOT EXISTS idx_incidents_severity ON incidents (session, severity, ts);
+CREATE INDEX IF NOT EXISTS idx_incidents_candidate ON incidents (session, candidate, ts);
+"""
+
+# A behaviour counts when its signal text starts with the detector's alert wording.
+BEHAVIOR_PATTERNS = {
+    "mobile": ("mobile", "Possible%"),
+    "talking": ("talking", "Talking%"),
+    "paper": ("paper", "Paper%"),
+    "head_turn": ("head_turn", "Repeated%"),
+}
+
+
+class IncidentStore:
+    """Incidents of one monitoring session in a shared SQLite database.
+
+    record() only queues the incident. A daemon thread inserts queued rows in
+    one transaction per batch (every INCIDENT_STORE_FLUSH_INTERVAL seconds, or
+    as soon as batch_size are waiting); SQLite assigns the incident_ids there,
+    so several stores (apps, Streamlit sessions) can share one database. Rows
+    take the snapshot and clip paths current at insert time; a writer that
+    clears a path later calls update_paths(), which rewrites the row and runs
+    the incident's ``on_stored`` again so append-only logs get a correction
+    row. Queries flush first, so they always see every recorded incident.
+    """
+
+    def __init__(self, session: str, path: str = INCIDENT_DB_PATH, batch_size: int = INCIDENT_STORE_BATCH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.session = session
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # Databases created before clips were recorded lack the column.
+        if "clip" not in {row[1] for row in self._conn.execute("PRAGMA table_info(incidents)")}:
+            self._conn.execute("ALTER TABLE incidents ADD COLUMN clip TEXT")
+        self._lock = threading.Lock()
+        self._pending = []
+        self._updates = []
+        # incident_id -> on_stored, for the incidents writers may still change.
+        self._on_stored = collections.OrderedDict()
+        self.session_total = self._conn.execute(
+            "SELECT COUNT(*) FROM incidents WHERE session = ?", (session,)
+        ).fetchone()[0]
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+
+    def record(self, incident: dict, on_stored=None) -> None:
+        """Queue ``incident``; ``on_stored(incident)`` runs once it has its incident_id."""
+        with self._lock:
+            self._pending.append((incident, on_stored))
+            self.session_total += 1
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+
+    def _row(self, incident: dict) -> tuple:
+        return (
+            self.session,
+            incident.get("ts", time.time()),
+            incident["timestamp"],
+            incident["feed"],
+            incident.get("candidate", ""),
+            incident.get("resume", ""),
+            incident["severity"],
+            incident.get("mobile", ""),
+            incident.get("talking", ""),
+            incident.get("paper", ""),
+            incident.get("head_turn", ""),
+            incident.get("risk_score", 0),
+            incident.get("snapshot", ""),
+            incident.get("clip", ""),
+        )
+
+    def update_paths(self, incident: dict) -> None:
+        """Write the incident's current snapshot and clip paths, e.g. after a failed write."""
+        with self._lock:
+            # Still queued: the insert will pick up the new paths.
+            if "incident_id" not in incident:
+                return
+            self._updates.append(incident)
+            self._wake.set()
+
+    def _flush_locked(self) -> None:
+        self._insert_locked()
+        if not self._updates:
+            return
+        updates, self._updates = self._updates, []
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE incidents SET snapshot = ?, clip = ? WHERE incident_id = ?",
+                [(inc.get("snapshot", ""), inc.get("clip", ""), inc["incident_id"]) for inc in updates],
+            )
+        for incident in updates:
+            on_stored = self._on_stored.get(incident["incident_id"])
+            if on_stored is not None:
+                on_stored(incident)
+
+    def _insert_locked(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        columns = COLUMNS[1:]
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO incidents ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [self._row(incident) for incident, _ in pending],
+            )
+            # The transaction holds the write lock, so SQLite gave the batch
+            # consecutive rowids ending at last_insert_rowid().
+            last_id = self._conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        for offset, (incident, on_stored) in enumerate(pending):
+            incident["incident_id"] = last_id - len(pending) + 1 + offset
+            if on_stored is not None:
+                self._on_stored[incident["incident_id"]] = on_stored
+                on_stored(incident)
+        while len(self._on_stored) > INCIDENT_MEMORY_LIMIT:
+            self._on_stored.popitem(last=False)
+
+    def forget_snapshot(self, path: str) -> None:
+        """Clear ``path`` from every incident of the session, e.g. once the file was evicted."""
+        with self._lock:
+            self._flush_locked()
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE incidents SET snapshot = '' WHERE session = ? AND snapshot = ?", (self.session, path)
+                )
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(INCIDENT_STORE_FLUSH_INTERVAL)
+            self._wake.clear()
+            self.flush()
+
+    def _query(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            self._flush_locked()
+            return self._conn.execute(sql, params).fetchall()
+
+    def _where(self, feed=None, candidate=None, severities=None, since=None, until=None) -> tuple[str, list]:
+        clauses, params = ["session = ?"], [self.session]
+        if feed is not None:
+            clauses.append("feed = ?")
+            params.append(feed)
+        if candidate is not None:
+            clauses.append("candidate = ?")
+            params.append(candidate)
+        if severities:
+            clauses.append(f"severity IN ({', '.join('?' * len(severities))})")
+            params.extend(severities)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        return " AND ".join(clauses), params
+
+    def timeline(self, feed=None, candidate=None, severities=None, since=None, until=None, limit: int = 0) -> list[dict]:
+        """Incidents in time order, filtered by feed, candidate, severity and ts range."""
+        where, params = self._where(feed, candidate, severities, since, until)
+        sql = f"SELECT * FROM incidents WHERE {where} ORDER BY ts"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self._query(sql, tuple(params))]
+
+    def count(self, feed=None, candidate=None, severities=None, since=None, until=None) -> int:
+        where, params = self._where(feed, candidate, severities, since, until)
+        return self._query(f"SELECT COUNT(*) FROM incidents WHERE {where}", tuple(params))[0][0]
+
+    def counts_by(self, column: str, feed=None, candidate=None, severities=None) -> dict:
+        """Incident counts grouped by "feed", "candidate" or "severity"."""
+        if column not in ("feed", "candidate", "severity"):
+            raise ValueError(f"Cannot group incidents by {column!r}")
+        where, params = self._where(feed, candidate, severities)
+        rows = self._query(f"SELECT {column}, COUNT(*) FROM incidents WHERE {where} GROUP BY {column}", tuple(params))
+        return {row[0]: row[1] for row in rows}
+
+    def behavior_counts(self, feed=None, candidate=None) -> dict:
+        where, params = self._where(feed, candidate)
+        sums = ", ".join(f"COALESCE(SUM({col} LIKE ?), 0)" for col, _ in BEHAVIOR_PATTERNS.values())
+        patterns = [pattern for _, pattern in BEHAVIOR_PATTERNS.values()]
+        row = self._query(f"SELECT {sums} FROM incidents WHERE {where}", tuple(patterns + params))[0]
+        return dict(zip(BEHAVIOR_PATTERNS, row))
+
+    def clear_session(self) -> None:
+        with self._lock:
+            self._pending = []
+            self._updates = []
+            self._on_stored.clear()
+            with self._conn:
+                self._conn.execute("DELETE FROM incidents WHERE session = ?", (self.session,))
+            self.session_total = 0
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=1.0)
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+def ensure_incident_store() -> IncidentStore:
+    if st.session_state.incident_store is None:
+        st.session_state.incident_store = IncidentStore(st.session_state.session_started_at)
+    return st.session_state.incident_store
+
+
+def close_incident_store() -> None:
+    if st.session_state.incident_store is not None:
+        st.session_state.incident_store.close()
+        st.session_state.incident_store = None
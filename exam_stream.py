@@ -0,0 +1,235 @@
+import threading
+
+import cv2
+import numpy as np
+
+from exam_camera import offline_frame
+from exam_config import (
+    MOSAIC_BORDER,
+    MOSAIC_TILE_SIZE,
+    STREAM_DEFAULT_WIDTH,
+    STREAM_FAST_RATIO,
+    STREAM_JPEG_QUALITY,
+    STREAM_MIN_INTERVAL,
+    STREAM_SLOW_RATIO,
+    STREAM_TIERS,
+    STREAM_UPGRADE_AFTER,
+)
+
+
+class EncodedFrameCache:
+    """Per-feed JPEG cache keyed by frame sequence and (width, quality) tier.
+
+    The background loop publishes its latest frames; the first client that asks
+    for a new sequence at a tier encodes it and every other client on that tier
+    reuses those bytes.
+    """
+
+    def __init__(self, quality: int = STREAM_JPEG_QUALITY):
+        self.quality = quality
+        self._frames = {}
+        self._encoded = {}
+        self._locks = {}
+        self._cond = threading.Condition()
+        self.version = 0
+
+    def update(self, frames: dict, seqs: dict) -> None:
+        """Publish the current frames and wake streams waiting for a new one."""
+        published = {source: (seqs.get(source, 0), frame) for source, frame in frames.items()}
+        with self._cond:
+            self._frames = published
+            for source in list(self._encoded):
+                if source not in published:
+                    self._encoded.pop(source, None)
+            self.version += 1
+            self._cond.notify_all()
+
+    def current_seq(self, source: str) -> int:
+        entry = self._frames.get(source)
+        return entry[0] if entry is not None else -1
+
+    def frame(self, source: str):
+        return self._frames.get(source, (-1, None))[1]
+
+    def _source_lock(self, source: str) -> threading.Lock:
+        with self._cond:
+            return self._locks.setdefault(source, threading.Lock())
+
+    def jpeg(self, source: str, width: int = 0, quality: int = 0) -> tuple[int, bytes]:
+        """Return (seq, jpeg bytes) for the feed's latest frame, encoding it at most once per tier.
+
+        ``width`` 0 keeps the captured size; ``quality`` 0 uses the cache default.
+        """
+        tier = (width, quality or self.quality)
+        seq, frame = self._frames.get(source, (-1, None))
+        cached = self._encoded.get(source, {}).get(tier)
+        if cached is not None and cached[0] == seq:
+            return cached
+
+        # Concurrent clients asking for the same new frame wait for one encode.
+        with self._source_lock(source):
+            tiers = self._encoded.setdefault(source, {})
+            cached = tiers.get(tier)
+            if cached is not None and cached[0] == seq:
+                return cached
+            if frame is None:
+                frame = offline_frame("No Frame")
+            if width and frame.shape[1] > width:
+                height = max(1, int(frame.shape[0] * width / frame.shape[1]))
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, tier[1]])
+            if not ok:
+                return seq, b""
+            cached = (seq, encoded.tobytes())
+            tiers[tier] = cached
+            return cached
+
+    def wait_for_change(self, source: str, last_seq: int, timeout: float) -> int:
+        with self._cond:
+            self._cond.wait_for(lambda: self.current_seq(source) != last_seq, timeout)
+            return self.current_seq(source)
+
+    def wait_for_update(self, version: int, timeout: float) -> int:
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+def tier_for_width(width: int) -> int:
+    """Index of the largest STREAM_TIERS entry that fits within ``width`` pixels."""
+    for index, (tier_width, _) in enumerate(STREAM_TIERS):
+        if tier_width <= width:
+            return index
+    return len(STREAM_TIERS) - 1
+
+
+class AdaptiveStream:
+    """Picks a client's stream tier from how long each multipart part takes to drain."""
+
+    def __init__(self, width: int, quality: int = 0, max_fps: float = 0.0):
+        self.best = tier_for_width(width)
+        self.index = self.best
+        self.quality = max(10, min(95, quality)) if quality else 0
+        self.interval = max(STREAM_MIN_INTERVAL, 1.0 / max_fps) if max_fps > 0 else STREAM_MIN_INTERVAL
+        self._fast_parts = 0
+
+    @property
+    def tier(self) -> tuple[int, int]:
+        width, quality = STREAM_TIERS[self.index]
+        if self.quality:
+            # An explicit quality holds on the requested tier and caps the ones below it.
+            quality = self.quality if self.index == self.best else min(self.quality, quality)
+        return width, quality
+
+    def record(self, send_seconds: float) -> None:
+        if send_seconds > self.interval * STREAM_SLOW_RATIO:
+            self.index = min(len(STREAM_TIERS) - 1, self.index + 1)
+            self._fast_parts = 0
+        elif send_seconds < self.interval * STREAM_FAST_RATIO:
+            self._fast_parts += 1
+            if self._fast_parts >= STREAM_UPGRADE_AFTER and self.index > self.best:
+                self.index -= 1
+                self._fast_parts = 0
+        else:
+            self._fast_parts = 0
+
+
+def stream_client(args) -> AdaptiveStream:
+    """Build a client's AdaptiveStream from ``width``, ``quality`` and ``fps`` query arguments."""
+    def number(name, default, cast):
+        try:
+            return cast(args.get(name, default))
+        except (TypeError, ValueError):
+            return default
+
+    return AdaptiveStream(number("width", STREAM_DEFAULT_WIDTH, int), number("quality", 0, int), number("fps", 0.0, float))
+
+
+def hex_to_bgr(color: str) -> tuple[int, int, int]:
+    color = color.lstrip("#")
+    r, g, b = (int(color[i:i + 2], 16) for i in (0, 2, 4))
+    return b, g, r
+
+
+def _fit_tile(frame: np.ndarray, tile_w: int, tile_h: int) -> np.ndarray:
+    tile = np.zeros((tile_h, tile_w, 3), dtype=np.uint8)
+    h, w = frame.shape[:2]
+    scale = min(tile_w / w, tile_h / h)
+    new_w, new_h = max(1, int(w * scale)), max(1, int(h * scale))
+    top, left = (tile_h - new_h) // 2, (tile_w - new_w) // 2
+    tile[top:top + new_h, left:left + new_w] = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_AREA)
+    return tile
+
+
+class MosaicCache:
+    """All feeds composited into one grid frame, encoded once per frame set and layout."""
+
+    def __init__(self, frames: EncodedFrameCache, quality: int = STREAM_JPEG_QUALITY, tile_size: tuple = MOSAIC_TILE_SIZE):
+        self.frames = frames
+        self.quality = quality
+        self.tile_size = tile_size
+        self._key = None
+        self._jpeg = b""
+        self._lock = threading.Lock()
+
+    def _compose(self, tiles: tuple, cols: int) -> np.ndarray:
+        tile_w, tile_h = self.tile_size
+        rows = max(1, -(-len(tiles) // cols))
+        canvas = np.zeros((rows * tile_h, cols * tile_w, 3), dtype=np.uint8)
+        for i, (source, border_color, label) in enumerate(tiles):
+            frame = self.frames.frame(source)
+            if frame is None:
+                frame = offline_frame("No Frame")
+            y, x = (i // cols) * tile_h, (i % cols) * tile_w
+            cell = canvas[y:y + tile_h, x:x + tile_w]
+            cell[:] = _fit_tile(frame, tile_w, tile_h)
+            half = MOSAIC_BORDER // 2
+            cv2.rectangle(cell, (half, half), (tile_w - 1 - half, tile_h - 1 - half), hex_to_bgr(border_color), MOSAIC_BORDER)
+            cv2.rectangle(cell, (MOSAIC_BORDER, tile_h - 28), (tile_w - MOSAIC_BORDER, tile_h - MOSAIC_BORDER), (10, 22, 40), -1)
+            cv2.putText(cell, label, (10, tile_h - 11), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (230, 230, 230), 1, cv2.LINE_AA)
+        return canvas
+
+    def jpeg(self, rows: list[dict], cols: int) -> tuple[tuple, bytes]:
+        """Return (key, jpeg bytes) for the dashboard rows; the key changes whenever the picture does."""
+        cols = max(1, min(int(cols), len(rows) or 1))
+        tiles = tuple(
+            (row["source"], row["border_color"], f"Cam {row['index']} | {row['status_text']}") for row in rows
+        )
+        key = (cols, tiles, tuple(self.frames.current_seq(source) for source, _, _ in tiles))
+        if key == self._key:
+            return key, self._jpeg
+
+        with self._lock:
+            if key != self._key:
+                ok, encoded = cv2.imencode(
+                    ".jpg", self._compose(tiles, cols), [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+                )
+                self._key, self._jpeg = key, encoded.tobytes() if ok else b""
+            return self._key, self._jpeg
+
+
+class StateChannel:
+    """Latest dashboard state plus a version counter that SSE clients wait on."""
+
+    def __init__(self):
+        self.state = {}
+        self.version = 0
+        self._cond = threading.Condition()
+
+    def publish(self, state: dict) -> None:
+        with self._cond:
+            if state == self.state:
+                return
+            self.state = state
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait(self, since: int, timeout: float) -> int:
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != since, timeout)
+            return self.version
+
+
+def state_delta(sent: dict, state: dict) -> dict:
+    """Top-level keys of ``state`` whose value differs from what the client already has."""
+    return {key: value for key, value in state.items() if sent.get(key) != value}
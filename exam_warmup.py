@@ -0,0 +1,70 @@
+import threading
+import time
+
+
+class ModelWarmup:
+    """Runs slow start-up steps (imports, model construction) on a background thread.
+
+    ``steps`` is a list of (label, callable). Progress is kept in a small dict so
+    /health can report it while the server already answers requests.
+    """
+
+    def __init__(self, steps: list[tuple]):
+        self.steps = steps
+        self._thread = None
+        self._lock = threading.Lock()
+        self._status = self._initial_status()
+
+    def _initial_status(self) -> dict:
+        return {
+            "state": "idle",
+            "stage": "",
+            "step": 0,
+            "steps": len(self.steps),
+            "error": "",
+            "started_at": None,
+            "finished_at": None,
+            "timings": {},
+        }
+
+    def start(self, again: bool = False) -> None:
+        """Start the warm-up once; ``again`` re-runs a finished or failed one."""
+        with self._lock:
+            if self._status["state"] == "loading" or (self._status["state"] != "idle" and not again):
+                return
+            self._status = dict(self._initial_status(), state="loading", started_at=time.time())
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def _update(self, **fields) -> None:
+        with self._lock:
+            self._status.update(fields)
+
+    def _run(self) -> None:
+        for step, (label, fn) in enumerate(self.steps, start=1):
+            self._update(stage=label, step=step)
+            started = time.perf_counter()
+            try:
+                fn()
+            except Exception as exc:
+                self._update(state="failed", error=f"{label}: {type(exc).__name__}: {exc}", finished_at=time.time())
+                return
+            with self._lock:
+                self._status["timings"][label] = round(time.perf_counter() - started, 3)
+        self._update(state="ready", stage="", finished_at=time.time())
+
+    def rerun_due(self, retry_delay: float) -> bool:
+        """True after a finished run, or once a failed run is ``retry_delay`` seconds old."""
+        with self._lock:
+            if self._status["state"] == "ready":
+                return True
+            return self._status["state"] == "failed" and time.time() - self._status["finished_at"] >= retry_delay
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return self._status["state"] == "ready"
+
+    def status(self) -> dict:
+        with self._lock:
+            return dict(self._status, timings=dict(self._status["timings"]))
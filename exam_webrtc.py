@@ -0,0 +1,115 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import av
+import numpy as np
+from aiortc import MediaStreamTrack, RTCPeerConnection, RTCRtpSender, RTCSessionDescription
+from aiortc.contrib.media import MediaRelay
+from aiortc.mediastreams import VIDEO_CLOCK_RATE, VIDEO_TIME_BASE
+
+from exam_camera import offline_frame
+from exam_config import WEBRTC_CODEC, WEBRTC_FPS, WEBRTC_OFFER_TIMEOUT
+from exam_stream import EncodedFrameCache
+
+
+class FeedTrack(MediaStreamTrack):
+    """Video track that paces the latest published frame of one feed at a fixed rate."""
+
+    kind = "video"
+
+    def __init__(self, frames: EncodedFrameCache, source: str, fps: int = WEBRTC_FPS):
+        super().__init__()
+        self.frames = frames
+        self.source = source
+        self.step = int(VIDEO_CLOCK_RATE / fps)
+        self._start = None
+        self._pts = 0
+
+    async def recv(self) -> av.VideoFrame:
+        if self._start is None:
+            self._start = time.time()
+        else:
+            self._pts += self.step
+            await asyncio.sleep(max(0.0, self._start + self._pts / VIDEO_CLOCK_RATE - time.time()))
+
+        frame = self.frames.frame(self.source)
+        if frame is None:
+            frame = offline_frame("No Frame")
+        video_frame = av.VideoFrame.from_ndarray(np.ascontiguousarray(frame), format="bgr24")
+        video_frame.pts = self._pts
+        video_frame.time_base = VIDEO_TIME_BASE
+        return video_frame
+
+
+class WebRtcPublisher:
+    """Answers browser offers for feed previews from a private asyncio loop.
+
+    Each feed has one FeedTrack behind a MediaRelay, so frames are pulled and
+    converted once per feed however many peers subscribe.
+    """
+
+    def __init__(self, frames: EncodedFrameCache, codec: str = WEBRTC_CODEC):
+        self.frames = frames
+        self.codec = codec
+        self.relay = MediaRelay()
+        self._tracks = {}
+        self._peers = set()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def answer(self, source: str, sdp: str, kind: str = "offer") -> dict:
+        """Blocking helper for Flask handlers; returns the SDP answer as a dict."""
+        future = asyncio.run_coroutine_threadsafe(self._answer(source, sdp, kind), self.loop)
+        try:
+            return future.result(WEBRTC_OFFER_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def _codec_preferences(self) -> list:
+        codecs = RTCRtpSender.getCapabilities("video").codecs
+        preferred = [c for c in codecs if c.mimeType.lower() == f"video/{self.codec}"]
+        return preferred + [c for c in codecs if c not in preferred]
+
+    async def _answer(self, source: str, sdp: str, kind: str) -> dict:
+        pc = RTCPeerConnection()
+        self._peers.add(pc)
+
+        @pc.on("connectionstatechange")
+        async def on_connection_state():
+            if pc.connectionState in ("failed", "closed"):
+                self._peers.discard(pc)
+                await pc.close()
+
+        try:
+            await pc.setRemoteDescription(RTCSessionDescription(sdp=sdp, type=kind))
+            if source not in self._tracks:
+                self._tracks[source] = FeedTrack(self.frames, source)
+            pc.addTrack(self.relay.subscribe(self._tracks[source]))
+            for transceiver in pc.getTransceivers():
+                if transceiver.kind == "video":
+                    transceiver.setCodecPreferences(self._codec_preferences())
+
+            await pc.setLocalDescription(await pc.createAnswer())
+        except BaseException:
+            # A rejected or cancelled offer must not leave a half-open peer behind.
+            self._peers.discard(pc)
+            await pc.close()
+            raise
+        return {"sdp": pc.localDescription.sdp, "type": pc.localDescription.type}
+
+    async def _close_all(self) -> None:
+        await asyncio.gather(*(pc.close() for pc in list(self._peers)), return_exceptions=True)
+        self._peers.clear()
+        for track in self._tracks.values():
+            track.stop()
+        self._tracks.clear()
+
+    def close(self) -> None:
+        if self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._close_all(), self.loop).result(WEBRTC_OFFER_TIMEOUT)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=1.0)
@@ -1,24 +1,53 @@
-from ultralytics import YOLO
-import torch
+from exam_config import PHONE_INPUT_SIZE, PHONE_INT8_PATH, PHONE_MODEL_BACKEND, PHONE_MODEL_PATH, PHONE_ONNX_PATH
+
+
+def is_phone_class(class_name: str) -> bool:
+    name = class_name.lower()
+    return "mobile" in name or "phone" in name
+
 
 class YoloMobileDetector:
-    def __init__(self, model_path="best.pt"):
+    def __init__(self, model_path=PHONE_MODEL_PATH):
+        # Imported here so the ONNX backend never pulls torch into the process.
+        from ultralytics import YOLO
+        import torch
+
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.model = YOLO(model_path)
-        self.model.to(self.device)
+        # Exported graphs (e.g. best.int8.onnx) pick their own runtime device.
+        if str(model_path).endswith(".pt"):
+            self.model.to(self.device)
+        self.names = self.model.names
+
+    def phone_confidences(self, frames: list) -> list[float]:
+        results = self.model(frames, verbose=False)
+        confs = []
+        for result in results:
+            max_conf = 0.0
+            for box in result.boxes:
+                cls_id = int(box.cls[0])
+                conf = float(box.conf[0])
+                if is_phone_class(self.names[cls_id]):
+                    max_conf = max(max_conf, conf)
+            confs.append(max_conf)
+        return confs
 
     def detect_mobile(self, frame):
-        results = self.model(frame, verbose=False)[0]
+        return self.phone_confidences([frame])[0]
+
 
-        max_conf = 0.0
+def export_onnx(model_path=PHONE_MODEL_PATH, imgsz: int = PHONE_INPUT_SIZE) -> str:
+    from ultralytics import YOLO
 
-        for box in results.boxes:
-            cls_id = int(box.cls[0])
-            conf = float(box.conf[0])
+    # Dynamic axes let the ONNX session take a whole detection batch at once.
+    return YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
 
-            class_name = self.model.names[cls_id]
 
-            if "mobile" in class_name.lower() or "phone" in class_name.lower():
-                max_conf = max(max_conf, conf)
+def load_mobile_detector(backend: str = PHONE_MODEL_BACKEND):
+    if backend in ("onnx", "onnx-int8"):
+        from exam_onnx import OnnxMobileDetector
 
-        return max_conf
\ No newline at end of file
+        return OnnxMobileDetector(PHONE_INT8_PATH if backend == "onnx-int8" else PHONE_ONNX_PATH)
+    if backend != "torch":
+        raise ValueError(f"Unknown phone detector backend: {backend}")
+    return YoloMobileDetector(PHONE_MODEL_PATH)
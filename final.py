@@ -1,23 +1,39 @@
 import html
-import io
-import os
-import datetime
+import json
 import threading
 import time
 from urllib.parse import quote
 
-import cv2
 from flask import Flask, Response, jsonify, render_template_string, request
 
 import exam_camera
+import exam_clips
+import exam_columnar
 import exam_detection
+import exam_engine
+import exam_incidents
 import exam_reporting
+import exam_scheduler
+import exam_snapshots
 import exam_state
-from exam_camera import cleanup_removed_feeds, read_feed_frame, release_all_captures, scan_cameras
-from exam_config import ensure_dirs
-from exam_detection import close_detectors, detect_on_frame, ensure_detectors, init_feed_state
-from exam_reporting import record_incident, save_snapshot
+import exam_store
+from exam_camera import (
+    CameraScan, cleanup_removed_feeds, has_new_frame, mark_analyzed, read_feed_frame, release_all_captures,
+)
+from exam_clips import close_clip_recorder
+from exam_columnar import close_columnar_exporter
+from exam_config import ANALYSIS_TICK, SSE_KEEPALIVE, STREAM_IDLE_WAIT, STREAM_MIN_INTERVAL, WARMUP_RETRY_DELAY, WEBRTC_ENABLED, ensure_dirs
+from exam_detection import init_feed_state, load_mediapipe
+from exam_engine import close_engine, detect_feeds, engine_ready, ensure_engine, preload_engine
+from exam_incidents import close_incident_log
+from exam_pdf import ReportJobs
+from exam_reporting import incident_count, plan_snapshot, record_incident, reset_incidents, save_snapshot
+from exam_scheduler import schedule_feeds
+from exam_snapshots import close_snapshot_store, close_snapshot_writer
 from exam_state import add_event, get_candidate_meta, init_state, parse_candidate_map
+from exam_store import close_incident_store, ensure_incident_store
+from exam_stream import EncodedFrameCache, MosaicCache, StateChannel, state_delta, stream_client
+from exam_warmup import ModelWarmup
 
 
 # ── shim so sub-modules keep working ────────────────────────────────────────
@@ -38,278 +54,111 @@ class StreamlitShim:
 
 st = StreamlitShim()
 exam_camera.st   = st
+exam_clips.st = st
+exam_columnar.st = st
 exam_detection.st = st
+exam_engine.st    = st
+exam_incidents.st = st
+exam_scheduler.st = st
+exam_snapshots.st = st
 exam_reporting.st = st
 exam_state.st    = st
+exam_store.st = st
 
 app        = Flask(__name__)
 state_lock = threading.RLock()
+# Serializes capture/inference with detector teardown; HTTP reads never take it.
+engine_lock = threading.Lock()
+feeds_changed   = threading.Event()
+close_requested = threading.Event()
+reset_requested = threading.Event()
 bg_stop    = threading.Event()
 bg_thread  = None
+state_channel = StateChannel()
+frame_cache = EncodedFrameCache()
+mosaic_cache = MosaicCache(frame_cache)
+webrtc = None
+camera_scan = CameraScan()
+# Models load in the background so the server answers (and scans cameras) at once.
+warmup = ModelWarmup([
+    ("Importing MediaPipe", load_mediapipe),
+    ("Loading detection models", lambda: preload_engine(engine_lock)),
+])
+report_jobs = ReportJobs()
+
+PUBLISH_INTERVAL = 0.25
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-#  PDF REPORT BUILDER
+#  PDF REPORTS  (rendered by exam_pdf.ReportJobs in worker processes)
 # ─────────────────────────────────────────────────────────────────────────────
 
-def build_exam_pdf(source, candidate, incidents, snapshot_paths, events, risk_score):
-    """
-    Generate a PDF report for one camera / candidate.
-    Returns raw PDF bytes.
-    """
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib import colors
-    from reportlab.lib.units import cm
-    from reportlab.platypus import (
-        SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
-        HRFlowable, Image as RLImage,
-    )
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.enums import TA_CENTER
-
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buf, pagesize=A4,
-        leftMargin=2*cm, rightMargin=2*cm,
-        topMargin=2*cm,  bottomMargin=2*cm,
-        title=f"Exam Report – {candidate}",
-    )
-    W, _ = A4
-    styles = getSampleStyleSheet()
-    now_str = datetime.datetime.now().strftime("%d %b %Y  %H:%M:%S")
-
-    title_s = ParagraphStyle("T", parent=styles["Title"], fontSize=22,
-                              textColor=colors.HexColor("#0b1e35"),
-                              spaceAfter=6, alignment=TA_CENTER)
-    sub_s   = ParagraphStyle("S", parent=styles["Normal"], fontSize=11,
-                              textColor=colors.HexColor("#2d5f9a"),
-                              spaceAfter=4, alignment=TA_CENTER)
-    sec_s   = ParagraphStyle("H", parent=styles["Heading2"], fontSize=13,
-                              textColor=colors.HexColor("#0b1e35"),
-                              spaceBefore=14, spaceAfter=4)
-    small   = ParagraphStyle("Sm", parent=styles["Normal"], fontSize=9,
-                              textColor=colors.HexColor("#444"))
-    foot_s  = ParagraphStyle("F", parent=small, alignment=TA_CENTER,
-                              textColor=colors.HexColor("#888"))
-    normal  = styles["Normal"]
-
-    story = []
-
-    # ── Header ───────────────────────────────────────────────────────────────
-    story.append(Paragraph("AI Exam Monitoring System", title_s))
-    story.append(Paragraph("Proctoring Incident Report", sub_s))
-    story.append(HRFlowable(width="100%", thickness=2,
-                             color=colors.HexColor("#2d5f9a")))
-    story.append(Spacer(1, 0.3*cm))
-
-    info_data = [
-        ["Candidate",        candidate or "—"],
-        ["Camera / Source",  str(source)],
-        ["Report Generated", now_str],
-        ["Total Incidents",  str(len(incidents))],
-        ["Final Risk Score", f"{int(risk_score)} / 100"],
-    ]
-    it = Table(info_data, colWidths=[5*cm, 12*cm])
-    it.setStyle(TableStyle([
-        ("BACKGROUND",    (0,0), (0,-1), colors.HexColor("#e8f0fa")),
-        ("FONTNAME",      (0,0), (0,-1), "Helvetica-Bold"),
-        ("FONTSIZE",      (0,0),(-1,-1), 10),
-        ("GRID",          (0,0),(-1,-1), 0.5, colors.HexColor("#adc1df")),
-        ("ROWBACKGROUNDS",(0,0),(-1,-1), [colors.white, colors.HexColor("#f4f8ff")]),
-        ("VALIGN",        (0,0),(-1,-1), "MIDDLE"),
-        ("LEFTPADDING",   (0,0),(-1,-1), 8),
-        ("TOPPADDING",    (0,0),(-1,-1), 5),
-        ("BOTTOMPADDING", (0,0),(-1,-1), 5),
-    ]))
-    story.append(it)
-    story.append(Spacer(1, 0.4*cm))
-
-    # ── Risk bar ─────────────────────────────────────────────────────────────
-    story.append(Paragraph("Risk Score", sec_s))
-    bar_pct  = min(100, max(0, int(risk_score)))
-    bar_col  = (colors.HexColor("#e53935") if bar_pct >= 60 else
-                colors.HexColor("#f5a623") if bar_pct >= 30 else
-                colors.HexColor("#2e7d32"))
-    usable_w = W - 4*cm
-    fill_w   = max(0.01, usable_w * bar_pct / 100)
-    empty_w  = max(0.01, usable_w - fill_w)
-    bar = Table([[""]], colWidths=[fill_w])
-    bar.setStyle(TableStyle([
-        ("BACKGROUND",    (0,0),(-1,-1), bar_col),
-        ("ROWHEIGHT",     (0,0),(-1,-1), 18),
-        ("GRID",          (0,0),(-1,-1), 0, colors.white),
-    ]))
-    outer = Table([[bar, ""]], colWidths=[fill_w, empty_w])
-    outer.setStyle(TableStyle([
-        ("BACKGROUND",    (1,0),(1,0), colors.HexColor("#dde4ee")),
-        ("ROWHEIGHT",     (0,0),(-1,-1), 18),
-        ("GRID",          (0,0),(-1,-1), 0.5, colors.HexColor("#adc1df")),
-        ("LEFTPADDING",   (0,0),(-1,-1), 0),
-        ("RIGHTPADDING",  (0,0),(-1,-1), 0),
-        ("TOPPADDING",    (0,0),(-1,-1), 0),
-        ("BOTTOMPADDING", (0,0),(-1,-1), 0),
-    ]))
-    story.append(outer)
-    story.append(Paragraph(f"Risk level: {bar_pct}/100", small))
-    story.append(Spacer(1, 0.3*cm))
-
-    # ── Snapshots ─────────────────────────────────────────────────────────────
-    valid_imgs = []
-    for sp in (snapshot_paths or [])[:8]:
-        try:
-            if isinstance(sp, str) and sp and os.path.isfile(sp):
-                valid_imgs.append(RLImage(sp, width=8*cm, height=6*cm, kind="proportional"))
-            elif sp is not None and not isinstance(sp, str):
-                # numpy frame
-                import tempfile
-                tmp = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
-                cv2.imwrite(tmp.name, sp)
-                tmp.close()
-                valid_imgs.append(RLImage(tmp.name, width=8*cm, height=6*cm, kind="proportional"))
-        except Exception:
-            pass
-
-    if valid_imgs:
-        story.append(Paragraph("Captured Snapshots", sec_s))
-        for i in range(0, len(valid_imgs), 2):
-            pair = valid_imgs[i:i+2]
-            while len(pair) < 2:
-                pair.append("")
-            pt = Table([pair], colWidths=[9*cm, 9*cm])
-            pt.setStyle(TableStyle([
-                ("ALIGN",         (0,0),(-1,-1), "CENTER"),
-                ("VALIGN",        (0,0),(-1,-1), "TOP"),
-                ("GRID",          (0,0),(-1,-1), 0.5, colors.HexColor("#adc1df")),
-                ("TOPPADDING",    (0,0),(-1,-1), 4),
-                ("BOTTOMPADDING", (0,0),(-1,-1), 4),
-            ]))
-            story.append(pt)
-            story.append(Spacer(1, 0.2*cm))
-
-    # ── Incident table ────────────────────────────────────────────────────────
-    story.append(Paragraph("Incident Log", sec_s))
-    if incidents:
-        header = ["#", "Time", "Severity", "Detections"]
-        rows   = [header]
-        sev_hi = []
-        for idx, inc in enumerate(incidents, 1):
-            ts = inc.get("ts", inc.get("timestamp", ""))
-            if isinstance(ts, (int, float)):
-                ts = datetime.datetime.fromtimestamp(ts).strftime("%H:%M:%S")
-            sigs     = inc.get("signals", inc.get("signal_text", {}))
-            severity = sigs.get("severity", "—") if isinstance(sigs, dict) else "—"
-            dets = []
-            if isinstance(sigs, dict):
-                for k in ("mobile", "talking", "paper", "head_turn"):
-                    v = sigs.get(k, "")
-                    if v and "No " not in v and "NORMAL" not in v.upper():
-                        dets.append(v)
-            sev_hi.append(severity)
-            rows.append([str(idx), str(ts), severity,
-                         Paragraph("; ".join(dets) if dets else "—", small)])
-
-        col_w = [1*cm, 3*cm, 3.5*cm, usable_w - 7.5*cm]
-        inc_t = Table(rows, colWidths=col_w, repeatRows=1)
-        sev_colors = {
-            "HIGH ALERT": colors.HexColor("#ffd6d6"),
-            "ALERT":      colors.HexColor("#ffe8cc"),
-            "WARNING":    colors.HexColor("#fffbe0"),
-        }
-        cmds = [
-            ("BACKGROUND",    (0,0),(-1,0),  colors.HexColor("#2d5f9a")),
-            ("TEXTCOLOR",     (0,0),(-1,0),  colors.white),
-            ("FONTNAME",      (0,0),(-1,0),  "Helvetica-Bold"),
-            ("FONTSIZE",      (0,0),(-1,-1), 9),
-            ("GRID",          (0,0),(-1,-1), 0.5, colors.HexColor("#adc1df")),
-            ("ROWBACKGROUNDS",(0,1),(-1,-1), [colors.white, colors.HexColor("#f4f8ff")]),
-            ("VALIGN",        (0,0),(-1,-1), "MIDDLE"),
-            ("TOPPADDING",    (0,0),(-1,-1), 4),
-            ("BOTTOMPADDING", (0,0),(-1,-1), 4),
-            ("LEFTPADDING",   (0,0),(-1,-1), 6),
-        ]
-        for i, sev in enumerate(sev_hi, 1):
-            if sev in sev_colors:
-                cmds.append(("BACKGROUND", (0,i), (-1,i), sev_colors[sev]))
-        inc_t.setStyle(TableStyle(cmds))
-        story.append(inc_t)
-    else:
-        story.append(Paragraph("No incidents recorded for this camera.", normal))
-
-    story.append(Spacer(1, 0.4*cm))
-
-    # ── Event log ─────────────────────────────────────────────────────────────
-    story.append(Paragraph("System Event Log", sec_s))
-    for ev in (events or [])[:40]:
-        story.append(Paragraph(f"• {ev}", small))
-    if not events:
-        story.append(Paragraph("No events recorded.", normal))
-
-    # ── Footer ────────────────────────────────────────────────────────────────
-    story.append(Spacer(1, 0.5*cm))
-    story.append(HRFlowable(width="100%", thickness=1,
-                             color=colors.HexColor("#adc1df")))
-    story.append(Spacer(1, 0.2*cm))
-    story.append(Paragraph(
-        f"Generated by AI Exam Monitoring System  •  {now_str}", foot_s))
-
-    doc.build(story)
-    return buf.getvalue()
-
-
 def generate_all_pdf_reports():
-    """Build one PDF per camera; store bytes in session_state.report_files."""
+    """Queue one PDF per camera and return the job id; call with state_lock held.
+
+    Only a snapshot of the needed state is taken here, so the caller is not
+    blocked while ReportLab runs. Each PDF is published as soon as it is built.
+    """
     feeds         = list(st.session_state.feed_list)
-    all_incidents = st.session_state.incidents
+    store         = ensure_incident_store()
     all_events    = list(st.session_state.events)
     risk_score    = st.session_state.risk_score
 
     st.session_state.per_camera_reports = {}
     st.session_state.report_files       = {}
+    st.session_state.report_ready       = False
 
+    tasks = []
     for i, src in enumerate(feeds):
         meta      = get_candidate_meta(src)
         candidate = meta.get("candidate", f"Student_{i+1}")
 
-        cam_incidents = [
-            inc for inc in all_incidents
-            if str(inc.get("source", "")) == str(src)
-        ]
-        snap_paths = [
+        cam_incidents = store.timeline(feed=src)
+        # Near-duplicate incidents share a snapshot file; list each file once.
+        snap_paths = list(dict.fromkeys(
             inc.get("snapshot") or inc.get("snapshot_path", "")
             for inc in cam_incidents
             if inc.get("snapshot") or inc.get("snapshot_path", "")
-        ]
-        # fallback: latest live frame
+        ))[:8]
+        # fallback: latest live frame (copied, ring slots get reused)
         if not snap_paths:
             lf = st.session_state.feed_frames.get(src)
             if lf is not None:
-                snap_paths = [lf]
+                snap_paths = [lf.copy()]
 
-        try:
-            pdf_bytes = build_exam_pdf(
-                source         = src,
-                candidate      = candidate,
-                incidents      = cam_incidents,
-                snapshot_paths = snap_paths,
-                events         = all_events,
-                risk_score     = risk_score,
-            )
-        except Exception as exc:
-            add_event(f"PDF build failed for {src}: {exc}")
-            pdf_bytes = b""
+        tasks.append({
+            "source":         src,
+            "candidate":      candidate,
+            "incidents":      cam_incidents,
+            "snapshot_paths": snap_paths,
+            "events":         all_events,
+            "risk_score":     risk_score,
+            "pdf_name":       f"report_cam{i+1}_{candidate.replace(' ','_')}.pdf",
+        })
 
-        pdf_name = f"report_cam{i+1}_{candidate.replace(' ','_')}.pdf"
-        st.session_state.report_files[pdf_name] = {
-            "bytes":    pdf_bytes,
-            "mimetype": "application/pdf",
-        }
-        st.session_state.per_camera_reports[src] = {
-            "pdf_name":  pdf_name,
-            "candidate": candidate,
-        }
-        add_event(f"Report ready: {pdf_name}")
+    return report_jobs.submit(tasks, publish_pdf_report)
 
-    st.session_state.report_ready = True
+
+def publish_pdf_report(job_id, task, pdf_bytes, error):
+    """ReportJobs callback: expose one finished PDF unless a newer job replaced it."""
+    with state_lock:
+        if job_id != report_jobs.latest_id:
+            return
+        src, pdf_name = task["source"], task["pdf_name"]
+        if error:
+            add_event(f"PDF build failed for {src}: {error}")
+        else:
+            st.session_state.report_files[pdf_name] = {
+                "bytes":    pdf_bytes,
+                "mimetype": "application/pdf",
+            }
+            st.session_state.per_camera_reports[src] = {
+                "pdf_name":  pdf_name,
+                "candidate": task["candidate"],
+            }
+            st.session_state.report_ready = True
+            add_event(f"Report ready: {pdf_name}")
+    publish_state()
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -318,7 +167,34 @@ def generate_all_pdf_reports():
 
 def close_resources():
     release_all_captures()
-    close_detectors()
+    close_engine()
+    close_snapshot_writer()
+    close_snapshot_store()
+    close_clip_recorder()
+    # The store hands its last queued rows to the log and exporter as it closes.
+    close_incident_store()
+    close_incident_log()
+    close_columnar_exporter()
+    close_webrtc()
+
+
+def reset_risk():
+    st.session_state.risk_score        = 0.0
+    reset_incidents()
+    st.session_state.feed_risk_scores  = {}
+    st.session_state.report_ready      = False
+    st.session_state.report_files      = {}
+    st.session_state.per_camera_reports = {}
+    add_event("Risk and incidents reset")
+
+
+def close_webrtc():
+    """Closes the preview peers; ensure_started() builds a new publisher on the next request."""
+    global webrtc
+    with state_lock:
+        publisher, webrtc = webrtc, None
+    if publisher is not None:
+        publisher.close()
 
 
 def status_issues(sig):
@@ -355,33 +231,33 @@ def connected_cameras(feed_sources):
 
 
 def update_frames(feed_sources):
+    # Build a fresh dict and swap it in, so readers never see a half-updated one.
+    frames = {}
     for src in feed_sources:
         init_feed_state(src)
-        st.session_state.feed_frames[src] = read_feed_frame(src)
+        frames[src] = read_feed_frame(src)
+    st.session_state.feed_frames = frames
 
 
 def process_detection(feed_sources):
     if not (st.session_state.running or st.session_state.live_preview):
         return
     now = time.time()
-    if now - st.session_state.last_detect_ts < 0.22:
+    if now - st.session_state.last_detect_ts < ANALYSIS_TICK:
         return
     st.session_state.last_detect_ts = now
 
-    ensure_detectors()
+    # Nothing is analysed until the warm-up has run every model once.
+    if not engine_ready():
+        return
+    ensure_engine()
     st.session_state.tick += 1
-    n = len(feed_sources)
-    if n == 0:
+    if not feed_sources:
         return
-
-    start  = st.session_state.rr_index % n
-    batch  = min(st.session_state.analysis_batch_size, n)
-    indexes = [(start + i) % n for i in range(batch)]
-    st.session_state.rr_index = (start + batch) % n
     active_alerts = 0
 
-    for idx in indexes:
-        src   = feed_sources[idx]
+    candidates = []
+    for src in feed_sources:
         frame = st.session_state.feed_frames.get(src)
         if frame is None:
             continue
@@ -392,52 +268,109 @@ def process_detection(feed_sources):
                 "severity": "OFFLINE",
             }
             continue
-
-        signal_text = detect_on_frame(src, frame)
-        if signal_text.get("severity") not in ("ALERT", "HIGH ALERT"):
-            st.session_state.feed_risk_scores[src] = max(
-                0.0, st.session_state.feed_risk_scores.get(src, 0.0) - 0.35)
-            continue
-
-        active_alerts += 1
-        st.session_state.feed_risk_scores[src] = min(
-            100.0, st.session_state.feed_risk_scores.get(src, 0.0) + 1.8)
-        last_incident = st.session_state.last_incident_ts.get(src, 0.0)
-        if time.time() - last_incident > 3:
-            snap = save_snapshot(frame, src)
-            st.session_state.last_snapshot_ts[src]  = time.time()
-            record_incident(src, signal_text, snap)
-            st.session_state.last_incident_ts[src]  = time.time()
-            add_event(f"Snapshot captured for feed {src}")
-            add_event(f"Incident logged on feed {src}")
-
-    if active_alerts > 0:
-        st.session_state.risk_score = min(100.0, st.session_state.risk_score + 1.6 * active_alerts)
-    else:
-        st.session_state.risk_score = max(0.0, st.session_state.risk_score - 0.6)
+        # Only feeds with a frame they have not analyzed yet compete for a slot.
+        if has_new_frame(src):
+            candidates.append(src)
+
+    chosen = schedule_feeds(candidates, st.session_state.analysis_batch_size)
+    batch  = [(src, st.session_state.feed_frames[src]) for src in chosen]
+    # Inference runs without state_lock; only applying the results takes it.
+    results = detect_feeds(batch)
+    with state_lock:
+        for src, frame in batch:
+            mark_analyzed(src)
+            signal_text = results[src]
+            if signal_text.get("severity") not in ("ALERT", "HIGH ALERT"):
+                st.session_state.feed_risk_scores[src] = max(
+                    0.0, st.session_state.feed_risk_scores.get(src, 0.0) - 0.35)
+                continue
+
+            active_alerts += 1
+            st.session_state.feed_risk_scores[src] = min(
+                100.0, st.session_state.feed_risk_scores.get(src, 0.0) + 1.8)
+            last_incident = st.session_state.last_incident_ts.get(src, 0.0)
+            if time.time() - last_incident > 3:
+                # The incident is logged now with its planned snapshot path; the writer
+                # thread clears that path if the frame is dropped. A near-duplicate of a
+                # recent snapshot points at that file instead of writing a new one.
+                snapshot, fresh = plan_snapshot(frame, src)
+                incident = record_incident(src, signal_text, snapshot)
+                if fresh:
+                    save_snapshot(frame, src, incident)
+                st.session_state.last_snapshot_ts[src]  = time.time()
+                st.session_state.last_incident_ts[src]  = time.time()
+                add_event(f"Snapshot captured for feed {src}" if fresh else f"Snapshot reused for feed {src}", at=incident["ts"])
+                add_event(f"Incident logged on feed {src}", at=incident["ts"])
+
+        if active_alerts > 0:
+            st.session_state.risk_score = min(100.0, st.session_state.risk_score + 1.6 * active_alerts)
+        else:
+            st.session_state.risk_score = max(0.0, st.session_state.risk_score - 0.6)
 
 
 def background_loop():
+    last_publish = 0.0
     while not bg_stop.is_set():
-        with state_lock:
-            feed_sources = list(st.session_state.feed_list)
-            active = st.session_state.running or st.session_state.live_preview
-            if active:
-                update_frames(feed_sources)
-            process_detection(feed_sources)
+        try:
+            # Deferred from HTTP handlers so they never wait behind a detection batch.
+            # Handled before the feed list is read, so no removed feed gets reopened.
+            if close_requested.is_set() or feeds_changed.is_set() or reset_requested.is_set():
+                with engine_lock:
+                    if reset_requested.is_set():
+                        reset_requested.clear()
+                        with state_lock:
+                            reset_risk()
+                    if close_requested.is_set():
+                        close_requested.clear()
+                        # state_lock keeps report handlers from reading a store or log mid-close.
+                        with state_lock:
+                            if not st.session_state.running:
+                                close_resources()
+                    if feeds_changed.is_set():
+                        feeds_changed.clear()
+                        cleanup_removed_feeds()
+            with state_lock:
+                feed_sources = list(st.session_state.feed_list)
+                active = st.session_state.running or st.session_state.live_preview
+            # A stop closes the engine; warm it up again before analysing resumes.
+            # A failed warm-up is retried after WARMUP_RETRY_DELAY.
+            if active and not engine_ready() and warmup.rerun_due(WARMUP_RETRY_DELAY):
+                warmup.start(again=True)
+            # Capture and inference hold engine_lock only, never state_lock, so
+            # HTTP handlers are not stuck behind a model call.
+            with engine_lock:
+                if active:
+                    update_frames(feed_sources)
+                    frame_cache.update(st.session_state.feed_frames, st.session_state.feed_frame_seq)
+                process_detection(feed_sources)
+            if time.time() - last_publish >= PUBLISH_INTERVAL:
+                publish_state()
+                last_publish = time.time()
+        except Exception as exc:
+            # Keep the loop alive; HTTP handlers only restart it if the thread has died.
+            add_event(f"Background loop error: {type(exc).__name__}: {exc}")
         time.sleep(0.06 if st.session_state.running else 0.12)
 
 
 def ensure_started():
-    global bg_thread
+    global bg_thread, webrtc
     with state_lock:
         if "running" not in st.session_state:
             init_state()
             ensure_dirs()
+        if WEBRTC_ENABLED and webrtc is None:
+            from exam_webrtc import WebRtcPublisher
+            webrtc = WebRtcPublisher(frame_cache)
     if bg_thread is None or not bg_thread.is_alive():
         bg_stop.clear()
         bg_thread = threading.Thread(target=background_loop, daemon=True)
         bg_thread.start()
+    warmup.start()
+
+
+def publish_state():
+    """Rebuild the dashboard payload and swap it in for lock-free readers."""
+    state_channel.publish(snapshot_state())
 
 
 def snapshot_state():
@@ -451,6 +384,7 @@ def snapshot_state():
                 "paper":  "No paper signal",  "head_turn": "No head-turn signal",
             })
             status_text, status_color, border_color = status_theme(sig)
+            issues = status_issues(sig)
             meta = get_candidate_meta(src)
             cam_rows.append({
                 "index":        i + 1,
@@ -459,9 +393,9 @@ def snapshot_state():
                 "status_text":  status_text,
                 "status_color": status_color,
                 "border_color": border_color,
-                "issues":       status_issues(sig)[:3],
+                "issues":       issues[:3],
                 "overlay":      " | ".join(
-                    [x for x in status_issues(sig) if x != "No issues detected"][:2]
+                    [x for x in issues if x != "No issues detected"][:2]
                 ),
                 "frame_url":    "/frame?source=" + quote(src, safe=""),
             })
@@ -485,7 +419,7 @@ def snapshot_state():
             "connected":           connected_cameras(feeds),
             "feed_count":          len(feeds),
             "risk_score":          int(st.session_state.risk_score),
-            "incidents":           len(st.session_state.incidents),
+            "incidents":           incident_count(),
             "feeds_raw":           st.session_state.feeds_raw,
             "candidate_meta_raw":  st.session_state.candidate_meta_raw,
             "analysis_batch_size": st.session_state.analysis_batch_size,
@@ -495,6 +429,11 @@ def snapshot_state():
             "events":              st.session_state.events[:12],
             "reports":             reports,
             "report_ready":        st.session_state.report_ready,
+            "webrtc":              webrtc is not None,
+            "engine_ready":        engine_ready(),
+            "camera_scan":         camera_scan.status(),
+            "warmup":              warmup.status(),
+            "report_job":          report_jobs.status(),
         }
 
 
@@ -554,6 +493,8 @@ PAGE_HTML = """
       animation:rise .35s ease;transition:transform .2s,box-shadow .2s;}
     .feed-card:hover{transform:translateY(-2px);box-shadow:0 14px 30px rgba(0,0,0,.42);}
     .feed-img{width:100%;height:340px;object-fit:cover;display:block;background:#091628;}
+    .feeds.mosaic{grid-template-columns:1fr;}
+    .mosaic-img{width:100%;height:auto;display:block;border-radius:12px;background:#091628;}
     .overlay-note{position:absolute;left:14px;top:12px;
       background:linear-gradient(90deg,rgba(195,23,23,.9),rgba(255,106,106,.85));
       color:#fff;font-weight:800;font-size:.95rem;border-radius:8px;padding:6px 11px;}
@@ -595,6 +536,7 @@ PAGE_HTML = """
   <div id="reportBanner">
     <h2>&#10003; Session Complete — Reports Ready</h2>
     <p>Monitoring has stopped. Click a button below to download the PDF report for each student.</p>
+    <p id="reportProgress"></p>
     <div id="reportLinks"></div>
   </div>
 
@@ -644,7 +586,12 @@ function esc(s){return String(s).replaceAll("&","&amp;").replaceAll("<","&lt;").
 function renderReportBanner(data){
   const banner=document.getElementById("reportBanner");
   const links=document.getElementById("reportLinks");
-  if(data.report_ready && data.reports && data.reports.length>0){
+  const job=data.report_job;
+  const building=job && job.state==="running";
+  document.getElementById("reportProgress").textContent=building
+    ? `Building reports ${job.done}/${job.total}…`
+    : (job && job.failed ? `${job.failed} report(s) failed to build.` : "");
+  if(building || (data.report_ready && data.reports && data.reports.length>0)){
     links.innerHTML=data.reports.map(r=>
       `<a class="dl-btn" href="/download/${encodeURIComponent(r.file)}" download="${esc(r.file)}">
          &#8659; ${esc(r.label)}
@@ -662,15 +609,22 @@ function renderReportBanner(data){
   }
 }
 
+let state={};
+
 async function refresh(){
   const res=await fetch("/api/state");
-  const data=await res.json();
+  state=await res.json();
+  render(state);
+}
 
+function render(data){
   document.getElementById("connected").textContent=data.connected;
   const monitor=document.getElementById("monitorState");
-  monitor.textContent=data.running?"ACTIVE":"STOPPED";
-  monitor.classList.toggle("active",!!data.running);
-  monitor.style.color=data.running?"#58e676":"#ffbe55";
+  const warm=!!data.engine_ready;
+  monitor.textContent=data.running?(warm?"ACTIVE":"WARMING UP"):"STOPPED";
+  monitor.title=!warm&&data.warmup&&data.warmup.stage?data.warmup.stage:"";
+  monitor.classList.toggle("active",!!data.running&&warm);
+  monitor.style.color=data.running?(warm?"#58e676":"#5fb3ff"):"#ffbe55";
 
   const btn=document.getElementById("startStopBtn");
   btn.textContent=data.running?"Stop Monitoring":"Start Monitoring";
@@ -696,11 +650,57 @@ async function refresh(){
 
 function feedCardId(source){return "feed_"+encodeURIComponent(source).replaceAll("%","_");}
 
+// Swaps a card's MJPEG image for a WebRTC video; on any failure MJPEG stays.
+async function startWebRtc(card,source){
+  const pc=new RTCPeerConnection();
+  pc.addTransceiver("video",{direction:"recvonly"});
+  const video=document.createElement("video");
+  video.className="feed-img";video.autoplay=true;video.muted=true;video.playsInline=true;
+  pc.ontrack=e=>{video.srcObject=new MediaStream([e.track]);};
+  try{
+    await pc.setLocalDescription(await pc.createOffer());
+    // The server does not trickle ICE, so send the offer with all candidates.
+    await new Promise(done=>{
+      if(pc.iceGatheringState==="complete")return done();
+      pc.addEventListener("icegatheringstatechange",()=>{if(pc.iceGatheringState==="complete")done();});
+    });
+    const res=await fetch("/webrtc/offer",{method:"POST",headers:{"Content-Type":"application/json"},
+      body:JSON.stringify({source,sdp:pc.localDescription.sdp,type:pc.localDescription.type})});
+    if(!res.ok)throw new Error("offer rejected");
+    await pc.setRemoteDescription(await res.json());
+  }catch(err){pc.close();return;}
+  if(!card.isConnected){pc.close();return;}
+  const img=card.querySelector("img.feed-img");
+  if(img){img.src="";img.replaceWith(video);}
+  card.pc=pc;
+  // A stop closes the server's peers: go back to MJPEG and offer again.
+  pc.onconnectionstatechange=()=>{
+    if(card.pc!==pc||!["failed","closed"].includes(pc.connectionState))return;
+    card.pc=null;pc.close();
+    const img=document.createElement("img");img.className="feed-img";
+    img.src="/stream?source="+encodeURIComponent(source)+"&width="+Math.round(card.clientWidth*(window.devicePixelRatio||1));
+    video.replaceWith(img);
+    setTimeout(()=>{if(card.isConnected)startWebRtc(card,source);},2000);
+  };
+}
+
+// ?view=mosaic shows every feed through one server-composited /mosaic stream.
+const MOSAIC_VIEW=new URLSearchParams(location.search).get("view")==="mosaic";
+
 function renderFeeds(rows){
   const grid=document.getElementById("feedsGrid");
+  if(MOSAIC_VIEW){
+    if(!grid.classList.contains("mosaic")){
+      grid.classList.add("mosaic");
+      grid.innerHTML='<img class="mosaic-img" src="/mosaic" alt="All feeds">';
+    }
+    return;
+  }
   const wanted=new Set(rows.map(r=>r.source));
   for(const node of Array.from(grid.children)){
-    if(!wanted.has(node.dataset.source))node.remove();
+    if(wanted.has(node.dataset.source))continue;
+    if(node.pc)node.pc.close();
+    node.remove();
   }
   for(const r of rows){
     const id=feedCardId(r.source);
@@ -710,7 +710,6 @@ function renderFeeds(rows){
       card.id=id;card.className="feed-card";card.dataset.source=r.source;
       const img=document.createElement("img");
       img.className="feed-img";
-      img.src="/stream?source="+encodeURIComponent(r.source);
       card.appendChild(img);
       const overlay=document.createElement("div");
       overlay.className="overlay-note";overlay.style.display="none";
@@ -719,6 +718,10 @@ function renderFeeds(rows){
       footer.className="feed-footer";
       card.appendChild(footer);
       grid.appendChild(card);
+      // Ask for frames no wider than the card is drawn; the server adapts further.
+      const width=Math.round(card.clientWidth*(window.devicePixelRatio||1));
+      img.src="/stream?source="+encodeURIComponent(r.source)+"&width="+width;
+      if(state.webrtc&&window.RTCPeerConnection)startWebRtc(card,r.source);
     }
     card.style.borderColor=r.border_color;
     const overlay=card.querySelector(".overlay-note");
@@ -729,8 +732,14 @@ function renderFeeds(rows){
   }
 }
 
-setInterval(refresh,700);
-refresh();
+// The server pushes changed state keys; plain polling is only a fallback.
+if(window.EventSource){
+  const events=new EventSource("/api/events");
+  events.onmessage=e=>{Object.assign(state,JSON.parse(e.data));render(state);};
+}else{
+  setInterval(refresh,700);
+  refresh();
+}
 </script>
 </body>
 </html>
@@ -750,7 +759,29 @@ def home():
 @app.route("/api/state")
 def api_state():
     ensure_started()
-    return jsonify(snapshot_state())
+    return jsonify(state_channel.state or snapshot_state())
+
+
+@app.route("/api/events")
+def api_events():
+    ensure_started()
+
+    def gen():
+        # The first message carries the full state, later ones only changed keys.
+        sent, version = {}, -1
+        while True:
+            state = state_channel.state or snapshot_state()
+            delta = state_delta(sent, state)
+            if delta:
+                sent = state
+                yield f"data: {json.dumps(delta)}\n\n"
+            new_version = state_channel.wait(version, SSE_KEEPALIVE)
+            if new_version == version:
+                yield ": keepalive\n\n"
+            version = new_version
+
+    return Response(gen(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.route("/api/config", methods=["POST"])
@@ -768,21 +799,34 @@ def api_config():
         st.session_state.analysis_batch_size = int(
             payload.get("analysis_batch_size", st.session_state.analysis_batch_size))
         st.session_state.live_preview = bool(payload.get("live_preview", st.session_state.live_preview))
-        cleanup_removed_feeds()
         add_event(f"Feed list updated: {st.session_state.feed_list}")
+    feeds_changed.set()
+    publish_state()
     return jsonify({"ok": True})
 
 
-@app.route("/api/scan_cameras", methods=["POST"])
-def api_scan_cameras():
-    ensure_started()
-    found = scan_cameras()
+def apply_camera_scan(found):
+    """CameraScan callback: switch the feed list to the cameras that were found."""
     with state_lock:
         st.session_state.feed_list = found or ["0"]
         st.session_state.feeds_raw = "\n".join(st.session_state.feed_list)
-        cleanup_removed_feeds()
         add_event(f"Local camera scan: {st.session_state.feed_list}")
-    return jsonify({"ok": True, "found": found})
+    feeds_changed.set()
+    publish_state()
+
+
+@app.route("/api/scan_cameras", methods=["GET", "POST"])
+def api_scan_cameras():
+    """POST starts a background scan (unless one is running); GET polls it."""
+    ensure_started()
+    if request.method == "POST":
+        with state_lock:
+            in_use = [src for src, status in st.session_state.feed_status.items() if status == "Connected"]
+        status = camera_scan.start(in_use, apply_camera_scan)
+        publish_state()
+    else:
+        status = camera_scan.status()
+    return jsonify(dict(status, ok=True))
 
 
 @app.route("/api/start", methods=["POST"])
@@ -792,6 +836,9 @@ def api_start():
         st.session_state.running      = True
         st.session_state.report_ready = False   # reset banner when re-starting
         add_event("Monitoring started")
+    if not engine_ready():
+        warmup.start(again=True)
+    publish_state()
     return jsonify({"ok": True})
 
 
@@ -800,33 +847,51 @@ def api_stop():
     ensure_started()
     with state_lock:
         st.session_state.running = False
-        close_resources()
-        generate_all_pdf_reports()          # ← builds PDFs for every camera
+    writer = st.session_state.snapshot_writer
+    if writer is not None:
+        # Snapshots still queued should be on disk before the PDFs embed them.
+        writer.flush()
+    with state_lock:
+        job_id = generate_all_pdf_reports()     # ← PDFs build in the background
         add_event("Monitoring stopped")
-        add_event("Per-camera PDF reports generated")
-    return jsonify({"ok": True})
+        add_event("Per-camera PDF reports queued")
+    # Only signalled once the report snapshot is taken, so the loop cannot close
+    # the store under it. The loop closes everything between batches, so this
+    # request never waits on inference.
+    close_requested.set()
+    publish_state()
+    return jsonify({"ok": True, "job": job_id})
 
 
 @app.route("/api/generate_report", methods=["POST"])
 def api_generate_report():
     ensure_started()
     with state_lock:
-        generate_all_pdf_reports()
-        add_event("Manual report generation complete")
-    return jsonify({"ok": True})
+        job_id = generate_all_pdf_reports()
+        add_event("Manual report generation queued")
+        stopped = not st.session_state.running
+    if stopped:
+        # The report reopened the incident store; close it again.
+        close_requested.set()
+    publish_state()
+    return jsonify({"ok": True, "job": job_id})
+
+
+@app.route("/api/report_jobs")
+@app.route("/api/report_jobs/<int:job_id>")
+def api_report_jobs(job_id=None):
+    ensure_started()
+    status = report_jobs.status(job_id)
+    if status is None:
+        return jsonify({"ok": False, "error": "Unknown report job"}), 404
+    return jsonify(status)
 
 
 @app.route("/api/reset_risk", methods=["POST"])
 def api_reset_risk():
     ensure_started()
-    with state_lock:
-        st.session_state.risk_score        = 0.0
-        st.session_state.incidents         = []
-        st.session_state.feed_risk_scores  = {}
-        st.session_state.report_ready      = False
-        st.session_state.report_files      = {}
-        st.session_state.per_camera_reports = {}
-        add_event("Risk and incidents reset")
+    # Applied by the loop between batches, so a detection pass never sees the scores vanish.
+    reset_requested.set()
     return jsonify({"ok": True})
 
 
@@ -836,14 +901,16 @@ def frame():
     source = request.args.get("source", "").strip()
     if not source:
         return Response(status=400)
-    with state_lock:
-        frame_bgr = st.session_state.feed_frames.get(source)
-        if frame_bgr is None:
-            frame_bgr = exam_camera.offline_frame("No Frame")
-    ok, encoded = cv2.imencode(".jpg", frame_bgr)
-    if not ok:
+    width = request.args.get("width", "0")
+    quality = request.args.get("quality", "0")
+    _, data = frame_cache.jpeg(
+        source,
+        int(width) if width.isdigit() else 0,
+        max(10, min(95, int(quality))) if quality.isdigit() and int(quality) else 0,
+    )
+    if not data:
         return Response(status=500)
-    return Response(encoded.tobytes(), mimetype="image/jpeg")
+    return Response(data, mimetype="image/jpeg")
 
 
 @app.route("/stream")
@@ -853,21 +920,67 @@ def stream():
     if not source:
         return Response(status=400)
 
+    client = stream_client(request.args)
+
     def gen():
+        # Parts go out only when the feed has a new frame; the bytes come from
+        # the shared per-tier cache, so viewers add no encode work. How long a
+        # part takes to drain moves this client between size/quality tiers.
+        last_seq = None
         while True:
-            with state_lock:
-                frame_bgr = st.session_state.feed_frames.get(source)
-                if frame_bgr is None:
-                    frame_bgr = exam_camera.offline_frame("No Frame")
-            ok, encoded = cv2.imencode(".jpg", frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, 80])
-            if ok:
+            width, quality = client.tier
+            seq, data = frame_cache.jpeg(source, width, quality)
+            if data and seq != last_seq:
+                last_seq = seq
+                started = time.time()
+                yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+                       + data + b"\r\n")
+                client.record(time.time() - started)
+                time.sleep(max(0.0, client.interval - (time.time() - started)))
+            frame_cache.wait_for_change(source, last_seq, STREAM_IDLE_WAIT)
+
+    return Response(gen(), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+
+@app.route("/mosaic")
+def mosaic():
+    ensure_started()
+
+    def gen():
+        # One composited grid for all feeds; every viewer shares the same encode.
+        last_key, version = None, -1
+        while True:
+            state = state_channel.state or snapshot_state()
+            key, data = mosaic_cache.jpeg(state.get("rows", []), state.get("grid_cols", 2))
+            if data and key != last_key:
+                last_key = key
                 yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
-                       + encoded.tobytes() + b"\r\n")
-            time.sleep(0.08)
+                       + data + b"\r\n")
+                time.sleep(STREAM_MIN_INTERVAL)
+            version = frame_cache.wait_for_update(version, STREAM_IDLE_WAIT)
 
     return Response(gen(), mimetype="multipart/x-mixed-replace; boundary=frame")
 
 
+@app.route("/webrtc/offer", methods=["POST"])
+def webrtc_offer():
+    ensure_started()
+    publisher = webrtc
+    if publisher is None:
+        return jsonify({"ok": False, "error": "WebRTC preview is disabled"}), 404
+    payload = request.get_json(silent=True) or {}
+    source = str(payload.get("source", "")).strip()
+    if not source or not payload.get("sdp"):
+        return Response(status=400)
+    try:
+        return jsonify(publisher.answer(source, payload["sdp"], payload.get("type", "offer")))
+    except ValueError as exc:
+        # aiortc rejects malformed SDP and unknown description types with ValueError.
+        return jsonify({"ok": False, "error": f"Invalid offer: {exc}"}), 400
+    except Exception as exc:
+        return jsonify({"ok": False, "error": f"WebRTC unavailable: {type(exc).__name__}: {exc}"}), 503
+
+
 @app.route("/download/<path:name>")
 def download(name: str):
     ensure_started()
@@ -886,12 +999,21 @@ def download(name: str):
 @app.route("/health")
 def health():
     ensure_started()
-    return jsonify({"ok": True})
+    return jsonify({
+        "ok":            True,
+        "warmup":        warmup.status(),
+        "engine_ready":  engine_ready(),
+        "latency":       st.session_state.engine_warmup,
+    })
 
 
 def main():
     ensure_started()
-    app.run(host="0.0.0.0", port=8502, debug=False, threaded=True)
+    try:
+        app.run(host="0.0.0.0", port=8502, debug=False, threaded=True)
+    finally:
+        # Stops the spawned PDF workers instead of leaving them to the interpreter's exit hooks.
+        report_jobs.close()
 
 
 if __name__ == "__main__":
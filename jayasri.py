@@ -1,21 +1,39 @@
 import html
+import json
 import os
 import threading
 import time
 from urllib.parse import quote
 
-import cv2
 from flask import Flask, Response, jsonify, render_template_string, request, send_from_directory
 
 import exam_camera
+import exam_clips
+import exam_columnar
 import exam_detection
+import exam_engine
+import exam_incidents
 import exam_reporting
+import exam_scheduler
+import exam_snapshots
 import exam_state
-from exam_camera import cleanup_removed_feeds, read_feed_frame, release_all_captures, scan_cameras
-from exam_config import REPORT_DIR, ensure_dirs
-from exam_detection import close_detectors, detect_on_frame, ensure_detectors, init_feed_state
-from exam_reporting import generate_report, record_incident, save_snapshot
+import exam_store
+from exam_camera import (
+    CameraScan, cleanup_removed_feeds, has_new_frame, mark_analyzed, read_feed_frame, release_all_captures,
+)
+from exam_clips import close_clip_recorder
+from exam_columnar import close_columnar_exporter
+from exam_config import ANALYSIS_TICK, REPORT_DIR, SSE_KEEPALIVE, STREAM_IDLE_WAIT, STREAM_MIN_INTERVAL, WARMUP_RETRY_DELAY, WEBRTC_ENABLED, ensure_dirs
+from exam_detection import init_feed_state, load_mediapipe
+from exam_engine import close_engine, detect_feeds, engine_ready, ensure_engine, preload_engine
+from exam_incidents import close_incident_log
+from exam_reporting import generate_report, incident_count, plan_snapshot, record_incident, reset_incidents, save_snapshot
+from exam_scheduler import schedule_feeds
+from exam_snapshots import close_snapshot_store, close_snapshot_writer
 from exam_state import add_event, get_candidate_meta, init_state, parse_candidate_map
+from exam_store import close_incident_store
+from exam_stream import EncodedFrameCache, MosaicCache, StateChannel, state_delta, stream_client
+from exam_warmup import ModelWarmup
 
 
 class SessionState(dict):
@@ -36,19 +54,67 @@ class StreamlitShim:
 
 st = StreamlitShim()
 exam_camera.st = st
+exam_clips.st = st
+exam_columnar.st = st
 exam_detection.st = st
+exam_engine.st = st
+exam_incidents.st = st
+exam_scheduler.st = st
+exam_snapshots.st = st
 exam_reporting.st = st
 exam_state.st = st
+exam_store.st = st
 
 app = Flask(__name__)
 state_lock = threading.RLock()
+# Serializes capture/inference with detector teardown; HTTP reads never take it.
+engine_lock = threading.Lock()
+feeds_changed = threading.Event()
+close_requested = threading.Event()
+reset_requested = threading.Event()
 bg_stop = threading.Event()
 bg_thread = None
+state_channel = StateChannel()
+frame_cache = EncodedFrameCache()
+mosaic_cache = MosaicCache(frame_cache)
+webrtc = None
+camera_scan = CameraScan()
+# Models load in the background so the server answers (and scans cameras) at once.
+warmup = ModelWarmup([
+    ("Importing MediaPipe", load_mediapipe),
+    ("Loading detection models", lambda: preload_engine(engine_lock)),
+])
+
+PUBLISH_INTERVAL = 0.25
 
 
 def close_resources() -> None:
     release_all_captures()
-    close_detectors()
+    close_engine()
+    close_snapshot_writer()
+    close_snapshot_store()
+    close_clip_recorder()
+    # The store hands its last queued rows to the log and exporter as it closes.
+    close_incident_store()
+    close_incident_log()
+    close_columnar_exporter()
+    close_webrtc()
+
+
+def reset_risk() -> None:
+    st.session_state.risk_score = 0.0
+    reset_incidents()
+    st.session_state.feed_risk_scores = {}
+    add_event("Risk and incidents reset")
+
+
+def close_webrtc() -> None:
+    """Closes the preview peers; ensure_started() builds a new publisher on the next request."""
+    global webrtc
+    with state_lock:
+        publisher, webrtc = webrtc, None
+    if publisher is not None:
+        publisher.close()
 
 
 def status_issues(sig: dict) -> list[str]:
@@ -84,9 +150,12 @@ def connected_cameras(feed_sources: list[str]) -> int:
 
 
 def update_frames(feed_sources: list[str]) -> None:
+    # Build a fresh dict and swap it in, so readers never see a half-updated one.
+    frames = {}
     for src in feed_sources:
         init_feed_state(src)
-        st.session_state.feed_frames[src] = read_feed_frame(src)
+        frames[src] = read_feed_frame(src)
+    st.session_state.feed_frames = frames
 
 
 def process_detection(feed_sources: list[str]) -> None:
@@ -94,25 +163,21 @@ def process_detection(feed_sources: list[str]) -> None:
     if not (st.session_state.running or st.session_state.live_preview):
         return
     now = time.time()
-    detection_interval = 0.22
-    if now - st.session_state.last_detect_ts < detection_interval:
+    if now - st.session_state.last_detect_ts < ANALYSIS_TICK:
         return
     st.session_state.last_detect_ts = now
 
-    ensure_detectors()
+    # Nothing is analysed until the warm-up has run every model once.
+    if not engine_ready():
+        return
+    ensure_engine()
     st.session_state.tick += 1
-    n = len(feed_sources)
-    if n == 0:
+    if not feed_sources:
         return
-
-    start = st.session_state.rr_index % n
-    batch = min(st.session_state.analysis_batch_size, n)
-    indexes = [(start + i) % n for i in range(batch)]
-    st.session_state.rr_index = (start + batch) % n
     active_alerts = 0
 
-    for idx in indexes:
-        src = feed_sources[idx]
+    candidates = []
+    for src in feed_sources:
         frame = st.session_state.feed_frames.get(src)
         if frame is None:
             continue
@@ -125,50 +190,108 @@ def process_detection(feed_sources: list[str]) -> None:
                 "severity": "OFFLINE",
             }
             continue
-
-        signal_text = detect_on_frame(src, frame)
-        if signal_text.get("severity") not in ("ALERT", "HIGH ALERT"):
-            st.session_state.feed_risk_scores[src] = max(0.0, st.session_state.feed_risk_scores.get(src, 0.0) - 0.35)
-            continue
-
-        active_alerts += 1
-        st.session_state.feed_risk_scores[src] = min(100.0, st.session_state.feed_risk_scores.get(src, 0.0) + 1.8)
-        last_incident = st.session_state.last_incident_ts.get(src, 0.0)
-        if time.time() - last_incident > 3:
-            snap = save_snapshot(frame, src)
-            st.session_state.last_snapshot_ts[src] = time.time()
-            record_incident(src, signal_text, snap)
-            st.session_state.last_incident_ts[src] = time.time()
-            add_event(f"Snapshot captured for feed {src}")
-            add_event(f"Incident logged on feed {src}")
-
-    if active_alerts > 0:
-        st.session_state.risk_score = min(100.0, st.session_state.risk_score + (1.6 * active_alerts))
-    else:
-        st.session_state.risk_score = max(0.0, st.session_state.risk_score - 0.6)
+        # Only feeds with a frame they have not analyzed yet compete for a slot.
+        if has_new_frame(src):
+            candidates.append(src)
+
+    chosen = schedule_feeds(candidates, st.session_state.analysis_batch_size)
+    batch = [(src, st.session_state.feed_frames[src]) for src in chosen]
+    # Inference runs without state_lock; only applying the results takes it.
+    results = detect_feeds(batch)
+    with state_lock:
+        for src, frame in batch:
+            mark_analyzed(src)
+            signal_text = results[src]
+            if signal_text.get("severity") not in ("ALERT", "HIGH ALERT"):
+                st.session_state.feed_risk_scores[src] = max(0.0, st.session_state.feed_risk_scores.get(src, 0.0) - 0.35)
+                continue
+
+            active_alerts += 1
+            st.session_state.feed_risk_scores[src] = min(100.0, st.session_state.feed_risk_scores.get(src, 0.0) + 1.8)
+            last_incident = st.session_state.last_incident_ts.get(src, 0.0)
+            if time.time() - last_incident > 3:
+                # The incident is logged now with its planned snapshot path; the writer
+                # thread clears that path if the frame is dropped. A near-duplicate of a
+                # recent snapshot points at that file instead of writing a new one.
+                snapshot, fresh = plan_snapshot(frame, src)
+                incident = record_incident(src, signal_text, snapshot)
+                if fresh:
+                    save_snapshot(frame, src, incident)
+                st.session_state.last_snapshot_ts[src] = time.time()
+                st.session_state.last_incident_ts[src] = time.time()
+                add_event(f"Snapshot captured for feed {src}" if fresh else f"Snapshot reused for feed {src}", at=incident["ts"])
+                add_event(f"Incident logged on feed {src}", at=incident["ts"])
+
+        if active_alerts > 0:
+            st.session_state.risk_score = min(100.0, st.session_state.risk_score + (1.6 * active_alerts))
+        else:
+            st.session_state.risk_score = max(0.0, st.session_state.risk_score - 0.6)
 
 
 def background_loop() -> None:
+    last_publish = 0.0
     while not bg_stop.is_set():
-        with state_lock:
-            feed_sources = list(st.session_state.feed_list)
-            active = st.session_state.running or st.session_state.live_preview
-            if active:
-                update_frames(feed_sources)
-            process_detection(feed_sources)
+        try:
+            # Deferred from HTTP handlers so they never wait behind a detection batch.
+            # Handled before the feed list is read, so no removed feed gets reopened.
+            if close_requested.is_set() or feeds_changed.is_set() or reset_requested.is_set():
+                with engine_lock:
+                    if reset_requested.is_set():
+                        reset_requested.clear()
+                        with state_lock:
+                            reset_risk()
+                    if close_requested.is_set():
+                        close_requested.clear()
+                        # state_lock keeps report handlers from reading a store or log mid-close.
+                        with state_lock:
+                            if not st.session_state.running:
+                                close_resources()
+                    if feeds_changed.is_set():
+                        feeds_changed.clear()
+                        cleanup_removed_feeds()
+            with state_lock:
+                feed_sources = list(st.session_state.feed_list)
+                active = st.session_state.running or st.session_state.live_preview
+            # A stop closes the engine; warm it up again before analysing resumes.
+            # A failed warm-up is retried after WARMUP_RETRY_DELAY.
+            if active and not engine_ready() and warmup.rerun_due(WARMUP_RETRY_DELAY):
+                warmup.start(again=True)
+            # Capture and inference hold engine_lock only, never state_lock, so
+            # HTTP handlers are not stuck behind a model call.
+            with engine_lock:
+                if active:
+                    update_frames(feed_sources)
+                    frame_cache.update(st.session_state.feed_frames, st.session_state.feed_frame_seq)
+                process_detection(feed_sources)
+            if time.time() - last_publish >= PUBLISH_INTERVAL:
+                publish_state()
+                last_publish = time.time()
+        except Exception as exc:
+            # Keep the loop alive; HTTP handlers only restart it if the thread has died.
+            add_event(f"Background loop error: {type(exc).__name__}: {exc}")
         time.sleep(0.06 if st.session_state.running else 0.12)
 
 
 def ensure_started() -> None:
-    global bg_thread
+    global bg_thread, webrtc
     with state_lock:
         if "running" not in st.session_state:
             init_state()
             ensure_dirs()
+        if WEBRTC_ENABLED and webrtc is None:
+            from exam_webrtc import WebRtcPublisher
+
+            webrtc = WebRtcPublisher(frame_cache)
     if bg_thread is None or not bg_thread.is_alive():
         bg_stop.clear()
         bg_thread = threading.Thread(target=background_loop, daemon=True)
         bg_thread.start()
+    warmup.start()
+
+
+def publish_state() -> None:
+    """Rebuild the dashboard payload and swap it in for lock-free readers."""
+    state_channel.publish(snapshot_state())
 
 
 def snapshot_state() -> dict:
@@ -181,6 +304,7 @@ def snapshot_state() -> dict:
                 {"severity": "NORMAL", "mobile": "No mobile signal", "talking": "No talking signal", "paper": "No paper signal", "head_turn": "No head-turn signal"},
             )
             status_text, status_color, border_color = status_theme(sig)
+            issues = status_issues(sig)
             meta = get_candidate_meta(src)
             cam_rows.append(
                 {
@@ -190,8 +314,8 @@ def snapshot_state() -> dict:
                     "status_text": status_text,
                     "status_color": status_color,
                     "border_color": border_color,
-                    "issues": status_issues(sig)[:3],
-                    "overlay": " | ".join([x for x in status_issues(sig) if x != "No issues detected"][:2]),
+                    "issues": issues[:3],
+                    "overlay": " | ".join([x for x in issues if x != "No issues detected"][:2]),
                     "frame_url": "/frame?source=" + quote(src, safe=""),
                 }
             )
@@ -208,7 +332,7 @@ def snapshot_state() -> dict:
             "connected": connected_cameras(feeds),
             "feed_count": len(feeds),
             "risk_score": int(st.session_state.risk_score),
-            "incidents": len(st.session_state.incidents),
+            "incidents": incident_count(),
             "feeds_raw": st.session_state.feeds_raw,
             "candidate_meta_raw": st.session_state.candidate_meta_raw,
             "analysis_batch_size": st.session_state.analysis_batch_size,
@@ -217,6 +341,10 @@ def snapshot_state() -> dict:
             "rows": cam_rows,
             "events": st.session_state.events[:12],
             "reports": reports,
+            "webrtc": webrtc is not None,
+            "engine_ready": engine_ready(),
+            "camera_scan": camera_scan.status(),
+            "warmup": warmup.status(),
         }
 
 
@@ -251,6 +379,8 @@ PAGE_HTML = """
     .feeds { display: grid; grid-template-columns: repeat(2, minmax(0, 1fr)); gap: 12px; }
     .feed-card { position: relative; background: #0f2342; border: 5px solid #2e7d32; border-radius: 10px; overflow: hidden; box-shadow: 0 8px 20px rgba(0,0,0,0.35); }
     .feed-img { width: 100%; height: 340px; object-fit: cover; display: block; }
+    .feeds.mosaic { grid-template-columns: 1fr; }
+    .mosaic-img { width: 100%; height: auto; display: block; }
     .overlay-note { position: absolute; left: 16px; top: 14px; background: rgba(195, 23, 23, 0.82); color: #fff; font-weight: 800; font-size: 1rem; border-radius: 7px; padding: 6px 12px; }
     .feed-footer { background: #0d1f3a; font-size: 1.1rem; font-weight: 700; text-align: center; padding: 7px 10px; }
     .action-row { margin-top: 12px; display: flex; gap: 8px; align-items: center; flex-wrap: wrap; }
@@ -281,7 +411,7 @@ PAGE_HTML = """
           <textarea id="feedsRaw" rows="7"></textarea>
           <div class="btns">
             <button onclick="applyConfig()">Apply Feed List</button>
-            <button onclick="scanCams()">Scan Local Cameras</button>
+            <button id="scanBtn" onclick="scanCams()">Scan Local Cameras</button>
           </div>
         </div>
         <div>
@@ -338,7 +468,21 @@ PAGE_HTML = """
       await refresh();
     }
 
-    async function scanCams() { await post("/api/scan_cameras"); await refresh(); }
+    async function scanCams() {
+      // The scan runs in the background; poll it so the page never hangs on one request.
+      const btn = document.getElementById("scanBtn");
+      btn.disabled = true;
+      btn.textContent = "Scanning...";
+      await post("/api/scan_cameras");
+      let status = await (await fetch("/api/scan_cameras")).json();
+      while (status.state === "running") {
+        await new Promise(resolve => setTimeout(resolve, 500));
+        status = await (await fetch("/api/scan_cameras")).json();
+      }
+      btn.disabled = false;
+      btn.textContent = "Scan Local Cameras";
+      await refresh();
+    }
     async function toggleRun() {
       const btn = document.getElementById("startStopBtn");
       await post(btn.dataset.running === "1" ? "/api/stop" : "/api/start");
@@ -351,13 +495,19 @@ PAGE_HTML = """
       return String(s).replaceAll("&","&amp;").replaceAll("<","&lt;").replaceAll(">","&gt;");
     }
 
+    let state = {};
+
     async function refresh() {
       const res = await fetch("/api/state");
-      const data = await res.json();
+      state = await res.json();
+      render(state);
+    }
 
+    function render(data) {
       document.getElementById("connected").textContent = data.connected;
-      document.getElementById("monitorState").textContent = data.running ? "ACTIVE" : "STOPPED";
-      document.getElementById("monitorState").style.color = data.running ? "#58e676" : "#ffbe55";
+      const warm = !!data.engine_ready;
+      document.getElementById("monitorState").textContent = data.running ? (warm ? "ACTIVE" : "WARMING UP") : "STOPPED";
+      document.getElementById("monitorState").style.color = data.running ? (warm ? "#58e676" : "#5fb3ff") : "#ffbe55";
       const btn = document.getElementById("startStopBtn");
       btn.textContent = data.running ? "Stop Monitoring" : "Start Monitoring";
       btn.dataset.running = data.running ? "1" : "0";
@@ -392,12 +542,77 @@ PAGE_HTML = """
       return "feed_" + encodeURIComponent(source).replaceAll("%", "_");
     }
 
+    // Swaps a card's MJPEG image for a WebRTC video; on any failure MJPEG stays.
+    async function startWebRtc(card, source) {
+      const pc = new RTCPeerConnection();
+      pc.addTransceiver("video", { direction: "recvonly" });
+      const video = document.createElement("video");
+      video.className = "feed-img";
+      video.autoplay = true;
+      video.muted = true;
+      video.playsInline = true;
+      pc.ontrack = e => { video.srcObject = new MediaStream([e.track]); };
+      try {
+        await pc.setLocalDescription(await pc.createOffer());
+        // The server does not trickle ICE, so send the offer with all candidates.
+        await new Promise(done => {
+          if (pc.iceGatheringState === "complete") return done();
+          pc.addEventListener("icegatheringstatechange", () => {
+            if (pc.iceGatheringState === "complete") done();
+          });
+        });
+        const res = await fetch("/webrtc/offer", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ source, sdp: pc.localDescription.sdp, type: pc.localDescription.type }),
+        });
+        if (!res.ok) throw new Error("offer rejected");
+        await pc.setRemoteDescription(await res.json());
+      } catch (err) {
+        pc.close();
+        return;
+      }
+      if (!card.isConnected) {
+        pc.close();
+        return;
+      }
+      const img = card.querySelector("img.feed-img");
+      if (img) {
+        img.src = "";
+        img.replaceWith(video);
+      }
+      card.pc = pc;
+      // A stop closes the server's peers: go back to MJPEG and offer again.
+      pc.onconnectionstatechange = () => {
+        if (card.pc !== pc || !["failed", "closed"].includes(pc.connectionState)) return;
+        card.pc = null;
+        pc.close();
+        const fallback = document.createElement("img");
+        fallback.className = "feed-img";
+        const width = Math.round(card.clientWidth * (window.devicePixelRatio || 1));
+        fallback.src = "/stream?source=" + encodeURIComponent(source) + "&width=" + width;
+        video.replaceWith(fallback);
+        setTimeout(() => { if (card.isConnected) startWebRtc(card, source); }, 2000);
+      };
+    }
+
+    // ?view=mosaic shows every feed through one server-composited /mosaic stream.
+    const MOSAIC_VIEW = new URLSearchParams(location.search).get("view") === "mosaic";
+
     function renderFeeds(rows) {
       const grid = document.getElementById("feedsGrid");
+      if (MOSAIC_VIEW) {
+        if (!grid.classList.contains("mosaic")) {
+          grid.classList.add("mosaic");
+          grid.innerHTML = '<img class="mosaic-img" src="/mosaic" alt="All feeds">';
+        }
+        return;
+      }
       const wanted = new Set(rows.map(r => r.source));
 
       for (const node of Array.from(grid.children)) {
         if (!wanted.has(node.dataset.source)) {
+          if (node.pc) node.pc.close();
           node.remove();
         }
       }
@@ -413,7 +628,6 @@ PAGE_HTML = """
 
           const img = document.createElement("img");
           img.className = "feed-img";
-          img.src = "/stream?source=" + encodeURIComponent(r.source);
           card.appendChild(img);
 
           const overlay = document.createElement("div");
@@ -426,6 +640,10 @@ PAGE_HTML = """
           card.appendChild(footer);
 
           grid.appendChild(card);
+          // Ask for frames no wider than the card is drawn; the server adapts further.
+          const width = Math.round(card.clientWidth * (window.devicePixelRatio || 1));
+          img.src = "/stream?source=" + encodeURIComponent(r.source) + "&width=" + width;
+          if (state.webrtc && window.RTCPeerConnection) startWebRtc(card, r.source);
         }
 
         card.style.borderColor = r.border_color;
@@ -442,8 +660,17 @@ PAGE_HTML = """
       }
     }
 
-    setInterval(refresh, 700);
-    refresh();
+    // The server pushes changed state keys; plain polling is only a fallback.
+    if (window.EventSource) {
+      const events = new EventSource("/api/events");
+      events.onmessage = e => {
+        Object.assign(state, JSON.parse(e.data));
+        render(state);
+      };
+    } else {
+      setInterval(refresh, 700);
+      refresh();
+    }
   </script>
 </body>
 </html>
@@ -459,7 +686,32 @@ def home():
 @app.route("/api/state")
 def api_state():
     ensure_started()
-    return jsonify(snapshot_state())
+    return jsonify(state_channel.state or snapshot_state())
+
+
+@app.route("/api/events")
+def api_events():
+    ensure_started()
+
+    def gen():
+        # The first message carries the full state, later ones only changed keys.
+        sent, version = {}, -1
+        while True:
+            state = state_channel.state or snapshot_state()
+            delta = state_delta(sent, state)
+            if delta:
+                sent = state
+                yield f"data: {json.dumps(delta)}\n\n"
+            new_version = state_channel.wait(version, SSE_KEEPALIVE)
+            if new_version == version:
+                yield ": keepalive\n\n"
+            version = new_version
+
+    return Response(
+        gen(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.route("/api/config", methods=["POST"])
@@ -475,21 +727,34 @@ def api_config():
         st.session_state.grid_cols = int(payload.get("grid_cols", st.session_state.grid_cols))
         st.session_state.analysis_batch_size = int(payload.get("analysis_batch_size", st.session_state.analysis_batch_size))
         st.session_state.live_preview = bool(payload.get("live_preview", st.session_state.live_preview))
-        cleanup_removed_feeds()
         add_event(f"Feed list updated: {st.session_state.feed_list}")
+    feeds_changed.set()
+    publish_state()
     return jsonify({"ok": True})
 
 
-@app.route("/api/scan_cameras", methods=["POST"])
-def api_scan_cameras():
-    ensure_started()
-    found = scan_cameras()
+def apply_camera_scan(found):
+    """CameraScan callback: switch the feed list to the cameras that were found."""
     with state_lock:
         st.session_state.feed_list = found or ["0"]
         st.session_state.feeds_raw = "\n".join(st.session_state.feed_list)
-        cleanup_removed_feeds()
         add_event(f"Local camera scan: {st.session_state.feed_list}")
-    return jsonify({"ok": True, "found": found})
+    feeds_changed.set()
+    publish_state()
+
+
+@app.route("/api/scan_cameras", methods=["GET", "POST"])
+def api_scan_cameras():
+    """POST starts a background scan (unless one is running); GET polls it."""
+    ensure_started()
+    if request.method == "POST":
+        with state_lock:
+            in_use = [src for src, status in st.session_state.feed_status.items() if status == "Connected"]
+        status = camera_scan.start(in_use, apply_camera_scan)
+        publish_state()
+    else:
+        status = camera_scan.status()
+    return jsonify(dict(status, ok=True))
 
 
 @app.route("/api/start", methods=["POST"])
@@ -498,6 +763,9 @@ def api_start():
     with state_lock:
         st.session_state.running = True
         add_event("Monitoring started")
+    if not engine_ready():
+        warmup.start(again=True)
+    publish_state()
     return jsonify({"ok": True})
 
 
@@ -506,10 +774,14 @@ def api_stop():
     ensure_started()
     with state_lock:
         st.session_state.running = False
-        close_resources()
         generate_report()
         add_event("Monitoring stopped")
         add_event("Per-camera reports generated")
+    # Only signalled once the reports are written, so the loop cannot close the
+    # store or log under them. The loop closes everything between batches, so
+    # this request never waits on inference.
+    close_requested.set()
+    publish_state()
     return jsonify({"ok": True})
 
 
@@ -519,17 +791,19 @@ def api_generate_report():
     with state_lock:
         generate_report()
         add_event("Final report generated")
+        stopped = not st.session_state.running
+    if stopped:
+        # The report reopened the incident store and log; close them again.
+        close_requested.set()
+    publish_state()
     return jsonify({"ok": True})
 
 
 @app.route("/api/reset_risk", methods=["POST"])
 def api_reset_risk():
     ensure_started()
-    with state_lock:
-        st.session_state.risk_score = 0.0
-        st.session_state.incidents = []
-        st.session_state.feed_risk_scores = {}
-        add_event("Risk and incidents reset")
+    # Applied by the loop between batches, so a detection pass never sees the scores vanish.
+    reset_requested.set()
     return jsonify({"ok": True})
 
 
@@ -539,14 +813,16 @@ def frame():
     source = request.args.get("source", "").strip()
     if not source:
         return Response(status=400)
-    with state_lock:
-        frame_bgr = st.session_state.feed_frames.get(source)
-        if frame_bgr is None:
-            frame_bgr = exam_camera.offline_frame("No Frame")
-    ok, encoded = cv2.imencode(".jpg", frame_bgr)
-    if not ok:
+    width = request.args.get("width", "0")
+    quality = request.args.get("quality", "0")
+    _, data = frame_cache.jpeg(
+        source,
+        int(width) if width.isdigit() else 0,
+        max(10, min(95, int(quality))) if quality.isdigit() and int(quality) else 0,
+    )
+    if not data:
         return Response(status=500)
-    return Response(encoded.tobytes(), mimetype="image/jpeg")
+    return Response(data, mimetype="image/jpeg")
 
 
 @app.route("/stream")
@@ -556,24 +832,67 @@ def stream():
     if not source:
         return Response(status=400)
 
+    client = stream_client(request.args)
+
     def gen():
+        # Parts go out only when the feed has a new frame; the bytes come from
+        # the shared per-tier cache, so viewers add no encode work. How long a
+        # part takes to drain moves this client between size/quality tiers.
+        last_seq = None
         while True:
-            with state_lock:
-                frame_bgr = st.session_state.feed_frames.get(source)
-                if frame_bgr is None:
-                    frame_bgr = exam_camera.offline_frame("No Frame")
-            ok, encoded = cv2.imencode(".jpg", frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, 80])
-            if ok:
-                data = encoded.tobytes()
-                yield (
-                    b"--frame\r\n"
-                    b"Content-Type: image/jpeg\r\n\r\n" + data + b"\r\n"
-                )
-            time.sleep(0.08)
+            width, quality = client.tier
+            seq, data = frame_cache.jpeg(source, width, quality)
+            if data and seq != last_seq:
+                last_seq = seq
+                started = time.time()
+                yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+                       + data + b"\r\n")
+                client.record(time.time() - started)
+                time.sleep(max(0.0, client.interval - (time.time() - started)))
+            frame_cache.wait_for_change(source, last_seq, STREAM_IDLE_WAIT)
 
     return Response(gen(), mimetype="multipart/x-mixed-replace; boundary=frame")
 
 
+@app.route("/mosaic")
+def mosaic():
+    ensure_started()
+
+    def gen():
+        # One composited grid for all feeds; every viewer shares the same encode.
+        last_key, version = None, -1
+        while True:
+            state = state_channel.state or snapshot_state()
+            key, data = mosaic_cache.jpeg(state.get("rows", []), state.get("grid_cols", 2))
+            if data and key != last_key:
+                last_key = key
+                yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+                       + data + b"\r\n")
+                time.sleep(STREAM_MIN_INTERVAL)
+            version = frame_cache.wait_for_update(version, STREAM_IDLE_WAIT)
+
+    return Response(gen(), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+
+@app.route("/webrtc/offer", methods=["POST"])
+def webrtc_offer():
+    ensure_started()
+    publisher = webrtc
+    if publisher is None:
+        return jsonify({"ok": False, "error": "WebRTC preview is disabled"}), 404
+    payload = request.get_json(silent=True) or {}
+    source = str(payload.get("source", "")).strip()
+    if not source or not payload.get("sdp"):
+        return Response(status=400)
+    try:
+        return jsonify(publisher.answer(source, payload["sdp"], payload.get("type", "offer")))
+    except ValueError as exc:
+        # aiortc rejects malformed SDP and unknown description types with ValueError.
+        return jsonify({"ok": False, "error": f"Invalid offer: {exc}"}), 400
+    except Exception as exc:
+        return jsonify({"ok": False, "error": f"WebRTC unavailable: {type(exc).__name__}: {exc}"}), 503
+
+
 @app.route("/download/<path:name>")
 def download(name: str):
     ensure_started()
@@ -583,7 +902,12 @@ def download(name: str):
 @app.route("/health")
 def health():
     ensure_started()
-    return jsonify({"ok": True})
+    return jsonify({
+        "ok":            True,
+        "warmup":        warmup.status(),
+        "engine_ready":  engine_ready(),
+        "latency":       st.session_state.engine_warmup,
+    })
 
 
 def main():
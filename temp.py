@@ -105,7 +105,7 @@ def process_detection(feed_sources: list[str]) -> None:
     if n == 0:
         return
 
-    start = st.session_state.rr_index % n
+    start = st.session_state.get("rr_index", 0) % n
     batch = min(st.session_state.analysis_batch_size, n)
     indexes = [(start + i) % n for i in range(batch)]
     st.session_state.rr_index = (start + batch) % n